@@ -0,0 +1,58 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Compares latency of a batch of I/O-bound calls handled one after another
+with `JsonRpcAsyncDispatcher` handling them concurrently.
+
+Usage: python benchmarks/bench_async.py'''
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed,\
+    JsonRpcAsyncDispatcher  # noqa
+
+BATCH_SIZE = 200
+# I/O latency of one call in seconds
+CALL_LATENCY = 0.01
+
+
+async def Fetch(key):
+    await asyncio.sleep(CALL_LATENCY)
+    return key
+
+
+def MakeBatch():
+    return '[' + ','.join(
+        JsonRpcMessage.Request(i, 'Fetch', [i]).AsWireJson()
+        for i in range(BATCH_SIZE)) + ']'
+
+
+async def Sequential(dispatcher, batch):
+    for parsed in JsonRpcParsed.Parse(batch):
+        await dispatcher.DispatchAsync(parsed)
+
+
+def main():
+    batch = MakeBatch()
+    print('%d calls of %.0f ms' % (BATCH_SIZE, CALL_LATENCY * 1e3))
+    print('%14s %10s' % ('limit', 'batch ms'))
+    dispatcher = JsonRpcAsyncDispatcher()
+    dispatcher.Register(Fetch)
+    started = time.time()
+    asyncio.run(Sequential(dispatcher, batch))
+    print('%14s %10.1f' % ('sequential', (time.time() - started) * 1e3))
+    for limit in [10, 50, None]:
+        dispatcher = JsonRpcAsyncDispatcher(limit)
+        dispatcher.Register(Fetch)
+        started = time.time()
+        asyncio.run(dispatcher.DispatchJsonAsync(batch))
+        print('%14s %10.1f' % (limit or 'unlimited',
+                               (time.time() - started) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
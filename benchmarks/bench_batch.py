@@ -0,0 +1,61 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Compares batch serialization costs: `JsonRpcMessage.AsJson` per message
+joined by hand against a single `JsonRpcBatch.AsJson` encoder pass.
+
+Usage: python benchmarks/bench_batch.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcNotification,\
+    JsonRpcError, JsonRpcBatch  # noqa
+
+BATCH_SIZES = [1, 100, 10000]
+
+
+def MakeMessages(count):
+    '''Returns a list of mixed responses and notifications'''
+    messages = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            messages.append(JsonRpcMessage.Success(i, {'sum': i, 'ok': True}))
+        elif kind == 1:
+            messages.append(JsonRpcMessage.Error(
+                i, JsonRpcError.MethodNotFound('no method %d' % i)))
+        elif kind == 2:
+            messages.append(JsonRpcMessage.Request(i, 'sum', [i, i + 1]))
+        else:
+            messages.append(JsonRpcMessage.Notification('alarm', [i]))
+    return messages
+
+
+def JoinByHand(messages):
+    return '[' + ','.join(msg.AsJson() for msg in messages
+                          if not isinstance(msg, JsonRpcNotification)) + ']'
+
+
+def Measure(func, count):
+    '''Returns the best seconds per call of func'''
+    number = max(1, 20000 // count)
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print('%8s %20s %20s' % ('size', 'AsJson+join us/msg',
+                             'JsonRpcBatch us/msg'))
+    for count in BATCH_SIZES:
+        messages = MakeMessages(count)
+        batch = JsonRpcBatch(messages)
+        joined = Measure(lambda: JoinByHand(messages), count)
+        single = Measure(batch.AsJson, count)
+        print('%8d %20.3f %20.3f' % (count, joined * 1e6 / count,
+                                     single * 1e6 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures bulk parsing of a recorded NDJSON traffic file: a single
+threaded `JsonRpcParsed.Parse` loop against `parseMany` and `countMany`
+with growing worker counts. Throughput should grow with the workers up to
+the CPU count.
+
+Usage: python benchmarks/bench_bulk.py [lines]'''
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcParseError, parseMany, countMany  # noqa
+
+WORKERS = [1, 2, 4, 8]
+
+
+def WriteTraffic(path, lines):
+    messages = [
+        JsonRpcMessage.Request(1, 'search', {'query': 'text ' * 20,
+                                             'page': 3}).AsWireJson(),
+        JsonRpcMessage.Success(1, [{'id': i, 'title': 'item %d' % i}
+                                   for i in range(10)]).AsWireJson(),
+        JsonRpcMessage.Notification('log', ['event', 5]).AsWireJson(),
+        JsonRpcMessage.Error(2, JsonRpcError.MethodNotFound()).AsWireJson(),
+    ]
+    with open(path, 'w') as f:
+        for i in range(lines):
+            f.write(messages[i % len(messages)] + '\n')
+
+
+def Loop(path):
+    count = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                JsonRpcParsed.Parse(line)
+            except JsonRpcParseError:
+                pass
+            count += 1
+    return count
+
+
+def Rate(func):
+    '''Returns messages per second'''
+    started = time.time()
+    count = func()
+    return count / (time.time() - started)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    fd, path = tempfile.mkstemp(suffix='.ndjson')
+    os.close(fd)
+    try:
+        WriteTraffic(path, lines)
+        print('%d lines, %d CPUs' % (lines, os.cpu_count() or 1))
+        print('%24s %14.0f msg/s' % ('Parse loop', Rate(lambda: Loop(path))))
+        for workers in WORKERS:
+            print('%24s %14.0f msg/s' % (
+                'parseMany %d workers' % workers,
+                Rate(lambda: sum(1 for _ in parseMany(path, workers)))))
+        for workers in WORKERS:
+            print('%24s %14.0f msg/s' % (
+                'countMany %d workers' % workers,
+                Rate(lambda: sum(countMany(path, workers).values()))))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
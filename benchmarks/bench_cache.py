@@ -0,0 +1,56 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures a cached method against an uncached one: request dispatched
+and its response encoded with `AsWireJson`. A hit calls no handler and
+encodes no result, the response writes the cached text with the new id.
+
+Usage: python benchmarks/bench_cache.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed, JsonRpcDispatcher,\
+    JsonRpcResultCache  # noqa
+
+SIZES = [1, 10, 100, 1000]
+
+
+def Catalog(size, page=0):
+    return [{'id': page * size + i, 'name': 'item %d' % i, 'price': i * 1.5,
+             'tags': ['a', 'b']} for i in range(size)]
+
+
+def Measure(func, number):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    plain = JsonRpcDispatcher()
+    plain.Register(Catalog)
+    cached = JsonRpcDispatcher()
+    cache = JsonRpcResultCache()
+    cached.Register(Catalog, cache=cache)
+    print('%10s %14s %14s %8s' % ('items', 'uncached us', 'cached us',
+                                  'speedup'))
+    for size in SIZES:
+        parsed = JsonRpcParsed.Parse(JsonRpcMessage.Request(
+            1, 'Catalog', {'size': size}).AsWireJson())
+        assert plain.Dispatch(parsed).AsWireJson() == \
+            cached.Dispatch(parsed).AsWireJson()
+        number = max(100, 100000 // size)
+        uncachedTime = Measure(lambda: plain.Dispatch(parsed).AsWireJson(),
+                               number)
+        cachedTime = Measure(lambda: cached.Dispatch(parsed).AsWireJson(),
+                             number)
+        print('%10d %14.2f %14.2f %7.1fx' % (size, uncachedTime * 1e6,
+                                             cachedTime * 1e6,
+                                             uncachedTime / cachedTime))
+    print('hits %d, misses %d' % (cache.hits, cache.misses))
+
+
+if __name__ == '__main__':
+    main()
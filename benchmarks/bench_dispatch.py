@@ -0,0 +1,81 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures per call overhead of `JsonRpcDispatcher.Dispatch` against a
+direct handler call and a dispatch loop binding params with
+inspect.signature on every call.
+
+Usage: python benchmarks/bench_dispatch.py'''
+import inspect
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed, JsonRpcError,\
+    JsonRpcDispatcher  # noqa
+
+
+def Subtract(minuend, subtrahend=0):
+    return minuend - subtrahend
+
+
+HANDLERS = {'Subtract': Subtract}
+
+REQUESTS = [
+    ('list params', JsonRpcParsed.Parse(
+        JsonRpcMessage.Request(1, 'Subtract', [5, 3]).AsWireJson())),
+    ('dict params', JsonRpcParsed.Parse(JsonRpcMessage.Request(
+        1, 'Subtract', {'minuend': 5, 'subtrahend': 3}).AsWireJson())),
+]
+
+
+def InspectDispatch(parsed):
+    '''Dispatch loop every service writes without a dispatcher'''
+    msg = parsed.payload
+    handler = HANDLERS.get(msg.method)
+    if handler is None:
+        return JsonRpcMessage.Error(msg.id, JsonRpcError.MethodNotFound())
+    params = msg.params
+    try:
+        if isinstance(params, dict):
+            bound = inspect.signature(handler).bind(**params)
+        else:
+            bound = inspect.signature(handler).bind(*params)
+    except TypeError as e:
+        return JsonRpcMessage.Error(msg.id, JsonRpcError.InvalidParams(
+            str(e)))
+    return JsonRpcMessage.Success(msg.id,
+                                  handler(*bound.args, **bound.kwargs))
+
+
+def DirectCall(parsed):
+    msg = parsed.payload
+    params = msg.params
+    if isinstance(params, dict):
+        return JsonRpcMessage.Success(msg.id, Subtract(**params))
+    return JsonRpcMessage.Success(msg.id, Subtract(*params))
+
+
+def Measure(func, number=100000):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    dispatcher = JsonRpcDispatcher()
+    dispatcher.Register(Subtract)
+    print('%14s %10s %12s %12s' % ('us/call', 'direct', 'dispatcher',
+                                   'inspect'))
+    for name, parsed in REQUESTS:
+        direct = Measure(lambda: DirectCall(parsed))
+        dispatch = Measure(lambda: dispatcher.Dispatch(parsed))
+        inspected = Measure(lambda: InspectDispatch(parsed))
+        print('%14s %10.3f %12.3f %12.3f' % (name, direct * 1e6,
+                                             dispatch * 1e6,
+                                             inspected * 1e6))
+
+
+if __name__ == '__main__':
+    main()
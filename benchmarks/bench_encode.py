@@ -0,0 +1,40 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Compares `JsonRpcMessage.AsJson` with `JsonRpcMessage.AsWireJson` for
+every message type.
+
+Usage: python benchmarks/bench_encode.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError  # noqa
+
+MESSAGES = [
+    ('request', JsonRpcMessage.Request(1, 'sum', [1, 2])),
+    ('notification', JsonRpcMessage.Notification('alarm', {'a': 1})),
+    ('success', JsonRpcMessage.Success(1, {'sum': 3, 'ok': True})),
+    ('error', JsonRpcMessage.Error(1, JsonRpcError.MethodNotFound())),
+    ('error+data', JsonRpcMessage.Error(
+        1, JsonRpcError.InvalidParams({'missing': 'a'}))),
+]
+
+
+def Measure(func, number=100000):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print('%14s %14s %14s' % ('message', 'AsJson us', 'AsWireJson us'))
+    for name, msg in MESSAGES:
+        pretty = Measure(msg.AsJson)
+        wire = Measure(msg.AsWireJson)
+        print('%14s %14.3f %14.3f' % (name, pretty * 1e6, wire * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures throughput of `JsonRpcAsyncDispatcher` with handlers run by
+`JsonRpcExecutorPolicy`: blocking calls in a thread pool and CPU bound
+calls in a process pool, for a growing number of workers.
+
+Usage: python benchmarks/bench_executors.py'''
+import asyncio
+import os
+import sys
+import time
+from concurrent import futures
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcAsyncDispatcher,\
+    JsonRpcExecutorPolicy  # noqa
+
+CALLS = 64
+WORKERS = [1, 2, 4, 8]
+
+
+def Blocking(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def Cpu(count):
+    return [i * i for i in range(count)][-1]
+
+
+def Throughput(executor, method, params):
+    '''Returns calls per second of a batch of CALLS requests'''
+    dispatcher = JsonRpcAsyncDispatcher()
+    dispatcher.Register(globals()[method],
+                        policy=JsonRpcExecutorPolicy(executor))
+    batch = '[' + ','.join(
+        JsonRpcMessage.Request(i, method, params).AsWireJson()
+        for i in range(CALLS)) + ']'
+    # workers are started before the measurement
+    asyncio.run(dispatcher.DispatchJsonAsync(batch))
+    started = time.time()
+    asyncio.run(dispatcher.DispatchJsonAsync(batch))
+    return CALLS / (time.time() - started)
+
+
+def main():
+    print('%8s %18s %18s' % ('workers', 'threads, calls/s',
+                             'processes, calls/s'))
+    for workers in WORKERS:
+        with futures.ThreadPoolExecutor(workers) as threads:
+            blocking = Throughput(threads, 'Blocking', [0.01])
+        with futures.ProcessPoolExecutor(workers) as processes:
+            cpu = Throughput(processes, 'Cpu', [200000])
+        print('%8d %18.1f %18.1f' % (workers, blocking, cpu))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures throughput of `JsonRpcContentLengthCodec` over a local pipe:
+many small requests and a few large results, written by a thread and
+read back in 64 KB chunks.
+
+Usage: python benchmarks/bench_framing.py'''
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcContentLengthCodec  # noqa
+
+
+def PipeTransfer(frames, codec):
+    '''Writes frames to a local pipe in a thread, reads them back through
+    codec. Returns (results, seconds).'''
+    readFd, writeFd = os.pipe()
+
+    def Writer():
+        with os.fdopen(writeFd, 'wb', buffering=0) as pipe:
+            for frame in frames:
+                view = memoryview(frame)
+                while view:
+                    view = view[pipe.write(view):]
+
+    started = time.perf_counter()
+    writer = threading.Thread(target=Writer)
+    writer.start()
+    results = []
+    with os.fdopen(readFd, 'rb', buffering=0) as pipe:
+        while True:
+            chunk = pipe.read(65536)
+            if not chunk:
+                break
+            results.extend(codec.Feed(chunk))
+    writer.join()
+    return results, time.perf_counter() - started
+
+
+def main():
+    codec = JsonRpcContentLengthCodec()
+    frames = [codec.Encode(JsonRpcMessage.Request(i, 'sum', [i, i + 1]))
+              for i in range(20000)]
+    results, seconds = PipeTransfer(frames, codec)
+    assert len(results) == len(frames)
+    print('%d small messages over a pipe: %.0f msg/s' % (
+        len(frames), len(frames) / seconds))
+
+    result = {'rows': [['item %d' % i, i, i * 0.5] for i in range(100000)]}
+    frames = [codec.Encode(JsonRpcMessage.Success(i, result))
+              for i in range(4)]
+    results, seconds = PipeTransfer(frames, codec)
+    assert len(results) == len(frames)
+    size = sum(len(frame) for frame in frames)
+    print('%d messages of %.1f MB over a pipe: %.1f MB/s' % (
+        len(frames), len(frames[0]) / 2.0 ** 20, size / 2.0 ** 20 / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures 100% invalid traffic: `JsonRpcParsed.TryParse` reporting
+INVALID results against `JsonRpcParsed.Parse` raising `JsonRpcParseError`
+which the caller turns into an error response, with every installed json
+backend.
+
+Usage: python benchmarks/bench_invalid.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcParsed, JsonRpcParseError, JsonRpcMessage,\
+    setJsonBackend, getJsonBackend  # noqa
+from pyjsonrpclite import jsonbackend  # noqa
+
+MESSAGES = [
+    ('bad json', '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2'),
+    ('no jsonrpc', '{"method": "sum", "params": [1, 2], "id": 1}'),
+    ('bad version', '{"jsonrpc": "1.0", "method": "sum", "id": 1}'),
+    ('no method', '{"jsonrpc": "2.0", "id": 1}'),
+    ('bad error', '{"jsonrpc": "2.0", "error": {"code": 1}, "id": 1}'),
+    ('not object', '42'),
+    ('empty batch', '[]'),
+    ('bad batch', '[1, {"id": 2}, {"jsonrpc": "2.0"}, {"jsonrpc": "1"}]'),
+]
+
+
+def ParseOrError(jsonstr):
+    '''Raising path: what every caller of Parse writes'''
+    try:
+        return JsonRpcParsed.Parse(jsonstr)
+    except JsonRpcParseError as e:
+        return JsonRpcMessage.Error(None, e.rpcError)
+
+
+def Measure(func, number=50000):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    backends = []
+    for backendClass in jsonbackend.BACKENDS:
+        try:
+            backends.append(backendClass())
+        except ImportError:
+            continue
+    default = getJsonBackend()
+    for backend in backends:
+        setJsonBackend(backend)
+        print('%s backend' % backend.name)
+        print('%14s %12s %12s %8s' % ('us/message', 'Parse', 'TryParse',
+                                      'speedup'))
+        for name, jsonstr in MESSAGES:
+            raising = Measure(lambda: ParseOrError(jsonstr))
+            reporting = Measure(lambda: JsonRpcParsed.TryParse(jsonstr))
+            print('%14s %12.3f %12.3f %7.1fx' % (name, raising * 1e6,
+                                                 reporting * 1e6,
+                                                 raising / reporting))
+    setJsonBackend(default)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Compares `JsonRpcParsed.Parse` with `JsonRpcParsed.ParseLazy` for a proxy
+which reads method and id and forwards the message: params of a few MB are
+never looked at.
+
+Usage: python benchmarks/bench_lazy.py'''
+import base64
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed  # noqa
+
+
+
+def Nested(depth):
+    value = [1, 'abc', 2.5]
+    for _ in range(depth):
+        value = {'items': [value] * 4, 'name': 'x'}
+    return value
+
+
+PAYLOADS = [
+    ('blob', [base64.b64encode(os.urandom(3 * 1024 * 1024)).decode('ascii')]),
+    ('numbers', [list(range(500000))]),
+    ('records', [{'id': i, 'name': 'item %d' % i} for i in range(50000)]),
+    ('nested', [Nested(6) for _ in range(10)]),
+    ('text', ['\u00e9t\u00e9 \u4e2d\u6587 ' * 20 for _ in range(3000)]),
+]
+
+
+def Forward(parse, data):
+    msg = parse(data).payload
+    return msg.method, msg.id, msg.AsWireBytes()
+
+
+def Measure(func, number):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    print('%10s %10s %14s %14s' % ('params', 'KB', 'Parse ms',
+                                   'ParseLazy ms'))
+    for name, params in PAYLOADS:
+        data = JsonRpcMessage.Request(1, 'store', params).AsWireBytes()
+        eager = Measure(lambda: Forward(JsonRpcParsed.Parse, data), 5)
+        lazy = Measure(lambda: Forward(JsonRpcParsed.ParseLazy, data), 5)
+        print('%10s %10d %14.3f %14.3f' % (name, len(data) // 1024,
+                                           eager * 1e3, lazy * 1e3))
+
+
+if __name__ == '__main__':
+    main()
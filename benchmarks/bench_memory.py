@@ -0,0 +1,54 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Reports memory taken by queued message objects, bytes per million.
+Params and ids are shared between the messages, so only the message
+objects themselves are measured.
+
+Usage: python benchmarks/bench_memory.py'''
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcRequest, JsonRpcNotification,\
+    JsonRpcSuccessResponse, JsonRpcErrorResponse, JsonRpcError,\
+    JsonRpcParsed, JsonRpcParsedType  # noqa
+
+COUNT = 100000
+PARAMS = ['user', 'password']
+
+FACTORIES = [
+    ('request', lambda: JsonRpcRequest(1, 'login', PARAMS)),
+    ('request, no params', lambda: JsonRpcRequest(1, 'login')),
+    ('notification', lambda: JsonRpcNotification('alarm', PARAMS)),
+    ('success', lambda: JsonRpcSuccessResponse(1, PARAMS)),
+    ('error', lambda: JsonRpcErrorResponse(
+        1, JsonRpcError(-32000, 'Busy', PARAMS))),
+    ('parsed request', lambda: JsonRpcParsed(
+        JsonRpcParsedType.REQUEST, JsonRpcRequest(1, 'login', PARAMS))),
+]
+
+
+def MeasureBytes(factory):
+    '''Returns bytes allocated per object created by factory'''
+    gc.collect()
+    tracemalloc.start()
+    queued = [factory() for _ in range(COUNT)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queued
+    return float(size) / COUNT
+
+
+def main():
+    print('%20s %22s' % ('message', 'MB per 1M queued'))
+    for name, factory in FACTORIES:
+        perObject = MeasureBytes(factory)
+        print('%20s %22.1f' % (name, perObject * 1e6 / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
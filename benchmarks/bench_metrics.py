@@ -0,0 +1,76 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures the cost of `JsonRpcMetrics`: one recorded call alone, a
+dispatched request with and without metrics, and a scrape merging the
+counters of many threads into Prometheus text.
+
+Usage: python benchmarks/bench_metrics.py'''
+import os
+import sys
+import threading
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed, JsonRpcDispatcher,\
+    JsonRpcMetrics  # noqa
+
+METHODS = 50
+THREADS = 8
+
+
+def Add(a, b):
+    return a + b
+
+
+def Measure(func, number):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def Record(metrics):
+    metrics.Finish('add', metrics.Start('add'))
+
+
+def main():
+    metrics = JsonRpcMetrics()
+    recordTime = Measure(lambda: Record(metrics), 100000)
+    print('%-34s %10.3f us  %10.0f calls/s' % (
+        'record start and finish', recordTime * 1e6, 1 / recordTime))
+    parsed = JsonRpcParsed.Parse(
+        JsonRpcMessage.Request(1, 'add', [1, 2]).AsWireJson())
+    for name, dispatcher in [('dispatch without metrics',
+                              JsonRpcDispatcher()),
+                             ('dispatch with metrics',
+                              JsonRpcDispatcher(JsonRpcMetrics()))]:
+        dispatcher.Register(Add, 'add')
+        dispatchTime = Measure(lambda: dispatcher.Dispatch(parsed), 100000)
+        print('%-34s %10.3f us  %10.0f calls/s' % (
+            name, dispatchTime * 1e6, 1 / dispatchTime))
+
+    metrics = JsonRpcMetrics()
+    done = threading.Event()
+    ready = threading.Barrier(THREADS + 1)
+
+    def Work():
+        for i in range(METHODS):
+            method = 'method%d' % i
+            metrics.Finish(method, metrics.Start(method),
+                           -32000 if i % 7 == 0 else None)
+        ready.wait()
+        done.wait()
+    threads = [threading.Thread(target=Work) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    scrapeTime = Measure(metrics.AsPrometheus, 20)
+    done.set()
+    for thread in threads:
+        thread.join()
+    print('%-34s %10.3f ms  (%d methods, %d threads)' % (
+        'scrape to Prometheus text', scrapeTime * 1e3, METHODS, THREADS))
+
+
+if __name__ == '__main__':
+    main()
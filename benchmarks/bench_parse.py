@@ -0,0 +1,97 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures `JsonRpcParsed.Parse` cost for every message type, and for
+requests carrying larger params, with every installed json backend.
+
+Usage: python benchmarks/bench_parse.py'''
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcParsed, JsonRpcParseError,\
+    setJsonBackend  # noqa
+from pyjsonrpclite import jsonbackend  # noqa
+
+MESSAGES = [
+    ('request',
+     '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": 1}'),
+    ('notification',
+     '{"jsonrpc": "2.0", "method": "alarm", "params": {"a": 1}}'),
+    ('success', '{"jsonrpc": "2.0", "result": 3, "id": 1}'),
+    ('error', '{"jsonrpc": "2.0", "error": {"code": -32601, '
+              '"message": "Method Not Found"}, "id": 1}'),
+    ('invalid', '{"jsonrpc": "2.0", "id": 1}'),
+]
+
+
+def Request(params):
+    return json.dumps({'jsonrpc': '2.0', 'method': 'store',
+                       'params': params, 'id': 1})
+
+
+def Nested(depth):
+    '''Returns records nested depth levels deep'''
+    value = {'id': 1, 'name': u'caf\xe9'}
+    for _ in range(depth):
+        value = {'items': [value, value]}
+    return value
+
+
+# (name, json text, calls measured), about 80 KB each
+LARGE_MESSAGES = [
+    ('records', Request([{'id': i, 'name': 'item %d' % i,
+                          'price': i * 1.25, 'tags': ['a', 'b']}
+                         for i in range(1000)]), 200),
+    ('numbers', Request(list(range(10 ** 12, 10 ** 12 + 5000))), 200),
+    ('nested', Request([Nested(9) for _ in range(3)]), 200),
+]
+
+
+def ParseOrError(jsonstr):
+    try:
+        return JsonRpcParsed.Parse(jsonstr)
+    except JsonRpcParseError as e:
+        return e
+
+
+def Measure(func, number=100000):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def AvailableBackends():
+    backends = []
+    for backendClass in jsonbackend.BACKENDS:
+        try:
+            backends.append(backendClass())
+        except ImportError:
+            continue
+    return backends
+
+
+def main():
+    backends = AvailableBackends()
+    print('%14s' % 'us/parse' +
+          ''.join('%10s' % backend.name for backend in backends))
+    for name, jsonstr in MESSAGES:
+        line = '%14s' % name
+        for backend in backends:
+            setJsonBackend(backend)
+            seconds = Measure(lambda: ParseOrError(jsonstr))
+            line += '%10.3f' % (seconds * 1e6)
+        print(line)
+    for name, jsonstr, number in LARGE_MESSAGES:
+        line = '%14s' % name
+        for backend in backends:
+            setJsonBackend(backend)
+            seconds = Measure(lambda: ParseOrError(jsonstr), number)
+            line += '%10.1f' % (seconds * 1e6)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Compares `JsonRpcParsed.Parse` with `JsonRpcParsed.Peek` classifying
+requests with params of growing size.
+
+Usage: python benchmarks/bench_peek.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed  # noqa
+
+SIZES = [1, 100, 10000]
+
+
+def Measure(func, number):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print('%10s %10s %14s %14s' % ('items', 'bytes', 'Parse us', 'Peek us'))
+    for items in SIZES:
+        params = [{'id': i, 'name': 'item %d' % i} for i in range(items)]
+        data = JsonRpcMessage.Request(1, 'store', params).AsWireBytes()
+        number = max(10, 100000 // items)
+        parse = Measure(lambda: JsonRpcParsed.Parse(data), number)
+        peek = Measure(lambda: JsonRpcParsed.Peek(data), number)
+        print('%10d %10d %14.3f %14.3f' % (items, len(data), parse * 1e6,
+                                           peek * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures params validation by a compiled `JsonRpcParamsSchema` against
+a validator interpreting the same schema dict on every call, for orders
+of 1 to 1000 items. Both give the same verdicts.
+
+Usage: python benchmarks/bench_schema.py'''
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcParamsSchema  # noqa
+
+SIZES = [1, 10, 100, 1000]
+
+ORDER = {
+    'type': 'object',
+    'required': ['customer', 'items'],
+    'additionalProperties': False,
+    'properties': {
+        'customer': {'type': 'string', 'minLength': 1, 'maxLength': 64},
+        'note': {'type': ['string', 'null']},
+        'items': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': ['sku', 'count'],
+                'properties': {
+                    'sku': {'type': 'string', 'pattern': '^[A-Z]{3}-[0-9]+$'},
+                    'count': {'type': 'integer', 'minimum': 1,
+                              'maximum': 1000},
+                    'price': {'type': 'number', 'minimum': 0},
+                },
+            },
+        },
+    },
+}
+
+TYPES = {
+    'null': lambda value: value is None,
+    'boolean': lambda value: isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and
+    not isinstance(value, bool) or
+    isinstance(value, float) and value.is_integer(),
+    'number': lambda value: isinstance(value, (int, float)) and
+    not isinstance(value, bool),
+    'string': lambda value: isinstance(value, str),
+    'array': lambda value: isinstance(value, list),
+    'object': lambda value: isinstance(value, dict),
+}
+
+
+def Interpret(schema, value, path=''):
+    '''Walks the schema dict for value, the way a validator without a
+    compile step does. Returns (path, message) of the first problem or
+    None.'''
+    types = schema.get('type')
+    if types is not None:
+        if isinstance(types, str):
+            types = [types]
+        if not any(TYPES[name](value) for name in types):
+            return path, 'Expected ' + ' or '.join(types)
+    if TYPES['number'](value):
+        if 'minimum' in schema and value < schema['minimum']:
+            return path, 'Expected at least %r' % schema['minimum']
+        if 'maximum' in schema and value > schema['maximum']:
+            return path, 'Expected at most %r' % schema['maximum']
+    if isinstance(value, str):
+        if len(value) < schema.get('minLength', 0):
+            return path, 'Too short'
+        if 'maxLength' in schema and len(value) > schema['maxLength']:
+            return path, 'Too long'
+        if 'pattern' in schema and not re.search(schema['pattern'], value):
+            return path, 'Expected to match ' + schema['pattern']
+    if isinstance(value, list):
+        if len(value) < schema.get('minItems', 0):
+            return path, 'Too few items'
+        if 'items' in schema:
+            for index, item in enumerate(value):
+                problem = Interpret(schema['items'], item,
+                                    '%s/%d' % (path, index))
+                if problem is not None:
+                    return problem
+    if isinstance(value, dict):
+        for name in schema.get('required', ()):
+            if name not in value:
+                return path + '/' + name, 'Missing required property'
+        properties = schema.get('properties', {})
+        for name, item in value.items():
+            if name in properties:
+                problem = Interpret(properties[name], item,
+                                    path + '/' + name)
+                if problem is not None:
+                    return problem
+            elif schema.get('additionalProperties', True) is False:
+                return path + '/' + name, 'Unexpected property'
+    return None
+
+
+def Order(size):
+    return {'customer': 'customer', 'note': None,
+            'items': [{'sku': 'ABC-%d' % i, 'count': i % 100 + 1,
+                       'price': i * 0.5} for i in range(size)]}
+
+
+def Measure(func, number):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    compiled = JsonRpcParamsSchema(ORDER)
+    invalid = Order(3)
+    invalid['items'][2]['count'] = 0
+    assert Interpret(ORDER, invalid)[0] == \
+        compiled.Validate(invalid)['path'] == '/items/2/count'
+    print('%10s %16s %16s %8s' % ('items', 'interpreted us', 'compiled us',
+                                  'speedup'))
+    for size in SIZES:
+        order = Order(size)
+        assert Interpret(ORDER, order) is None
+        assert compiled.Validate(order) is None
+        number = max(20, 20000 // size)
+        interpretedTime = Measure(lambda: Interpret(ORDER, order), number)
+        compiledTime = Measure(lambda: compiled.Validate(order), number)
+        print('%10d %16.2f %16.2f %7.1fx' % (size, interpretedTime * 1e6,
+                                             compiledTime * 1e6,
+                                             interpretedTime / compiledTime))
+    compileTime = Measure(lambda: JsonRpcParamsSchema(ORDER), 1000)
+    print('compile once: %.2f us' % (compileTime * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures `JsonRpcClientSession` cost per call: requests are created,
+then responses to all of them arrive in random order. Every call has a
+timeout, calls are completed through futures or callbacks.
+
+Usage: python benchmarks/bench_session.py'''
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcClientSession  # noqa
+
+PENDING = [10, 1000, 50000]
+
+
+def Ignore(response):
+    pass
+
+
+def Run(pending, callback):
+    session = JsonRpcClientSession(maxPending=pending, timeout=60)
+    seconds = 0
+    for _ in range(5):
+        started = time.time()
+        requests = [session.Request('echo', [i], callback=callback)[0]
+                    for i in range(pending)]
+        seconds += time.time() - started
+        responses = [JsonRpcMessage.Success(msg.id, None) for msg in requests]
+        random.shuffle(responses)
+        started = time.time()
+        for response in responses:
+            session.Resolve(response)
+        session.Expire()
+        seconds += time.time() - started
+    return seconds / (5 * pending)
+
+
+def main():
+    print('%10s %16s %16s' % ('pending', 'future us/call',
+                              'callback us/call'))
+    for pending in PENDING:
+        print('%10d %16.3f %16.3f' % (pending, Run(pending, None) * 1e6,
+                                      Run(pending, Ignore) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
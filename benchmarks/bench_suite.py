@@ -0,0 +1,224 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Benchmark suite of the hot paths: `JsonRpcParsed.Parse` of every
+message type and of invalid input, `JsonRpcMessage.AsJson` and
+`AsWireJson`, error construction, batches of 1 to 10000 messages with
+small and large payloads. Cases named hooked/ run with
+`JsonRpcHistogramHook` installed, the others with no hook.
+Results are written as JSON and compared with a stored baseline, a case
+slower than the baseline by more than the threshold is a regression.
+
+Usage: python benchmarks/bench_suite.py [--quick] [--filter TEXT]
+    [--output FILE] [--baseline FILE] [--threshold PERCENT]
+Exit status is 1 if there is a regression.
+Store a baseline with --output before a change, compare with --baseline
+after it; run both on the same machine.'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcParseError, JsonRpcBatch, JsonRpcHistogramHook, getJsonBackend,\
+    setInstrumentHook  # noqa
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+QUICK_BATCH_SIZES = [1, 100, 1000]
+DEFAULT_THRESHOLD = 10.0
+
+# Cases in run order: list of (name, factory returning function measured)
+CASES = []
+
+
+def Case(name):
+    '''Registers factory of a case, data is built only if the case runs'''
+    def Register(factory):
+        CASES.append((name, factory))
+        return factory
+    return Register
+
+
+def ParseOrError(jsonstr):
+    try:
+        return JsonRpcParsed.Parse(jsonstr)
+    except JsonRpcParseError as e:
+        return e
+
+
+MESSAGES = {
+    'request': JsonRpcMessage.Request(1, 'sum', [1, 2]),
+    'notification': JsonRpcMessage.Notification('alarm', {'level': 1}),
+    'success': JsonRpcMessage.Success(1, {'sum': 3, 'ok': True}),
+    'error': JsonRpcMessage.Error(1, JsonRpcError.InvalidParams('a')),
+}
+
+INVALID = {
+    'json': '{"jsonrpc": "2.0", "method": "sum", "params": [1,',
+    'envelope': '{"jsonrpc": "2.0", "id": 1}',
+    'error-object': '{"jsonrpc": "2.0", "error": {"code": 1}, "id": 1}',
+    'not-object': '[1, 2]',
+}
+
+
+def _RegisterMessageCases():
+    for kind, msg in MESSAGES.items():
+        text = msg.AsWireJson()
+        Case('parse/' + kind)(lambda text=text: lambda: ParseOrError(text))
+    for kind, text in INVALID.items():
+        Case('parse/invalid-' + kind)(
+            lambda text=text: lambda: ParseOrError(text))
+    for kind, msg in MESSAGES.items():
+        Case('asjson/' + kind)(lambda msg=msg: msg.AsJson)
+    for kind, msg in MESSAGES.items():
+        Case('aswirejson/' + kind)(lambda msg=msg: msg.AsWireJson)
+    for kind in ['request', 'success']:
+        text = MESSAGES[kind].AsWireJson()
+        Case('hooked/parse-' + kind)(
+            lambda text=text: lambda: ParseOrError(text))
+        Case('hooked/aswirejson-' + kind)(
+            lambda msg=MESSAGES[kind]: msg.AsWireJson)
+
+
+_RegisterMessageCases()
+
+
+@Case('error/shared')
+def _SharedError():
+    return JsonRpcError.MethodNotFound
+
+
+@Case('error/data')
+def _DataError():
+    return lambda: JsonRpcError.InvalidParams('Missing params: a')
+
+
+@Case('error/registered')
+def _RegisteredError():
+    return lambda: JsonRpcError.Registered(-32601)
+
+
+@Case('error/response-wire')
+def _ErrorResponseWire():
+    return lambda: JsonRpcMessage.Error(
+        7, JsonRpcError.MethodNotFound()).AsWireBytes()
+
+
+def Payload(i, large):
+    if not large:
+        return [i, i + 1]
+    return {'records': [{'id': i * 20 + j, 'name': 'record %d' % j,
+                         'score': j * 0.5, 'tags': ['a', 'b', 'c']}
+                        for j in range(20)]}
+
+
+def Batch(size, large):
+    return JsonRpcBatch([JsonRpcMessage.Request(i, 'store', Payload(i, large))
+                         for i in range(size)])
+
+
+def _RegisterBatchCases(sizes):
+    for payload in ['small', 'large']:
+        large = payload == 'large'
+        for size in sizes:
+            Case('batch-parse/%s/%d' % (payload, size))(
+                lambda size=size, large=large:
+                    (lambda text: lambda: JsonRpcParsed.Parse(text))(
+                        Batch(size, large).AsWireJson()))
+        for size in sizes:
+            Case('batch-encode/%s/%d' % (payload, size))(
+                lambda size=size, large=large: Batch(size, large).AsWireJson)
+
+
+def Measure(func, repeat, target):
+    '''Returns the best nanoseconds per call of func and the number of
+    calls timed at once: about target seconds'''
+    timer = timeit.Timer(func)
+    single = timer.timeit(1)
+    number = max(1, int(target / max(single, 1e-9)))
+    return min(timer.repeat(repeat, number)) / number * 1e9, number
+
+
+def Run(names, repeat, target):
+    results = {}
+    for name, factory in CASES:
+        if name not in names:
+            continue
+        if name.startswith('hooked/'):
+            setInstrumentHook(JsonRpcHistogramHook())
+        try:
+            ns, number = Measure(factory(), repeat, target)
+        finally:
+            setInstrumentHook(None)
+        results[name] = {'ns': ns, 'number': number, 'repeat': repeat}
+        print('%-32s %14.1f ns' % (name, ns))
+        sys.stdout.flush()
+    return results
+
+
+def Compare(results, baseline, threshold):
+    '''Prints changes against baseline.
+    Returns names of the cases slower by more than threshold percent.'''
+    regressions = []
+    print('\n%-32s %14s %14s %9s' % ('case', 'ns', 'baseline ns', 'change'))
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print('%-32s %14.1f %14s %9s' % (name, result['ns'], '-', 'new'))
+            continue
+        change = (result['ns'] - base['ns']) / base['ns'] * 100
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-32s %14.1f %14.1f %+8.1f%%%s' % (name, result['ns'],
+                                                  base['ns'], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer repeats and batch sizes')
+    parser.add_argument('--filter', default='',
+                        help='run cases whose name contains the text')
+    parser.add_argument('--output', help='write results to JSON file')
+    parser.add_argument('--baseline', help='compare with results file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='regression threshold, percent')
+    args = parser.parse_args()
+    _RegisterBatchCases(QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    names = set(name for name, _ in CASES if args.filter in name)
+    repeat, target = (3, 0.05) if args.quick else (5, 0.2)
+    results = Run(names, repeat, target)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'backend': getJsonBackend().name,
+            'time': datetime.datetime.now().isoformat(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = Compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print('\n%d regressions past %.1f%%: %s' % (
+                len(regressions), args.threshold, ', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures constant responses written with `JsonRpcResponseTemplate`
+against the same responses encoded field by field: a fresh error object
+and a result which has no template.
+
+Usage: python benchmarks/bench_templates.py'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError,\
+    JsonRpcResponseTemplate  # noqa
+
+
+class Flag(object):
+    '''Result without a template, encoded as true'''
+    __slots__ = ()
+
+    def _AsDict(self):
+        return True
+
+
+class EmptyList(list):
+    '''Empty list result without a template'''
+    __slots__ = ()
+
+
+def Measure(func, number=200000):
+    '''Returns the best seconds per call of func'''
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    cases = [
+        ('MethodNotFound',
+         lambda: JsonRpcMessage.Error(7, JsonRpcError.MethodNotFound()),
+         lambda: JsonRpcMessage.Error(7, JsonRpcError(-32601,
+                                                      'Method Not Found'))),
+        ('InvalidRequest',
+         lambda: JsonRpcMessage.Error(None, JsonRpcError.InvalidRequest()),
+         lambda: JsonRpcMessage.Error(None, JsonRpcError(-32600,
+                                                         'Invalid Request'))),
+        ('result true',
+         lambda: JsonRpcMessage.Success(7, True),
+         lambda: JsonRpcMessage.Success(7, Flag())),
+        ('result []',
+         lambda: JsonRpcMessage.Success('abc', []),
+         lambda: JsonRpcMessage.Success('abc', EmptyList())),
+    ]
+    template = JsonRpcResponseTemplate.Error(JsonRpcError.MethodNotFound())
+    print('%16s %14s %14s %8s' % ('ns/response', 'encoded', 'template',
+                                  'speedup'))
+    for name, hot, cold in cases:
+        assert hot().AsWireBytes() == cold().AsWireBytes()
+        encodedTime = Measure(lambda: cold().AsWireBytes())
+        templateTime = Measure(lambda: hot().AsWireBytes())
+        print('%16s %14.0f %14.0f %7.1fx' % (name, encodedTime * 1e9,
+                                             templateTime * 1e9,
+                                             encodedTime / templateTime))
+    directTime = Measure(lambda: template.AsWireBytes(7))
+    print('%16s %14s %14.0f' % ('template only', '', directTime * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''Measures latency and throughput of the asyncio transport on localhost
+TCP and on a Unix socket: sequential calls, pipelined calls and batches.
+
+Usage: python benchmarks/bench_transport.py'''
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from pyjsonrpclite import JsonRpcAsyncDispatcher  # noqa
+from pyjsonrpclite.transport import startServer, openConnection  # noqa
+
+SEQUENTIAL_CALLS = 2000
+PIPELINED_CALLS = 20000
+BATCH_SIZE = 100
+
+
+def Echo(value):
+    return value
+
+
+async def Measure(address):
+    dispatcher = JsonRpcAsyncDispatcher()
+    dispatcher.Register(Echo)
+    server = await startServer(dispatcher, **address)
+    if 'port' in address:
+        address = {'host': address['host'],
+                   'port': server.sockets[0].getsockname()[1]}
+    client = await openConnection(**address)
+    started = time.time()
+    for i in range(SEQUENTIAL_CALLS):
+        await client.Call('Echo', [i])
+    latency = (time.time() - started) / SEQUENTIAL_CALLS
+    started = time.time()
+    await asyncio.gather(*[client.Call('Echo', [i])
+                           for i in range(PIPELINED_CALLS)])
+    pipelined = PIPELINED_CALLS / (time.time() - started)
+    started = time.time()
+    await asyncio.gather(*[
+        client.CallBatch([('Echo', [i])] * BATCH_SIZE)
+        for i in range(PIPELINED_CALLS // BATCH_SIZE)])
+    batched = PIPELINED_CALLS / (time.time() - started)
+    client.Close()
+    server.close()
+    await server.wait_closed()
+    return latency, pipelined, batched
+
+
+def main():
+    print('%8s %12s %18s %18s' % ('socket', 'latency us', 'pipelined calls/s',
+                                  'batched calls/s'))
+    with tempfile.TemporaryDirectory() as tempDir:
+        for name, address in [
+                ('tcp', {'host': '127.0.0.1', 'port': 0}),
+                ('unix', {'path': os.path.join(tempDir, 'rpc.sock')})]:
+            latency, pipelined, batched = asyncio.run(Measure(address))
+            print('%8s %12.1f %18.0f %18.0f' % (name, latency * 1e6,
+                                                pipelined, batched))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+from pyjsonrpclite.jsonrpc import version, ABSENT, JsonRpcException,\
+    JsonRpcParseError, JsonRpcMessage, JsonRpcRequest, JsonRpcNotification,\
+    JsonRpcSuccessResponse, JsonRpcErrorResponse, JsonRpcRawJson,\
+    JsonRpcBatch, JsonRpcParsedType, JsonRpcParsed, JsonRpcPeeked,\
+    JsonRpcResponseTemplate, JsonRpcError, JsonRpcErrorCodes,\
+    defaultJsonEncode, getJsonBackend, setJsonBackend, getInstrumentHook,\
+    setInstrumentHook
+from pyjsonrpclite.jsonbackend import JsonBackend, OrjsonBackend,\
+    detectJsonBackend
+from pyjsonrpclite.framing import JsonRpcStreamDecoder,\
+    JsonRpcContentLengthCodec
+from pyjsonrpclite.schema import JsonRpcParamsSchema
+from pyjsonrpclite.dispatcher import JsonRpcMethodError, JsonRpcDispatcher,\
+    JsonRpcExecutorPolicy
+from pyjsonrpclite.instrument import JsonRpcInstrumentHook,\
+    JsonRpcHistogram, JsonRpcHistogramHook
+from pyjsonrpclite.metrics import JsonRpcMetrics
+from pyjsonrpclite.cache import JsonRpcResultCache
+from pyjsonrpclite.bulk import parseMany, countMany
+from pyjsonrpclite.session import JsonRpcCallError, JsonRpcCallTimeout,\
+    JsonRpcClientSession
+
+# asyncio takes long to import, the asyncio dispatcher is imported on its
+# first use
+_ASYNC_NAMES = ('JsonRpcAsyncDispatcher', 'JsonRpcAsyncConnection')
+
+
+def __getattr__(name):
+    if name not in _ASYNC_NAMES:
+        raise AttributeError("module 'pyjsonrpclite' has no attribute " +
+                             repr(name))
+    from pyjsonrpclite import asyncdispatcher
+    return getattr(asyncdispatcher, name)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_ASYNC_NAMES))
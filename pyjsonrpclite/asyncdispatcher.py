@@ -0,0 +1,230 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import inspect
+
+from pyjsonrpclite.jsonrpc import ABSENT, JsonRpcParsed,\
+    JsonRpcParsedType, JsonRpcMessage, JsonRpcBatch, JsonRpcError,\
+    JsonRpcErrorCodes
+from pyjsonrpclite.dispatcher import JsonRpcMethodError, JsonRpcDispatcher
+from pyjsonrpclite.metrics import UNKNOWN_METHOD
+
+
+class _Unlimited(object):
+    '''Async context manager used when there is no concurrency limit'''
+    __slots__ = ()
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, excType, exc, tb):
+        return False
+
+
+_UNLIMITED = _Unlimited()
+
+
+async def _RunPolicy(policy, plan, params):
+    '''Runs the handler the way `JsonRpcExecutorPolicy` says, awaits its
+    result. On timeout the call is cancelled if it has not started yet, a
+    started one runs to the end in its worker.'''
+    if policy.executor is None:
+        try:
+            result = plan.Call(params)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except asyncio.CancelledError:
+            # an Exception before Python 3.8, it is not a handler failure
+            raise
+        except Exception as e:
+            raise policy.Failure(e)
+    future = asyncio.wrap_future(policy.Submit(plan, params))
+    try:
+        return policy.Result(await asyncio.wait_for(future, policy.timeout))
+    except asyncio.TimeoutError:
+        raise JsonRpcMethodError(policy.timeoutError)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        raise policy.Failure(e)
+
+
+class _Semaphore(object):
+    '''Async context manager letting maxConcurrency callers in at once.
+    The asyncio semaphore is created in the running loop on first use: a
+    dispatcher may be made before the loop runs, and used by a later one.'''
+    __slots__ = ('maxConcurrency', '_loop', '_semaphore')
+
+    def __init__(self, maxConcurrency):
+        self.maxConcurrency = maxConcurrency
+        self._loop = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._semaphore = asyncio.Semaphore(self.maxConcurrency)
+            self._loop = loop
+        await self._semaphore.acquire()
+        return None
+
+    async def __aexit__(self, excType, exc, tb):
+        self._semaphore.release()
+        return False
+
+
+def _Limiter(maxConcurrency):
+    if maxConcurrency is None:
+        return _UNLIMITED
+    if maxConcurrency < 1:
+        raise ValueError('maxConcurrency should be positive')
+    return _Semaphore(maxConcurrency)
+
+
+class JsonRpcAsyncDispatcher(JsonRpcDispatcher):
+    '''asyncio dispatcher: coroutine handlers of one message or of a batch
+    run concurrently, plain handlers are called in the event loop.
+    Handlers are registered the way `JsonRpcDispatcher` does, it can still
+    dispatch synchronously, coroutine handlers excluded. Blocking and CPU
+    bound handlers are registered with `JsonRpcExecutorPolicy`, the event
+    loop awaits their results.
+    Params:
+        maxConcurrency -- int, max handlers running at once across all
+            connections, None for no limit,
+        metrics -- `JsonRpcMetrics` measuring calls of handlers, a call is
+            in flight while it waits for the concurrency limits too'''
+    def __init__(self, maxConcurrency=None, metrics=None):
+        JsonRpcDispatcher.__init__(self, metrics)
+        self._limiter = _Limiter(maxConcurrency)
+
+    def Connection(self, maxConcurrency=None):
+        '''Returns `JsonRpcAsyncConnection` dispatching messages of one
+        connection.
+        Params:
+            maxConcurrency -- int, max handlers of the connection running at
+                once, None for no limit'''
+        return JsonRpcAsyncConnection(self, maxConcurrency)
+
+    async def CallAsync(self, method, params=ABSENT, limiter=_UNLIMITED):
+        '''Calls handler of method with params and awaits its result when
+        the concurrency limits allow.
+        Params:
+            limiter -- async context manager limiting the caller
+                concurrency, the global limit is applied anyway
+        Raises `JsonRpcMethodError` if the method is not found, params are
+        invalid or the handler raises it.
+        Returns handler result, `JsonRpcRawJson` of a cached method.'''
+        metrics = self.metrics
+        if metrics is None:
+            return await self._CallAsync(method, params, limiter)
+        name = method if method in self._plans else UNKNOWN_METHOD
+        started = metrics.Start(name)
+        try:
+            result = await self._CallAsync(method, params, limiter)
+        except asyncio.CancelledError:
+            # nobody waits for the response, the call is over anyway
+            metrics.Finish(name, started)
+            raise
+        except JsonRpcMethodError as e:
+            metrics.Finish(name, started, e.rpcError.code)
+            raise
+        except Exception:
+            metrics.Finish(name, started, JsonRpcErrorCodes.INTERNAL_ERROR)
+            raise
+        metrics.Finish(name, started)
+        return result
+
+    async def _CallAsync(self, method, params, limiter):
+        plan = self._plans.get(method)
+        if plan is None:
+            raise JsonRpcMethodError(JsonRpcError.MethodNotFound())
+        if plan.schema is not None:
+            plan.Validate(params)
+        cache = plan.cache
+        if cache is not None:
+            # a hit takes no concurrency slot
+            key = cache.Key(method, params, plan.positionalNames)
+            result = cache.Get(key)
+            if result is not None:
+                return result
+        # the connection slot is taken first, so a connection waiting for
+        # its own slot holds no global one
+        async with limiter:
+            async with self._limiter:
+                if plan.policy is not None:
+                    result = await _RunPolicy(plan.policy, plan, params)
+                else:
+                    result = plan.Call(params)
+                    if inspect.isawaitable(result):
+                        result = await result
+        if cache is not None:
+            return cache.Put(key, result)
+        return result
+
+    async def DispatchAsync(self, parsed, limiter=_UNLIMITED):
+        '''Handles result of `JsonRpcParsed.Parse` like
+        `JsonRpcDispatcher.Dispatch` does, elements of a batch are
+        handled concurrently, responses keep the batch order.'''
+        if isinstance(parsed, list):
+            responses = await asyncio.gather(
+                *[self.DispatchAsync(item, limiter) for item in parsed])
+            responses = [response for response in responses
+                         if response is not None]
+            if not responses:
+                return None
+            return JsonRpcBatch(responses)
+        parsedType = parsed.parsedType
+        if parsedType == JsonRpcParsedType.REQUEST:
+            msg = parsed.payload
+            try:
+                result = await self.CallAsync(msg.method, msg.params, limiter)
+            except asyncio.CancelledError:
+                raise
+            except JsonRpcMethodError as e:
+                return JsonRpcMessage.Error(msg.id, e.rpcError)
+            except Exception as e:
+                return JsonRpcMessage.Error(
+                    msg.id, JsonRpcError.InternalError(str(e)))
+            return JsonRpcMessage.Success(msg.id, result)
+        if parsedType == JsonRpcParsedType.NOTIFICATION:
+            msg = parsed.payload
+            try:
+                await self.CallAsync(msg.method, msg.params, limiter)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # notifications are never answered
+                pass
+            return None
+        if parsedType == JsonRpcParsedType.INVALID:
+            return parsed.payload
+        return None
+
+    async def DispatchJsonAsync(self, jsonstr, limiter=_UNLIMITED):
+        '''Parses json formatted string and handles it like `DispatchAsync`
+        does. A message which can not be parsed is answered with the parse
+        error.'''
+        return await self.DispatchAsync(JsonRpcParsed.TryParse(jsonstr),
+                                        limiter)
+
+
+class JsonRpcAsyncConnection(object):
+    '''Dispatches messages of one connection with `JsonRpcAsyncDispatcher`
+    under the connection concurrency limit.
+    Params:
+        dispatcher -- `JsonRpcAsyncDispatcher`,
+        maxConcurrency -- int, max handlers of the connection running at
+            once, None for no limit'''
+    def __init__(self, dispatcher, maxConcurrency=None):
+        self.dispatcher = dispatcher
+        self._limiter = _Limiter(maxConcurrency)
+
+    async def Dispatch(self, parsed):
+        '''See `JsonRpcAsyncDispatcher.DispatchAsync`'''
+        return await self.dispatcher.DispatchAsync(parsed, self._limiter)
+
+    async def DispatchJson(self, jsonstr):
+        '''See `JsonRpcAsyncDispatcher.DispatchJsonAsync`'''
+        return await self.dispatcher.DispatchJsonAsync(jsonstr,
+                                                       self._limiter)
@@ -0,0 +1,162 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+'''Bulk parsing of recorded NDJSON traffic: one message per line.
+Input is split into chunks on line boundaries, chunks are parsed in a
+process pool. A file is memory-mapped, workers map it too and get only the
+bounds of their chunks.'''
+import collections
+import mmap
+import os
+from concurrent import futures
+
+from pyjsonrpclite.jsonrpc import JsonRpcParsed, JsonRpcParsedType,\
+    JsonRpcParseError
+
+# Bytes of input parsed by one task
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def _ParseLines(lines):
+    '''Returns results of non-blank lines'''
+    return [JsonRpcParsed.TryParse(line) for line in lines if line.strip()]
+
+
+def _CountLines(lines):
+    '''Returns dict counting messages of lines by (type, method)'''
+    counts = collections.Counter()
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            peeked = JsonRpcParsed.Peek(line)
+        except JsonRpcParseError:
+            counts[(JsonRpcParsedType.INVALID, None)] += 1
+            continue
+        if not isinstance(peeked, list):
+            peeked = [peeked]
+        for item in peeked:
+            if item.method is None or isinstance(item.method, str):
+                counts[(item.parsedType, item.method)] += 1
+            else:
+                # method names are strings, others may be unhashable
+                counts[(JsonRpcParsedType.INVALID, None)] += 1
+    return dict(counts)
+
+
+def _ChunkLines(path, start, end):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # \r\n line ends are accepted too
+            return mapped[start:end].splitlines()
+
+
+def _ParseFileChunk(path, start, end):
+    return _ParseLines(_ChunkLines(path, start, end))
+
+
+def _CountFileChunk(path, start, end):
+    return _CountLines(_ChunkLines(path, start, end))
+
+
+def _FileChunks(path, chunkSize):
+    '''Yields tuples (path, start, end) of file chunks, every chunk ends
+    with a line'''
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            while start < size:
+                end = size
+                if start + chunkSize < size:
+                    newline = mapped.find(b'\n', start + chunkSize - 1)
+                    if newline >= 0:
+                        end = newline + 1
+                yield (path, start, end)
+                start = end
+
+
+def _LineChunks(lines, chunkSize):
+    '''Yields tuples of one list of lines, about chunkSize long'''
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunkSize:
+            yield (chunk,)
+            chunk = []
+            size = 0
+    if chunk:
+        yield (chunk,)
+
+
+def _Tasks(source, chunkSize, fileFunc, linesFunc):
+    if isinstance(source, (str, bytes, os.PathLike)):
+        return fileFunc, _FileChunks(source, chunkSize)
+    return linesFunc, _LineChunks(source, chunkSize)
+
+
+def _RunOrdered(func, tasks, workers, executor):
+    '''Yields results of func for tasks in the order of tasks. At most two
+    tasks per worker are in flight, so memory stays bounded.'''
+    if executor is None:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            for task in tasks:
+                yield func(*task)
+            return
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = futures.ProcessPoolExecutor(workers)
+    window = 2 * (workers or os.cpu_count() or 1)
+    pending = collections.deque()
+    try:
+        for task in tasks:
+            pending.append(executor.submit(func, *task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if ownExecutor:
+            executor.shutdown(wait=True)
+
+
+def parseMany(source, workers=None, chunkSize=DEFAULT_CHUNK_SIZE,
+              executor=None):
+    '''Parses NDJSON messages in a process pool, like
+    `JsonRpcParsed.TryParse` does: invalid messages are reported as
+    `JsonRpcParsedType.INVALID` results. Blank lines are skipped.
+    Params:
+        source -- file path or iterable of messages: str or bytes,
+        workers -- int, worker processes, the CPU count if None; 1 parses
+            in this process,
+        chunkSize -- int, bytes of input parsed by one task,
+        executor -- concurrent.futures.Executor used instead of a pool of
+            workers, it is not shut down
+    Yields `JsonRpcParsed` or list of them for a batch, in the input
+    order.'''
+    func, tasks = _Tasks(source, chunkSize, _ParseFileChunk, _ParseLines)
+    for results in _RunOrdered(func, tasks, workers, executor):
+        for result in results:
+            yield result
+
+
+def countMany(source, workers=None, chunkSize=DEFAULT_CHUNK_SIZE,
+              executor=None):
+    '''Counts NDJSON messages by type and method in a process pool. Only
+    the envelope is decoded, see `JsonRpcParsed.Peek`. Elements of a batch
+    are counted one by one. Params are the ones of `parseMany`.
+    Returns dict {(`JsonRpcParsedType`, method): count}, method is None
+    for responses and invalid messages. A message whose method is not
+    a string is counted as invalid.'''
+    func, tasks = _Tasks(source, chunkSize, _CountFileChunk, _CountLines)
+    total = collections.Counter()
+    for counts in _RunOrdered(func, tasks, workers, executor):
+        total.update(counts)
+    return dict(total)
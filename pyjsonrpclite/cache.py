@@ -0,0 +1,132 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from pyjsonrpclite.jsonrpc import ABSENT, JsonRpcRawJson, defaultJsonEncode,\
+    getJsonBackend
+
+# Canonical params text of a cache key, built once: json.dumps builds an
+# encoder on every call when any option is given
+_encodeKey = json.JSONEncoder(sort_keys=True, separators=(',', ':'),
+                              default=defaultJsonEncode).encode
+
+
+class JsonRpcResultCache(object):
+    '''Results of idempotent methods, see `JsonRpcDispatcher.Register`.
+    A result is kept encoded, as `JsonRpcRawJson`: a hit calls no handler
+    and encodes nothing, the response writes the cached text with the id of
+    the request. Errors are never cached.
+    The key is the method and the params in a canonical form: named params
+    are sorted, positional ones are named after the handler params when the
+    handler takes them by name too, so [1, 2] and {"b": 2, "a": 1} share
+    the result.
+    One cache may be shared by several methods.
+    Params:
+        maxSize -- int, max results kept, the least recently used one is
+            dropped first,
+        ttl -- seconds a result is kept, None for no limit,
+        clock -- function returning current time in seconds'''
+    def __init__(self, maxSize=1024, ttl=None, clock=time.monotonic):
+        if maxSize < 1:
+            raise ValueError('maxSize should be positive')
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires, JsonRpcRawJson)
+        self._keysByMethod = {}
+        self._lock = threading.Lock()
+        self._backend = None
+        self._encode = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def Key(self, method, params, names=None):
+        '''Returns cache key of the call, None if params can not be
+        encoded.
+        Params:
+            names -- tuple of the handler positional param names, None if
+                positional params can not be passed by name'''
+        if params is ABSENT or params is None:
+            return (method, None)
+        if type(params) is list and names is not None and \
+                len(params) <= len(names):
+            params = dict(zip(names, params))
+        try:
+            text = _encodeKey(params)
+        except (TypeError, ValueError):
+            return None
+        return (method, text)
+
+    def Get(self, key):
+        '''Returns cached `JsonRpcRawJson` result, None on a miss'''
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] is not None and entry[0] <= self._clock():
+                self._Remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def Put(self, key, result):
+        '''Caches the result of the call.
+        Returns result encoded to `JsonRpcRawJson`, the result as it is if
+        it can not be encoded or key is None.'''
+        if key is None:
+            return result
+        if type(result) is not JsonRpcRawJson:
+            try:
+                result = JsonRpcRawJson(self._Encoder()(result))
+            except (TypeError, ValueError):
+                return result
+        expires = None
+        if self.ttl is not None:
+            expires = self._clock() + self.ttl
+        with self._lock:
+            entries = self._entries
+            if key not in entries:
+                self._keysByMethod.setdefault(key[0], set()).add(key)
+            entries[key] = (expires, result)
+            entries.move_to_end(key)
+            while len(entries) > self.maxSize:
+                self._Remove(next(iter(entries)))
+        return result
+
+    def Invalidate(self, method=None):
+        '''Drops cached results of method, all results if method is None.
+        Returns number of results dropped.'''
+        with self._lock:
+            if method is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._keysByMethod.clear()
+                return dropped
+            keys = self._keysByMethod.pop(method, ())
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def _Remove(self, key):
+        del self._entries[key]
+        keys = self._keysByMethod[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keysByMethod[key[0]]
+
+    def _Encoder(self):
+        # the encoder is built again when the json backend changes
+        backend = getJsonBackend()
+        if backend is not self._backend:
+            self._encode = backend.Encoder(True, defaultJsonEncode)
+            self._backend = backend
+        return self._encode
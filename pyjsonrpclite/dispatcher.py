@@ -0,0 +1,366 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import inspect
+from concurrent import futures
+
+from pyjsonrpclite.jsonrpc import ABSENT, JsonRpcException,\
+    JsonRpcParsed, JsonRpcParsedType, JsonRpcMessage, JsonRpcBatch,\
+    JsonRpcRawJson, JsonRpcError, JsonRpcErrorCodes, defaultJsonEncode,\
+    getJsonBackend
+from pyjsonrpclite.metrics import UNKNOWN_METHOD
+from pyjsonrpclite.schema import JsonRpcParamsSchema
+
+
+class JsonRpcMethodError(JsonRpcException):
+    """Raised by a method handler to answer with the error.
+    Params:
+        rpcError - `JsonRpcError`"""
+    def __init__(self, rpcError):
+        JsonRpcException.__init__(self, rpcError)
+        self.rpcError = rpcError
+
+
+_POSITIONAL = (inspect.Parameter.POSITIONAL_ONLY,
+               inspect.Parameter.POSITIONAL_OR_KEYWORD)
+
+
+class _MethodPlan(object):
+    '''Binding plan of a handler built from its signature once.
+    Params are checked against the plan before the call, so TypeError
+    raised inside the handler is not taken for invalid params.'''
+    __slots__ = ('handler', 'minArgs', 'maxArgs', 'names', 'required',
+                 'byPosition', 'byName', 'positionalNames', 'policy',
+                 'cache', 'schema')
+
+    def __init__(self, handler, policy=None, cache=None, schema=None):
+        self.handler = handler
+        self.policy = policy
+        self.cache = cache
+        self.schema = schema
+        try:
+            signature = inspect.signature(handler)
+        except (TypeError, ValueError):
+            # no signature: params are passed as they are
+            self.minArgs, self.maxArgs = 0, None
+            self.names, self.required = None, frozenset()
+            self.byPosition = self.byName = True
+            self.positionalNames = None
+            return
+        minArgs = maxArgs = 0
+        names = set()
+        required = set()
+        positionalNames = []
+        positionalOnly = keywordOnly = False
+        for param in signature.parameters.values():
+            isRequired = param.default is inspect.Parameter.empty
+            if param.kind in _POSITIONAL:
+                maxArgs += 1
+                if positionalNames is not None:
+                    positionalNames.append(param.name)
+                if isRequired:
+                    minArgs = maxArgs
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                maxArgs = None
+            elif param.kind == inspect.Parameter.VAR_KEYWORD:
+                names = None
+            elif param.kind == inspect.Parameter.POSITIONAL_ONLY:
+                positionalOnly = positionalOnly or isRequired
+                positionalNames = None
+            else:
+                if names is not None:
+                    names.add(param.name)
+                if isRequired:
+                    required.add(param.name)
+                    if param.kind == inspect.Parameter.KEYWORD_ONLY:
+                        keywordOnly = True
+        self.minArgs = minArgs
+        self.maxArgs = maxArgs
+        self.names = frozenset(names) if names is not None else None
+        self.required = frozenset(required)
+        # required positional-only params can not be passed by name,
+        # required keyword-only ones can not be passed by position
+        self.byPosition = not keywordOnly
+        self.byName = not positionalOnly
+        # names positional params are known by in the result cache
+        self.positionalNames = tuple(positionalNames) \
+            if positionalNames is not None else None
+
+    def __reduce__(self):
+        # shipped to worker processes without the policy
+        return (_WorkerPlan, (self.handler,))
+
+    def Call(self, params):
+        '''Calls the handler with params: list, dict or `ABSENT`.
+        Raises `JsonRpcMethodError` with InvalidParams error if params do
+        not fit the signature.
+        Returns handler result.'''
+        if params is ABSENT or params is None:
+            if self.minArgs or self.required:
+                raise self._Invalid('Params expected')
+            return self.handler()
+        paramsType = type(params)
+        if paramsType is list:
+            count = len(params)
+            if count < self.minArgs or \
+                    (self.maxArgs is not None and count > self.maxArgs) or \
+                    not self.byPosition:
+                raise self._Invalid(self._CountMismatch(count))
+            return self.handler(*params)
+        if paramsType is dict:
+            if (self.names is not None and
+                    not self.names.issuperset(params)) or \
+                    not self.required.issubset(params) or not self.byName:
+                raise self._Invalid(self._NamesMismatch(params))
+            return self.handler(**params)
+        raise self._Invalid('Params should be an array or an object')
+
+    def Validate(self, params):
+        '''Checks params against the schema.
+        Raises `JsonRpcMethodError` with InvalidParams error, the path and
+        the problem in its data, if they do not match it.'''
+        problem = self.schema.Validate(None if params is ABSENT else params)
+        if problem is not None:
+            raise self._Invalid(problem)
+
+    @staticmethod
+    def _Invalid(data):
+        return JsonRpcMethodError(JsonRpcError.InvalidParams(data))
+
+    def _CountMismatch(self, count):
+        if not self.byPosition:
+            return 'Params should be an object'
+        if self.maxArgs is None:
+            return 'Expected at least %d params, got %d' % (self.minArgs,
+                                                            count)
+        if self.minArgs == self.maxArgs:
+            return 'Expected %d params, got %d' % (self.minArgs, count)
+        return 'Expected %d to %d params, got %d' % (self.minArgs,
+                                                     self.maxArgs, count)
+
+    def _NamesMismatch(self, params):
+        if not self.byName:
+            return 'Params should be an array'
+        missing = sorted(self.required.difference(params))
+        if missing:
+            return 'Missing params: ' + ', '.join(missing)
+        return 'Unexpected params: ' + \
+            ', '.join(sorted(set(params).difference(self.names)))
+
+
+# Plans of a worker process, keyed by handler
+_workerPlans = {}
+_encodeResult = None
+
+
+def _WorkerPlan(handler):
+    plan = _workerPlans.get(handler)
+    if plan is None:
+        plan = _workerPlans[handler] = _MethodPlan(handler)
+    return plan
+
+
+def _CallEncoded(plan, params):
+    '''Runs in a worker process: calls the handler and returns its result
+    encoded, a str is pickled much faster than a tree of objects.'''
+    global _encodeResult
+    if _encodeResult is None:
+        _encodeResult = getJsonBackend().Encoder(True, defaultJsonEncode)
+    return _encodeResult(plan.Call(params))
+
+
+class JsonRpcExecutorPolicy(object):
+    '''How handler of a method is run, see `JsonRpcDispatcher.Register`.
+    Params:
+        executor -- concurrent.futures.Executor running the handler, None to
+            call it inline. With ProcessPoolExecutor the handler should be
+            picklable: a module level function; its result is encoded to
+            json in the worker and returned as `JsonRpcRawJson`,
+        timeout -- seconds to wait for the result, None to wait forever,
+        timeoutError -- `JsonRpcError` answered on timeout,
+            InternalError by default,
+        failureError -- `JsonRpcError` answered when the handler raises
+            anything but `JsonRpcMethodError` or the executor breaks,
+            InternalError with the exception text by default'''
+    __slots__ = ('executor', 'timeout', 'timeoutError', 'failureError',
+                 'encoded')
+
+    def __init__(self, executor=None, timeout=None, timeoutError=None,
+                 failureError=None):
+        if timeout is not None and executor is None:
+            raise JsonRpcException('Timeout needs an executor')
+        self.executor = executor
+        self.timeout = timeout
+        self.timeoutError = timeoutError
+        if timeoutError is None:
+            self.timeoutError = JsonRpcError.InternalError('Timeout')
+        self.failureError = failureError
+        self.encoded = isinstance(executor, futures.ProcessPoolExecutor)
+
+    def Submit(self, plan, params):
+        '''Returns concurrent.futures.Future of the handler result'''
+        if self.encoded:
+            return self.executor.submit(_CallEncoded, plan, params)
+        return self.executor.submit(plan.Call, params)
+
+    def Result(self, result):
+        if self.encoded:
+            return JsonRpcRawJson(result)
+        return result
+
+    def Failure(self, e):
+        '''Returns `JsonRpcMethodError` to raise for exception e of the
+        handler or the executor'''
+        if isinstance(e, JsonRpcMethodError):
+            return e
+        if self.failureError is not None:
+            return JsonRpcMethodError(self.failureError)
+        return JsonRpcMethodError(JsonRpcError.InternalError(str(e)))
+
+    def Run(self, plan, params):
+        '''Runs the handler, waits for its result.'''
+        if self.executor is None:
+            try:
+                return plan.Call(params)
+            except Exception as e:
+                raise self.Failure(e)
+        future = self.Submit(plan, params)
+        try:
+            return self.Result(future.result(self.timeout))
+        except futures.TimeoutError:
+            future.cancel()
+            raise JsonRpcMethodError(self.timeoutError)
+        except Exception as e:
+            raise self.Failure(e)
+
+
+class JsonRpcDispatcher(object):
+    '''Calls method handlers registered by method name for parsed messages.
+    The signature of a handler is analyzed once at registration, list or
+    dict params are bound by that plan at call time.
+    A handler returns the result or raises `JsonRpcMethodError` to answer
+    with an error, other exceptions are answered with InternalError.
+    A handler is called inline unless `JsonRpcExecutorPolicy` is given.
+    Results of idempotent methods may be kept by `JsonRpcResultCache`.
+    Params:
+        metrics -- `JsonRpcMetrics` measuring calls of handlers, None to
+            measure nothing'''
+    def __init__(self, metrics=None):
+        self._plans = {}
+        self.metrics = metrics
+
+    def Register(self, handler, name=None, policy=None, cache=None,
+                 schema=None):
+        '''Registers handler of method name, the handler name by default.
+        Can be used as a decorator.
+        Params:
+            policy -- `JsonRpcExecutorPolicy` running the handler, None to
+                call it inline,
+            cache -- `JsonRpcResultCache` keeping results of the method,
+                None to call the handler every time. Only an idempotent
+                method should be cached,
+            schema -- dict of JSON Schema or `JsonRpcParamsSchema`
+                checking params before the handler is called, omitted
+                params are checked as null
+        Raises `JsonRpcException` if the schema is not supported.
+        Returns handler.'''
+        if name is None:
+            name = handler.__name__
+        if schema is not None and not isinstance(schema,
+                                                 JsonRpcParamsSchema):
+            schema = JsonRpcParamsSchema(schema)
+        self._plans[name] = _MethodPlan(handler, policy, cache, schema)
+        return handler
+
+    def Unregister(self, name):
+        '''Removes handler of method name if it is registered'''
+        self._plans.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._plans
+
+    def Call(self, method, params=ABSENT):
+        '''Calls handler of method with params.
+        Raises `JsonRpcMethodError` if the method is not found, params are
+        invalid or the handler raises it.
+        Returns handler result, `JsonRpcRawJson` of a cached method.'''
+        metrics = self.metrics
+        if metrics is None:
+            return self._Call(method, params)
+        name = method if method in self._plans else UNKNOWN_METHOD
+        started = metrics.Start(name)
+        try:
+            result = self._Call(method, params)
+        except JsonRpcMethodError as e:
+            metrics.Finish(name, started, e.rpcError.code)
+            raise
+        except Exception:
+            metrics.Finish(name, started, JsonRpcErrorCodes.INTERNAL_ERROR)
+            raise
+        metrics.Finish(name, started)
+        return result
+
+    def _Call(self, method, params):
+        plan = self._plans.get(method)
+        if plan is None:
+            raise JsonRpcMethodError(JsonRpcError.MethodNotFound())
+        if plan.schema is not None:
+            plan.Validate(params)
+        cache = plan.cache
+        if cache is not None:
+            key = cache.Key(method, params, plan.positionalNames)
+            result = cache.Get(key)
+            if result is not None:
+                return result
+        if plan.policy is None:
+            result = plan.Call(params)
+        else:
+            result = plan.policy.Run(plan, params)
+        if cache is not None:
+            return cache.Put(key, result)
+        return result
+
+    def Dispatch(self, parsed):
+        '''Handles result of `JsonRpcParsed.Parse`.
+        Params:
+            parsed -- `JsonRpcParsed` or list of `JsonRpcParsed`
+        Returns response: `JsonRpcSuccessResponse` or
+        `JsonRpcErrorResponse`, `JsonRpcBatch` for a list, the error
+        response of an invalid message. Returns None for notifications,
+        responses and a list of them.'''
+        if isinstance(parsed, list):
+            responses = []
+            for item in parsed:
+                response = self.Dispatch(item)
+                if response is not None:
+                    responses.append(response)
+            if not responses:
+                return None
+            return JsonRpcBatch(responses)
+        parsedType = parsed.parsedType
+        if parsedType == JsonRpcParsedType.REQUEST:
+            msg = parsed.payload
+            try:
+                result = self.Call(msg.method, msg.params)
+            except JsonRpcMethodError as e:
+                return JsonRpcMessage.Error(msg.id, e.rpcError)
+            except Exception as e:
+                return JsonRpcMessage.Error(
+                    msg.id, JsonRpcError.InternalError(str(e)))
+            return JsonRpcMessage.Success(msg.id, result)
+        if parsedType == JsonRpcParsedType.NOTIFICATION:
+            msg = parsed.payload
+            try:
+                self.Call(msg.method, msg.params)
+            except Exception:
+                # notifications are never answered
+                pass
+            return None
+        if parsedType == JsonRpcParsedType.INVALID:
+            return parsed.payload
+        return None
+
+    def DispatchJson(self, jsonstr):
+        '''Parses json formatted string and handles it like `Dispatch`
+        does. A message which can not be parsed is answered with the
+        parse error.'''
+        return self.Dispatch(JsonRpcParsed.TryParse(jsonstr))
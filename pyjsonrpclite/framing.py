@@ -0,0 +1,350 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+
+from pyjsonrpclite.jsonrpc import JsonRpcParsed, JsonRpcParsedType,\
+    JsonRpcMessage, JsonRpcError
+
+
+# Default max size of one message in bytes
+DEFAULT_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+_NON_SPACE = re.compile(br'[^ \t\r\n]')
+_STRUCTURE = re.compile(br'[{}\[\]"]')
+_STRING_END = re.compile(br'["\\]')
+_TOKEN_END = re.compile(br'[ \t\r\n{}\[\]"]')
+
+_OPEN = frozenset(b'{[')
+_CLOSE = frozenset(b'}]')
+_QUOTE = ord(b'"')
+_BACKSLASH = ord(b'\\')
+_NEWLINE = b'\n'
+
+
+def _InvalidParsed(rpcError):
+    '''Returns `JsonRpcParsed` reporting a message which can not be parsed'''
+    return JsonRpcParsed(JsonRpcParsedType.INVALID,
+                         JsonRpcMessage.Error(None, rpcError))
+
+
+def _ParseMessage(data):
+    '''Parses one framed message, errors are reported as INVALID result.
+    Returns `JsonRpcParsed` or list of `JsonRpcParsed` for a batch.'''
+    return JsonRpcParsed.TryParse(data)
+
+
+class JsonRpcStreamDecoder(object):
+    '''Incremental decoder of a JSON-RPC 2.0 message stream.
+    Chunks of any size are pushed with `Feed`, each message is parsed as
+    soon as its last byte arrives. Every byte is scanned once.
+    Messages are either separated by newlines (NDJSON) or follow each
+    other back to back with optional whitespace in between.
+    Every result is the one `JsonRpcParsed.Parse` returns: `JsonRpcParsed`
+    or a list of them for a batch. A message which can not be parsed or is
+    longer than maxMessageSize is reported as `JsonRpcParsedType.INVALID`
+    result, its bytes are dropped as they arrive, and decoding goes on
+    with the next message.
+    Params:
+        newlineDelimited -- bool, messages are separated by newlines,
+        maxMessageSize -- int, max size of one message in bytes'''
+    def __init__(self, newlineDelimited=False,
+                 maxMessageSize=DEFAULT_MAX_MESSAGE_SIZE):
+        self.newlineDelimited = newlineDelimited
+        self.maxMessageSize = maxMessageSize
+        self._buf = bytearray()
+        self._pos = 0          # next byte to scan
+        self._start = -1       # start of the current message, -1 if none
+        self._depth = 0
+        self._inString = False
+        self._tooLarge = False  # bytes of the current message are dropped
+
+    def Feed(self, chunk):
+        '''Adds received bytes.
+        Params:
+            chunk -- bytes, bytearray or memoryview
+        Returns list of the results of the messages completed by chunk.'''
+        self._buf += chunk
+        results = []
+        if self.newlineDelimited:
+            self._ScanLines(results)
+        else:
+            self._ScanValues(results)
+        self._Compact()
+        return results
+
+    def Close(self):
+        '''Ends the stream, parses the last message if it is complete.
+        Returns list of results, the last incomplete message is reported as
+        `JsonRpcParsedType.INVALID` result.'''
+        results = []
+        if self.newlineDelimited:
+            results = self.Feed(_NEWLINE)
+        elif self._start >= 0:
+            if self._depth == 0 and not self._inString:
+                # a top level scalar ends with the stream
+                self._Emit(len(self._buf), results)
+            elif self._tooLarge:
+                results.append(self._TooLargeParsed())
+            else:
+                results.append(_InvalidParsed(
+                    JsonRpcError.ParseError('Incomplete message')))
+        self._buf = bytearray()
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._inString = False
+        self._tooLarge = False
+        return results
+
+    def Encode(self, msg, escape=True):
+        '''Returns message ready to be sent, newline terminated in newline
+        delimited mode.
+        Params:
+            msg -- `JsonRpcMessage` or `JsonRpcBatch`
+        Returns empty bytes if there is nothing to send.'''
+        body = msg.AsWireBytes(escape)
+        if body and self.newlineDelimited:
+            return body + _NEWLINE
+        return body
+
+    def _TooLargeParsed(self):
+        return _InvalidParsed(JsonRpcError.InvalidRequest(
+            'Message exceeds %d bytes' % self.maxMessageSize))
+
+    def _Emit(self, end, results):
+        '''Parses the current message ending at end'''
+        if self._tooLarge or end - self._start > self.maxMessageSize:
+            results.append(self._TooLargeParsed())
+        else:
+            with memoryview(self._buf) as view:
+                with view[self._start:end] as message:
+                    results.append(_ParseMessage(message))
+        self._start = -1
+        self._tooLarge = False
+
+    def _Compact(self):
+        '''Drops consumed bytes and bytes of too large message'''
+        buf = self._buf
+        if self._start >= 0 and \
+                len(buf) - self._start > self.maxMessageSize:
+            self._tooLarge = True
+        if self._tooLarge:
+            cut = self._pos
+        elif self._start >= 0:
+            cut = self._start
+        else:
+            cut = self._pos
+        if cut:
+            del buf[:cut]
+            self._pos -= cut
+            if self._start >= 0:
+                self._start = max(0, self._start - cut)
+
+    def _ScanLines(self, results):
+        buf = self._buf
+        if self._start < 0:
+            self._start = self._pos
+        while True:
+            newline = buf.find(_NEWLINE, self._pos)
+            if newline < 0:
+                self._pos = len(buf)
+                return
+            self._pos = newline + 1
+            # blank lines are skipped
+            if self._tooLarge or \
+                    _NON_SPACE.search(buf, self._start, newline) is not None:
+                self._Emit(newline, results)
+            self._start = self._pos
+
+    def _ScanValues(self, results):
+        buf = self._buf
+        size = len(buf)
+        pos = self._pos
+        while pos < size:
+            if self._start < 0:
+                found = _NON_SPACE.search(buf, pos)
+                if found is None:
+                    pos = size
+                    break
+                pos = found.start()
+                self._start = pos
+                first = buf[pos]
+                if first in _OPEN:
+                    self._depth = 1
+                    pos += 1
+                elif first == _QUOTE:
+                    self._inString = True
+                    pos += 1
+                elif first in _CLOSE:
+                    pos += 1
+                    self._Emit(pos, results)
+            elif self._inString:
+                found = _STRING_END.search(buf, pos)
+                if found is None:
+                    pos = size
+                    break
+                pos = found.start()
+                if buf[pos] == _BACKSLASH:
+                    if pos + 1 == size:
+                        # the escaped character is not received yet
+                        break
+                    pos += 2
+                    continue
+                pos += 1
+                self._inString = False
+                if self._depth == 0:
+                    self._Emit(pos, results)
+            elif self._depth == 0:
+                # top level scalar, it ends with whitespace or structure
+                found = _TOKEN_END.search(buf, pos)
+                if found is None:
+                    pos = size
+                    break
+                pos = found.start()
+                self._Emit(pos, results)
+            else:
+                found = _STRUCTURE.search(buf, pos)
+                if found is None:
+                    pos = size
+                    break
+                pos = found.start()
+                char = buf[pos]
+                pos += 1
+                if char == _QUOTE:
+                    self._inString = True
+                elif char in _OPEN:
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._Emit(pos, results)
+        self._pos = pos
+
+
+_HEADERS_END = b'\r\n\r\n'
+_CONTENT_LENGTH = b'content-length'
+
+# Max size of a header block in bytes
+MAX_HEADERS_SIZE = 8192
+
+
+class JsonRpcContentLengthCodec(object):
+    '''Codec of JSON-RPC 2.0 messages framed with headers, the way Language
+    Server Protocol does: "Content-Length: <n>\\r\\n", other headers,
+    "\\r\\n" and <n> bytes of a message.
+    Received chunks are pushed with `Feed` into one growing buffer, a body
+    is handed to `JsonRpcParsed.Parse` as a memoryview slice of it.
+    Every result is the one `JsonRpcParsed.Parse` returns, the same way as
+    `JsonRpcStreamDecoder` does. A body longer than maxMessageSize is
+    dropped as it arrives and reported as `JsonRpcParsedType.INVALID`
+    result.
+    Params:
+        maxMessageSize -- int, max size of one message body in bytes'''
+    def __init__(self, maxMessageSize=DEFAULT_MAX_MESSAGE_SIZE):
+        self.maxMessageSize = maxMessageSize
+        self._buf = bytearray()
+        self._pos = 0            # start of the current frame
+        self._scanPos = 0        # where headers end is searched from
+        self._bodyLength = -1    # body length, -1 while reading headers
+        self._skipLength = 0     # bytes of too large body left to drop
+
+    def Feed(self, chunk):
+        '''Adds received bytes.
+        Params:
+            chunk -- bytes, bytearray or memoryview
+        Returns list of the results of the messages completed by chunk.'''
+        results = []
+        if self._skipLength:
+            skipped = min(self._skipLength, len(chunk))
+            self._skipLength -= skipped
+            if self._skipLength == 0:
+                results.append(_InvalidParsed(JsonRpcError.InvalidRequest(
+                    'Message exceeds %d bytes' % self.maxMessageSize)))
+            if skipped == len(chunk):
+                return results
+            chunk = memoryview(chunk)[skipped:]
+        buf = self._buf
+        buf += chunk
+        while True:
+            if self._bodyLength < 0:
+                if not self._ReadHeaders(results):
+                    break
+            else:
+                end = self._pos + self._bodyLength
+                if len(buf) < end:
+                    break
+                with memoryview(buf) as view:
+                    with view[self._pos:end] as body:
+                        results.append(_ParseMessage(body))
+                self._pos = self._scanPos = end
+                self._bodyLength = -1
+        if self._pos:
+            del buf[:self._pos]
+            self._scanPos -= self._pos
+            self._pos = 0
+        return results
+
+    def _ReadHeaders(self, results):
+        '''Reads header block of the current frame.
+        Returns True if the block is complete.'''
+        buf = self._buf
+        headersEnd = buf.find(_HEADERS_END, self._scanPos)
+        if headersEnd < 0:
+            # the end marker may be split between chunks
+            self._scanPos = max(self._pos, len(buf) - len(_HEADERS_END) + 1)
+            if len(buf) - self._pos > MAX_HEADERS_SIZE:
+                results.append(_InvalidParsed(JsonRpcError.InvalidRequest(
+                    'Headers exceed %d bytes' % MAX_HEADERS_SIZE)))
+                self._pos = self._scanPos = len(buf)
+            return False
+        bodyLength = _ContentLength(bytes(buf[self._pos:headersEnd]))
+        self._pos = self._scanPos = headersEnd + len(_HEADERS_END)
+        if bodyLength is None:
+            results.append(_InvalidParsed(JsonRpcError.InvalidRequest(
+                'Invalid Content-Length header')))
+        elif bodyLength > self.maxMessageSize:
+            available = min(bodyLength, len(buf) - self._pos)
+            self._pos = self._scanPos = self._pos + available
+            self._skipLength = bodyLength - available
+            if not self._skipLength:
+                results.append(_InvalidParsed(JsonRpcError.InvalidRequest(
+                    'Message exceeds %d bytes' % self.maxMessageSize)))
+            else:
+                # the rest of the body is dropped by Feed
+                return False
+        else:
+            self._bodyLength = bodyLength
+        return True
+
+    def Encode(self, msg, escape=True):
+        '''Returns framed message: headers and body in one bytes buffer.
+        Params:
+            msg -- `JsonRpcMessage` or `JsonRpcBatch`
+        Returns empty bytes if there is nothing to send.'''
+        body = msg.AsWireBytes(escape)
+        if not body:
+            return b''
+        return b'Content-Length: ' + str(len(body)).encode('ascii') + \
+            _HEADERS_END + body
+
+    def Write(self, write, msg, escape=True):
+        '''Writes framed message with one call of write.
+        Params:
+            write -- function writing bytes, like socket.sendall,
+            msg -- `JsonRpcMessage` or `JsonRpcBatch`'''
+        frame = self.Encode(msg, escape)
+        if frame:
+            write(frame)
+
+
+def _ContentLength(headers):
+    '''Returns Content-Length value from header block, None if it is
+    missing or invalid.'''
+    for line in headers.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == _CONTENT_LENGTH:
+            value = value.strip()
+            if not value.isdigit():
+                return None
+            return int(value)
+    return None
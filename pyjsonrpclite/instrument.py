@@ -0,0 +1,176 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+
+# Upper bounds of time buckets in seconds: 1 us doubling up to about 1 s
+DEFAULT_TIME_BOUNDS = tuple(1e-6 * 2 ** i for i in range(21))
+# Upper bounds of size buckets in bytes: 64 bytes doubling up to 64 MB
+DEFAULT_SIZE_BOUNDS = tuple(2 ** i for i in range(6, 27))
+
+
+class JsonRpcInstrumentHook(object):
+    '''Receives measurements of `JsonRpcParsed.Parse`,
+    `JsonRpcParsed.TryParse`, `AsJson` and `AsWireJson`, installed with
+    `setInstrumentHook`. Methods are called in the thread doing the work,
+    this base class ignores everything.
+    Stages:
+        parse.decode -- json decoding of the whole text,
+        parse.validate -- envelope checks of one message,
+        parse.build -- construction of one valid message,
+        encode -- encoding of a message or a batch.
+    Events: 'parse' or 'encode'.'''
+    def Stage(self, stage, seconds):
+        '''Called with the time one stage took'''
+        pass
+
+    def Bytes(self, event, size):
+        '''Called with the size of the parsed or encoded text: bytes of
+        bytes input, characters of str'''
+        pass
+
+    def Message(self, event, parsedType, errorCode):
+        '''Called for every parsed or encoded message, batch elements
+        included.
+        Params:
+            parsedType -- `JsonRpcParsedType`, INVALID for a message which
+                can not be parsed,
+            errorCode -- int, code of the error of an ERROR or INVALID
+                message, None for others'''
+        pass
+
+
+class JsonRpcHistogram(object):
+    '''Counts of values in fixed buckets, a value is counted in the first
+    bucket whose upper bound is not less than it.
+    Params:
+        bounds -- sorted upper bounds of the buckets, values above the last
+            one are counted in the overflow bucket'''
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def Record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def Merge(self, other):
+        '''Adds counts of other histogram with the same bounds'''
+        if other.bounds != self.bounds:
+            raise ValueError('Histograms have different bounds')
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or
+                                      other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or
+                                      other.max > self.max):
+            self.max = other.max
+
+    def Quantile(self, q):
+        '''Returns upper bound of the bucket holding quantile q (0..1), the
+        max value for the overflow bucket, None if nothing is counted'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def Dump(self):
+        '''Returns dict of the counts, ready to be encoded to json.
+        Buckets are pairs [upper bound, count], empty ones are left out,
+        the overflow bound is null.'''
+        buckets = []
+        for i, count in enumerate(self.counts):
+            if count:
+                bound = self.bounds[i] if i < len(self.bounds) else None
+                buckets.append([bound, count])
+        return {'count': self.count, 'sum': self.total, 'min': self.min,
+                'max': self.max, 'p50': self.Quantile(0.5),
+                'p99': self.Quantile(0.99), 'buckets': buckets}
+
+
+class JsonRpcHistogramHook(JsonRpcInstrumentHook):
+    '''Hook keeping histograms of stage times and text sizes and counts of
+    messages by type and error code, dumped on demand.
+    Params:
+        timeBounds -- upper bounds of time buckets in seconds,
+        sizeBounds -- upper bounds of size buckets'''
+    def __init__(self, timeBounds=DEFAULT_TIME_BOUNDS,
+                 sizeBounds=DEFAULT_SIZE_BOUNDS):
+        self._timeBounds = timeBounds
+        self._sizeBounds = sizeBounds
+        self._lock = threading.Lock()
+        self.Reset()
+
+    def Reset(self):
+        '''Forgets everything measured'''
+        with self._lock:
+            self._stages = {}
+            self._sizes = {}
+            self._messages = {}
+            self._errors = {}
+
+    def Stage(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = JsonRpcHistogram(
+                    self._timeBounds)
+            histogram.Record(seconds)
+
+    def Bytes(self, event, size):
+        with self._lock:
+            histogram = self._sizes.get(event)
+            if histogram is None:
+                histogram = self._sizes[event] = JsonRpcHistogram(
+                    self._sizeBounds)
+            histogram.Record(size)
+
+    def Message(self, event, parsedType, errorCode):
+        key = (event, parsedType)
+        with self._lock:
+            self._messages[key] = self._messages.get(key, 0) + 1
+            if errorCode is not None:
+                key = (event, errorCode)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def Dump(self):
+        '''Returns dict of everything measured, ready to be encoded to
+        json:
+            stages -- {stage: histogram of seconds},
+            sizes -- {event: histogram of sizes},
+            messages -- {event: {parsedType: count}},
+            errors -- {event: {code: count}}, codes are strings'''
+        with self._lock:
+            messages = {}
+            for (event, parsedType), count in self._messages.items():
+                messages.setdefault(event, {})[parsedType] = count
+            errors = {}
+            for (event, code), count in self._errors.items():
+                errors.setdefault(event, {})[str(code)] = count
+            return {
+                'stages': dict((stage, histogram.Dump()) for stage, histogram
+                               in self._stages.items()),
+                'sizes': dict((event, histogram.Dump()) for event, histogram
+                              in self._sizes.items()),
+                'messages': messages,
+                'errors': errors,
+            }
@@ -0,0 +1,154 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+
+_TEXT_TYPES = (str, bytes, bytearray, memoryview)
+
+
+def _RejectConstant(name):
+    raise ValueError('Invalid JSON constant ' + name)
+
+
+class JsonBackend(object):
+    '''JSON codec used by `JsonRpcParsed.Parse` and `JsonRpcMessage.AsJson`,
+    implemented with the standard library json module.
+    Every backend follows the same rules, so switching backends changes
+    speed only:
+        Loads -- accepts str or bytes-like: bytes, bytearray, memoryview,
+            raises TypeError for other input and
+            ValueError for invalid json, NaN, Infinity and too deep nesting
+            included;
+        Encoder -- returns compact encoding function producing str,
+            NaN and Infinity raise ValueError;
+        Dumps -- formatted encoding used by `JsonRpcMessage.AsJson`.'''
+    name = 'json'
+
+    def __init__(self):
+        self._decode = json.JSONDecoder(parse_constant=_RejectConstant).decode
+
+    def Loads(self, data):
+        '''Decodes json text.'''
+        if not isinstance(data, str):
+            if not isinstance(data, _TEXT_TYPES):
+                raise TypeError('JSON text should be str or bytes, not ' +
+                                type(data).__name__)
+            data = _DecodeBytes(data)
+        try:
+            return self._decode(data)
+        except RecursionError:
+            raise ValueError('JSON text is nested too deep')
+
+    def Encoder(self, escape, default):
+        '''Returns compact json encoding function.
+        Params:
+            escape -- bool, escape non-ASCII characters,
+            default -- function encoding objects json can not'''
+        return json.JSONEncoder(ensure_ascii=escape, allow_nan=False,
+                                separators=(',', ':'), default=default).encode
+
+    def Dumps(self, obj, sortKeys, indent, separators, default):
+        '''Returns formatted json text.'''
+        return json.dumps(obj, sort_keys=sortKeys, indent=indent,
+                          separators=separators, default=default)
+
+
+if hasattr(json, 'detect_encoding'):
+    def _DecodeBytes(data):
+        '''Decodes json bytes the way json.loads does. A memoryview is
+        decoded in place, without copying it to bytes first.'''
+        encoding = json.detect_encoding(bytes(data[:4]))
+        return str(data, encoding, 'surrogatepass')
+else:
+    def _DecodeBytes(data):
+        return bytes(data).decode('utf-8')
+
+
+# orjson turns integers out of 64 bit range into floats and decodes any
+# nesting, the standard library refuses nesting deeper than the recursion
+# limit. Json which may hold such numbers or nesting is decoded by the
+# standard library instead: a number of 19 digits or more, or nesting
+# deeper than _ORJSON_NESTING. The text is checked by its marks: digits,
+# brackets, quotes, backslashes and letters that can follow them, the
+# other bytes are blanked.
+_MARKS = bytes(bytearray(
+    ord('0') if byte in b'0123456789' else
+    ord('(') if byte in b'[{' else
+    ord(')') if byte in b']}' else
+    ord('u') if byte in b'/bfnrtu' else
+    byte if byte in b'"\\' else ord(' ') for byte in range(256)))
+_LONG_NUMBER = b'0' * 19
+_ORJSON_NESTING = 64
+
+
+def _OrjsonMayDiffer(data):
+    '''Returns True if orjson may decode json bytes unlike the standard
+    library does: the text has a long number or deep nesting.'''
+    marks = data.translate(_MARKS)
+    if _LONG_NUMBER in marks:
+        return True
+    if marks.count(b'(') <= _ORJSON_NESTING:
+        return False
+    brackets = marks.translate(None, b' 0')
+    if b'\\"' in brackets:
+        # escapes pair left to right, an escaped quote ends no string
+        marks = marks.replace(b'\\\\', b'').replace(b'\\"', b'')
+        brackets = marks.translate(None, b' 0')
+    brackets = brackets.translate(None, b'\\u')
+    # a string holding brackets leaves its quotes apart
+    if brackets.count(b'"') != 2 * brackets.count(b'""'):
+        # brackets in strings, which lie between pairs of quotes, are dropped
+        brackets = b''.join(brackets.split(b'"')[::2])
+    brackets = brackets.translate(None, b'"')
+    for _ in range(_ORJSON_NESTING):
+        if not brackets:
+            return False
+        # the innermost level of containers is removed at once
+        brackets = brackets.replace(b'()', b'')
+    return len(brackets) > 0
+
+
+class OrjsonBackend(JsonBackend):
+    '''Decodes json with orjson, encodes with the standard library json.
+    orjson encoder is not used as it writes NaN as null, rejects non str
+    dict keys and can not escape non-ASCII characters.
+    Json orjson refuses, or may decode otherwise, is decoded by the
+    standard library again, so the results are exactly the same as
+    `JsonBackend` gives.'''
+    name = 'orjson'
+
+    def __init__(self):
+        JsonBackend.__init__(self)
+        import orjson
+        self._orjsonLoads = orjson.loads
+
+    def Loads(self, data):
+        if isinstance(data, str):
+            marked = data.encode('utf-8', 'surrogatepass')
+        elif isinstance(data, (bytes, bytearray)):
+            marked = data
+        elif isinstance(data, memoryview):
+            marked = bytes(data)
+        else:
+            raise TypeError('JSON text should be str or bytes, not ' +
+                            type(data).__name__)
+        if not _OrjsonMayDiffer(marked):
+            try:
+                return self._orjsonLoads(data)
+            except ValueError:
+                pass
+        return JsonBackend.Loads(self, data)
+
+
+# Backends tried by `detectJsonBackend`, fastest first
+BACKENDS = [OrjsonBackend, JsonBackend]
+
+
+def detectJsonBackend():
+    '''Returns the fastest backend which can be used: its codec is
+    installed.'''
+    for backendClass in BACKENDS:
+        try:
+            return backendClass()
+        except ImportError:
+            continue
+    return JsonBackend()
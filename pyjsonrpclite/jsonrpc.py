@@ -1,10 +1,20 @@
 ﻿#! /usr/bin/env python
 # -*- coding: utf-8 -*-
-import json
+import time
+from json.encoder import encode_basestring, encode_basestring_ascii
+from pyjsonrpclite.jsonbackend import detectJsonBackend
+from pyjsonrpclite.scanner import loadsLazy, JsonScanError
 
 
 version = '0.1'
 
+# Max length of invalid input kept in the `JsonRpcError.ParseError` data
+PARSE_ERROR_EXCERPT_LEN = 128
+# Messages shorter than this are decoded completely by `JsonRpcParsed.Peek`
+PEEK_MIN_SIZE = 1024
+
+_SCALAR_ID_TYPES = (int, float, str)
+
 
 class JsonRpcException(Exception):
     """Base class for exceptions in this module."""
@@ -20,11 +30,101 @@ class JsonRpcParseError(Exception):
         self.rpcError = rpcError
 
 
+class _AbsentType(object):
+    '''Type of `ABSENT`, the value of an optional field which is omitted
+    from the message.'''
+    __slots__ = ()
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = object.__new__(cls)
+        return cls._instance
+
+    def __repr__(self):
+        return 'ABSENT'
+
+    def __reduce__(self):
+        return 'ABSENT'
+
+    def __bool__(self):
+        return False
+
+
+ABSENT = _AbsentType()
+
+
 def defaultJsonEncode(o):
+    '''json `default` encoder for the module objects, they have no
+    `__dict__`. Other objects are encoded as their `__dict__`.'''
+    if type(o) is JsonRpcRawJson:
+        return o.Decode()
+    asDict = getattr(o, '_AsDict', None)
+    if asDict is not None:
+        return asDict()
     return o.__dict__
 
 
+def _WireScalar(value, encode, encodeString):
+    '''Encodes id, method or error code for the wire. Only values of
+    unusual types are handed to the json encoder.'''
+    valueType = type(value)
+    if valueType is int:
+        return int.__repr__(value)
+    if valueType is str:
+        return encodeString(value)
+    if value is None:
+        return 'null'
+    return encode(value)
+
+
+def _WireValue(value, encode):
+    '''Encodes params, result or error data for the wire,
+    `JsonRpcRawJson` is written as is.'''
+    if type(value) is JsonRpcRawJson:
+        return value.AsStr()
+    return encode(value)
+
+
+def _WireCall(msg, params, encode, encodeString):
+    '''Encodes request or notification for the wire, closing brace
+    excluded'''
+    wire = '{"jsonrpc":"2.0","method":' + \
+        _WireScalar(msg.method, encode, encodeString)
+    if params is not ABSENT:
+        wire += ',"params":' + _WireValue(params, encode)
+    return wire
+
+
+def _WireSuccess(msg, result, encode, encodeString):
+    return '{"jsonrpc":"2.0","result":' + _WireValue(result, encode) + \
+        ',"id":' + _WireScalar(msg.id, encode, encodeString) + '}'
+
+
+def _Excerpt(jsonstr):
+    '''Returns the beginning of raw json input as str, at most
+    `PARSE_ERROR_EXCERPT_LEN` characters.'''
+    excerpt = jsonstr[:PARSE_ERROR_EXCERPT_LEN + 1]
+    if not isinstance(excerpt, str):
+        excerpt = bytes(excerpt).decode('utf-8', 'replace')
+    if len(excerpt) > PARSE_ERROR_EXCERPT_LEN:
+        excerpt = excerpt[:PARSE_ERROR_EXCERPT_LEN] + '...'
+    return excerpt
+
+
+def _GuessId(jsonobj):
+    '''Returns the request id of a decoded message if it can be detected,
+    otherwise None.'''
+    if not isinstance(jsonobj, dict):
+        return None
+    reqId = jsonobj.get('id', None)
+    if isinstance(reqId, (dict, list)):
+        return None
+    return reqId
+
+
 class JsonRpcMessage(object):
+    __slots__ = ()
 
     @classmethod
     def Request(cls, reqId, method, params=None):
@@ -43,33 +143,115 @@ class JsonRpcMessage(object):
         return JsonRpcErrorResponse(reqId, errorobj)
 
     def AsJson(self, indent=False, escape=True):
-        return json.dumps(
-            self, sort_keys=True, indent=indent,
-            separators=(',', ': '), default=defaultJsonEncode)
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        text = _jsonBackend.Dumps(self, True, indent, (',', ': '),
+                                  defaultJsonEncode)
+        if hook is not None:
+            _ReportEncode(hook, (self,), text, started)
+        return text
+
+    def AsWireJson(self, escape=True):
+        '''Returns compact JSON-RPC 2.0 message to be sent over the wire.
+        Envelope fields are written in fixed order with "jsonrpc": "2.0",
+        only params, result and error data go through the json encoder.
+        Params:
+            escape -- bool, escape non-ASCII characters'''
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        text = self._WireJson(_WIRE_ENCODE[escape],
+                              _WIRE_ENCODE_STRING[escape])
+        if hook is not None:
+            _ReportEncode(hook, (self,), text, started)
+        return text
+
+    def AsWireBytes(self, escape=True):
+        '''Returns `AsWireJson` message as UTF-8 bytes, ready to be written
+        to a socket.'''
+        return self.AsWireJson(escape).encode('utf-8')
 
 
 class JsonRpcRequest(JsonRpcMessage):
-    '''JSON-RPC 2.0 Request object'''
+    '''JSON-RPC 2.0 Request object.
+    Omitted params are `ABSENT`.'''
+    __slots__ = ('id', 'method', 'params')
+
     def __init__(self, reqId, method, params=None):
         self.id = reqId
         self.method = method
-        if params is not None:
-            self.params = params
+        self.params = ABSENT if params is None else params
+
+    def __reduce__(self):
+        # pickled as constructor arguments, much faster than slot state
+        return (type(self), (self.id, self.method, self.params))
+
+    def _AsDict(self):
+        d = {'id': self.id, 'method': self.method}
+        if self.params is not ABSENT:
+            d['params'] = self.params
+        return d
+
+    def _WireJson(self, encode, encodeString):
+        return _WireCall(self, self.params, encode, encodeString) + \
+            ',"id":' + _WireScalar(self.id, encode, encodeString) + '}'
 
 
 class JsonRpcNotification(JsonRpcRequest):
-    '''JSON-RPC 2.0 Notification object'''
+    '''JSON-RPC 2.0 Notification object, it never has an id.
+    Omitted params are `ABSENT`.'''
+    __slots__ = ()
+
     def __init__(self, method, params=None):
-        JsonRpcRequest.__init__(self, None, method, params)
-        del self.id
+        self.method = method
+        self.params = ABSENT if params is None else params
+
+    def __reduce__(self):
+        return (type(self), (self.method, self.params))
+
+    def _AsDict(self):
+        d = {'method': self.method}
+        if self.params is not ABSENT:
+            d['params'] = self.params
+        return d
+
+    def _WireJson(self, encode, encodeString):
+        return _WireCall(self, self.params, encode, encodeString) + '}'
 
 
 class JsonRpcSuccessResponse(JsonRpcMessage):
     '''JSON-RPC 2.0 Response Object reporting request success'''
+    __slots__ = ('id', 'result')
+
     def __init__(self, reqId, result):
         self.id = reqId
         self.result = result
 
+    def __reduce__(self):
+        return (type(self), (self.id, self.result))
+
+    def _AsDict(self):
+        return {'id': self.id, 'result': self.result}
+
+    def _WireJson(self, encode, encodeString):
+        template = _HotResultTemplate(self.result)
+        if template is not None:
+            return template._Wire(self.id, encode, encodeString)
+        return _WireSuccess(self, self.result, encode, encodeString)
+
+    def AsWireBytes(self, escape=True):
+        template = _HotResultTemplate(self.result)
+        if template is None:
+            return self.AsWireJson(escape).encode('utf-8')
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        data = template.AsWireBytes(self.id, escape)
+        if hook is not None:
+            _ReportEncode(hook, (self,), data, started)
+        return data
+
 
 class JsonRpcErrorResponse(JsonRpcMessage):
     '''JSON-RPC 2.0 Response Object reporting request error.
@@ -77,10 +259,202 @@ class JsonRpcErrorResponse(JsonRpcMessage):
         reqId -- errornous request id or None,
         err - `JsonRpcError` object with an error data
     '''
+    __slots__ = ('id', 'error')
+
     def __init__(self, reqId, err):
         self.id = reqId
         self.error = err
 
+    def __reduce__(self):
+        return (type(self), (self.id, self.error))
+
+    def _AsDict(self):
+        return {'id': self.id, 'error': self.error}
+
+    def _WireJson(self, encode, encodeString):
+        template = _hotErrors.get(self.error)
+        if template is not None:
+            return template._Wire(self.id, encode, encodeString)
+        return '{"jsonrpc":"2.0","error":' + \
+            self.error._WireJson(encode, encodeString) + \
+            ',"id":' + _WireScalar(self.id, encode, encodeString) + '}'
+
+    def AsWireBytes(self, escape=True):
+        template = _hotErrors.get(self.error)
+        if template is None:
+            return self.AsWireJson(escape).encode('utf-8')
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        data = template.AsWireBytes(self.id, escape)
+        if hook is not None:
+            _ReportEncode(hook, (self,), data, started)
+        return data
+
+    def AsJson(self, indent=False, escape=True):
+        # indent None writes one line, False, 0 and '' break lines only
+        if indent is not None and not indent and \
+                isinstance(self.error, _PrebuiltJsonRpcError) and \
+                (self.id is None or isinstance(self.id, _SCALAR_ID_TYPES)):
+            hook = _hook
+            if hook is not None:
+                started = _clock()
+            # shared error object json is prepared once, embed it as is
+            idJson = _jsonBackend.Dumps(self.id, True, indent, (',', ': '),
+                                        defaultJsonEncode)
+            text = '{\n"error": ' + _PREBUILT_ERROR_JSON[self.error.code] +\
+                ',\n"id": ' + idJson + '\n}'
+            if hook is not None:
+                _ReportEncode(hook, (self,), text, started)
+            return text
+        return JsonRpcMessage.AsJson(self, indent, escape)
+
+
+class JsonRpcRawJson(object):
+    '''Json text of a value which is not decoded. Encoders write it to the
+    wire as is, `JsonRpcMessage.AsJson` decodes it.
+    Params:
+        text -- str or bytes, json text of one value'''
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return 'JsonRpcRawJson(%r)' % (self.text,)
+
+    def Decode(self):
+        '''Returns decoded value.
+        Raises `JsonRpcParseError` if text is not valid json.'''
+        try:
+            return _jsonBackend.Loads(self.text)
+        except ValueError:
+            raise JsonRpcParseError(
+                JsonRpcError.ParseError(_Excerpt(self.text)))
+
+    def AsStr(self):
+        '''Returns json text as str'''
+        if isinstance(self.text, str):
+            return self.text
+        return self.text.decode('utf-8')
+
+
+_REQUEST_PARAMS = JsonRpcRequest.__dict__['params']
+_SUCCESS_RESULT = JsonRpcSuccessResponse.__dict__['result']
+
+
+def _LazyProperty(slot):
+    '''Returns property decoding `JsonRpcRawJson` kept in slot on first
+    access'''
+    def Get(self):
+        value = slot.__get__(self)
+        if type(value) is JsonRpcRawJson:
+            value = value.Decode()
+            slot.__set__(self, value)
+        return value
+
+    def Set(self, value):
+        slot.__set__(self, value)
+    return property(Get, Set)
+
+
+class _LazyRequest(JsonRpcRequest):
+    '''`JsonRpcRequest` made by `JsonRpcParsed.ParseLazy`, params are
+    decoded on first access'''
+    __slots__ = ()
+    params = _LazyProperty(_REQUEST_PARAMS)
+
+    def _WireJson(self, encode, encodeString):
+        return _WireCall(self, _REQUEST_PARAMS.__get__(self), encode,
+                         encodeString) + \
+            ',"id":' + _WireScalar(self.id, encode, encodeString) + '}'
+
+
+class _LazyNotification(JsonRpcNotification):
+    '''`JsonRpcNotification` made by `JsonRpcParsed.ParseLazy`, params are
+    decoded on first access'''
+    __slots__ = ()
+    params = _LazyProperty(_REQUEST_PARAMS)
+
+    def _WireJson(self, encode, encodeString):
+        return _WireCall(self, _REQUEST_PARAMS.__get__(self), encode,
+                         encodeString) + '}'
+
+
+class _LazySuccessResponse(JsonRpcSuccessResponse):
+    '''`JsonRpcSuccessResponse` made by `JsonRpcParsed.ParseLazy`, result
+    is decoded on first access'''
+    __slots__ = ()
+    result = _LazyProperty(_SUCCESS_RESULT)
+
+    def _WireJson(self, encode, encodeString):
+        return _WireSuccess(self, _SUCCESS_RESULT.__get__(self), encode,
+                            encodeString)
+
+    # raw result is written as is, no template is looked for
+    AsWireBytes = JsonRpcMessage.AsWireBytes
+
+
+class JsonRpcBatch(object):
+    '''JSON-RPC 2.0 Batch, list of `JsonRpcMessage` sent as one json array.
+    Every message is serialized, notifications of a client batch included;
+    a response batch has none, notifications are never answered.
+    Params:
+        messages -- list of `JsonRpcMessage` (may be ommited)'''
+    __slots__ = ('messages',)
+
+    def __init__(self, messages=None):
+        self.messages = list(messages) if messages else []
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def Append(self, msg):
+        '''Adds `JsonRpcMessage` to the batch.'''
+        self.messages.append(msg)
+
+    def AsJson(self, indent=False, escape=True):
+        '''Serializes all the messages in a single encoder pass.
+        Returns empty string if there is nothing to send.'''
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        messages = self.messages
+        text = ''
+        if messages:
+            text = _jsonBackend.Dumps(messages, True, indent, (',', ': '),
+                                      defaultJsonEncode)
+        if hook is not None:
+            _ReportEncode(hook, messages, text, started)
+        return text
+
+    def AsWireJson(self, escape=True):
+        '''Returns compact json array of the messages, see
+        `JsonRpcMessage.AsWireJson`.
+        Returns empty string if there is nothing to send.'''
+        hook = _hook
+        if hook is not None:
+            started = _clock()
+        encode = _WIRE_ENCODE[escape]
+        encodeString = _WIRE_ENCODE_STRING[escape]
+        messages = self.messages
+        text = ''
+        if messages:
+            text = '[' + ','.join([msg._WireJson(encode, encodeString)
+                                   for msg in messages]) + ']'
+        if hook is not None:
+            _ReportEncode(hook, messages, text, started)
+        return text
+
+    def AsWireBytes(self, escape=True):
+        '''Returns `AsWireJson` batch as UTF-8 bytes, ready to be written
+        to a socket.
+        Returns empty bytes if there is nothing to send.'''
+        return self.AsWireJson(escape).encode('utf-8')
+
 
 class JsonRpcParsedType(object):
     '''Types used by parser to identify parsedType result in `JsonRpcParsed`'''
@@ -96,220 +470,862 @@ class JsonRpcParsed(object):
     Params:
         parsedType  -- <Enum|`JsonRpcParsedType`>,
         payload     -- `JsonRpcMessage`'''
+    __slots__ = ('parsedType', 'payload')
+
     def __init__(self, parsedType, payload):
         self.parsedType = parsedType
         self.payload = payload
 
+    def __reduce__(self):
+        return (JsonRpcParsed, (self.parsedType, self.payload))
+
+    def _AsDict(self):
+        return {'parsedType': self.parsedType, 'payload': self.payload}
+
     @classmethod
     def Parse(cls, jsonstr):
-        '''Parses json formatted string
+        '''Parses json formatted string.
+        A JSON-RPC 2.0 batch (top level array) is detected automatically and
+        parsed like `ParseBatch` does.
         Raises `JsonRpcParseError` if Parse fails
-        Return a `JsonRpcParsed`.'''
+        Params:
+            jsonstr -- str or bytes-like: bytes, bytearray, memoryview
+        Return a `JsonRpcParsed` or a list of `JsonRpcParsed` for a batch.'''
+        if _hook is not None:
+            return _ParseInstrumented(jsonstr, _hook, True)
+        jsonobj = cls._Decode(jsonstr)
+        if isinstance(jsonobj, list):
+            return cls._ParseBatchItems(jsonobj)
+        return cls._ParseObject(jsonobj)
 
-        def SubHasId(jsondict):
-            return 'id' in jsondict
-
-        def SubHasValidId(jsondict):
-            '''Checks if Id message field present and has valid value'''
-
-            isIdValid = SubHasId(jsondict) and (not jsondict['id'] is None) \
-                and (jsondict['id'] != '')
-            return isIdValid
-
-        def SubHasMethod(jsondict):
-            return 'method' in jsondict
-
-        def SubIsMethodCorrect(jsondict):
-            '''Checks if "method" message field has valid value.
-            Returns boolean'''
-            methodValid = SubHasMethod(jsondict)\
-                and (not jsondict['method'] is None)\
-                and len(jsondict['method']) > 0
-            return methodValid
-
-        def SubValidateHeader(jsondict):
-            '''Parses header and validate values.
-            Raises `JsonRpcException` in case of error'''
-            if 'jsonrpc' not in jsondict:
-                raise JsonRpcException('Message have no "jsonrpc" field')
-            if jsondict['jsonrpc'] != '2.0':
-                raise JsonRpcException('"jsonrpc" field value should be 2.0')
-
-        def SubValidateMethod(jsondict):
-            '''Checks if method field exists and has correct value'''
-            if not SubHasMethod(jsondict):
-                raise JsonRpcException('No "method" field')
-            if not SubIsMethodCorrect(jsondict):
-                raise JsonRpcException('Invalid "method" field value')
-
-        def SubValidateErrorObj(errdict):
-            '''Checks if Error object has JSON-RPC 2.0 required fields. '''
-            hasCode = 'code' in errdict
-            hasMessage = 'message' in errdict
-            if not (hasCode and hasMessage):
-                raise JsonRpcException(
-                    'Invalid JSON-RPC 2.0 Error object structure')
-            allowedCodes = [-32700]
-            allowedCodes = allowedCodes + [x for x in range(-32603, -32599)]
-            allowedCodes = allowedCodes + [x for x in range(-32099, -31999)]
-            if not errdict['code'] in allowedCodes:
-                raise JsonRpcException('Invalid JSON-RPC 2.0 Error code')
-
-        def SubParseNotification(jsondict):
-            '''Parses jsondict, validates JSON-RPC 2.0 Notification structure
-            and values.
-            Doesn't check JSON-RPC 2.0 "jsonrpc" and "id".
-            Raises `JsonRpcParseError` if parse failed, or params invalid.'''
-            try:
-                SubValidateMethod(jsondict)
-            except JsonRpcException as e:
-                raise JsonRpcParseError(JsonRpcError.InvalidRequest(str(e)))
-            params = jsondict.get('params', None)
-            payload = JsonRpcMessage.Notification(jsondict['method'], params)
-            return JsonRpcParsed(JsonRpcParsedType.NOTIFICATION, payload)
-
-        def SubParseRequest(jsondict):
-            '''Parses jsondict, validates JSON-RPC 2.0 Request structure
-            and values.
-            Doesn't check JSON-RPC 2.0 "jsonrpc","id", "method".
-            Raises `JsonRpcParseError` if parse failed, or params invalid.'''
-            reqId = jsondict['id']
-            method = jsondict['method']
-            params = jsondict.get('params', None)
-            payload = JsonRpcMessage.Request(reqId, method, params)
-            return JsonRpcParsed(JsonRpcParsedType.REQUEST, payload)
-
-        def SubParseSuccessResponse(jsondict):
-            '''Parses jsondict, validates JSON-RPC 2.0 Response Success
-            structure and values.
-            Doesn't check JSON-RPC 2.0 "jsonrpc","id".
-            Raises `JsonRpcParseError` if parse failed, or result invalid.
-            Params:
-                jsondict - object, json parsed object
-            '''
-            payload = JsonRpcMessage.Success(jsondict['id'],
-                                             jsondict['result'])
-            return JsonRpcParsed(JsonRpcParsedType.SUCCESS, payload)
-
-        def SubParseErrorResponse(jsondict):
-            '''Parses jsondict, validates JSON-RPC 2.0 Response Error
-            structure and values.
-            Doesn't check JSON-RPC 2.0 "jsonrpc","id".
-            Raises `JsonRpcParseError` if parse failed, or error object
-            invalid.
-
-            Params:
-                jsondict - object, json parsed object
-            '''
-            err = jsondict.get('error', None)
-            try:
-                SubValidateErrorObj(err)
-                errorobj = JsonRpcError(err['code'], err['message'],
-                                        err.get('data', None))
-                payload = JsonRpcMessage.Error(jsondict['id'], errorobj)
-                return JsonRpcParsed(JsonRpcParsedType.ERROR, payload)
-            except JsonRpcException as e:
-                raise JsonRpcParseError(JsonRpcError.InvalidParams(str(e)))
-
-        def SubParseJsonRpcObject(jsondict):
-            '''Check if jsondict is valid JSON-RPC 2.0 object.
-            Raises `JsonRpcParseError` if parse/validation failed.
-            Returns `JsonRpcParsed` object containing Parse results.'''
+    @classmethod
+    def TryParse(cls, jsonstr):
+        '''Parses json formatted string like `Parse` does, but reports
+        invalid input instead of raising: as `JsonRpcParsed` of
+        `JsonRpcParsedType.INVALID` type with `JsonRpcErrorResponse`
+        payload carrying the error `Parse` raises and the message id if it
+        can be detected. Elements of a batch are reported the same way.
+        Invalid messages are detected without raising exceptions, only the
+        json decoder raises for invalid json.
+        Return a `JsonRpcParsed` or a list of `JsonRpcParsed` for a batch.'''
+        if _hook is not None:
+            return _ParseInstrumented(jsonstr, _hook, False)
+        try:
+            jsonobj = _jsonBackend.Loads(jsonstr)
+        except ValueError:
+            return _InvalidParsed(None,
+                                  JsonRpcError.ParseError(_Excerpt(jsonstr)))
+        if isinstance(jsonobj, list):
+            if not jsonobj:
+                return _InvalidParsed(
+                    None, JsonRpcError.InvalidRequest('Empty batch'))
+            return [_TryParseObject(item) for item in jsonobj]
+        return _TryParseObject(jsonobj)
+
+    @classmethod
+    def ParseLazy(cls, jsonstr):
+        '''Parses json formatted string like `Parse` does, but leaves params
+        of requests and notifications and result of success responses
+        undecoded: `JsonRpcRawJson` slices of jsonstr. A raw value is
+        decoded on first access, a value never accessed is written to the
+        wire by `JsonRpcMessage.AsWireJson` verbatim.
+        Raw values are proven valid by the json grammar, the text is decoded
+        if one is not: invalid json is reported at once, the way Parse
+        reports it. Proving needs Python 3.11, older versions decode the
+        text, the way Parse does.
+        Raises `JsonRpcParseError` if Parse fails
+        Return a `JsonRpcParsed` or a list of `JsonRpcParsed` for a batch.'''
+        try:
+            jsonobj = loadsLazy(jsonstr, _jsonBackend.Loads, _LAZY_MEMBERS,
+                                _WrapRawJson)
+        except JsonScanError:
+            jsonobj = cls._Decode(jsonstr)
+        except ValueError:
+            raise JsonRpcParseError(
+                JsonRpcError.ParseError(_Excerpt(jsonstr)))
+        if isinstance(jsonobj, list):
+            return cls._ParseBatchItems(jsonobj)
+        return cls._ParseObject(jsonobj)
+
+    @classmethod
+    def Peek(cls, jsonstr):
+        '''Classifies json formatted string without building messages:
+        params and result are skipped, not decoded. Classification is the
+        one `Parse` gives: text which can not be scanned is decoded the
+        strict way, and the envelope is validated by the same rules.
+        Skipped values are proven valid by the json grammar, so malformed
+        params or result fail Peek the way they fail Parse. The text is
+        decoded, at the cost of Parse, if a value is not proven: invalid
+        json, NaN and Infinity, nesting deeper than 256 levels, bytes which
+        are not UTF-8, and every message before Python 3.11. Messages
+        shorter than PEEK_MIN_SIZE are decoded completely, it is faster.
+        Raises `JsonRpcParseError` if Parse fails
+        Return a `JsonRpcPeeked` or a list of `JsonRpcPeeked` for a batch.'''
+        try:
+            if len(jsonstr) < PEEK_MIN_SIZE:
+                raise JsonScanError('Short message')
+            jsonobj = loadsLazy(jsonstr, _jsonBackend.Loads, _LAZY_MEMBERS,
+                                _SkipRawJson)
+        except JsonScanError:
+            jsonobj = cls._Decode(jsonstr)
+        except ValueError:
+            raise JsonRpcParseError(
+                JsonRpcError.ParseError(_Excerpt(jsonstr)))
+        if not isinstance(jsonobj, list):
+            return _PeekObject(jsonobj)
+        if not jsonobj:
+            raise JsonRpcParseError(
+                JsonRpcError.InvalidRequest('Empty batch'))
+        peekedItems = []
+        for item in jsonobj:
             try:
-                SubValidateHeader(jsondict)
-            except JsonRpcException as e:
-                raise JsonRpcParseError(JsonRpcError.InvalidRequest(str(e)))
-
-            isNotification = not SubHasValidId(jsondict)
-            if isNotification:
-                return SubParseNotification(jsondict)
-
-            # else it has Id so it may be: request, success, error message
-            isRequest = SubIsMethodCorrect(jsondict)
-            if isRequest:
-                return SubParseRequest(jsondict)
-
-            # no METHOD field so it may be: success, error message
-            isSuccessMsg = 'result' in jsondict
-            if isSuccessMsg:
-                return SubParseSuccessResponse(jsondict)
-
-            isErrorMsg = 'error' in jsondict
-            if isErrorMsg:
-                return SubParseErrorResponse(jsondict)
-            # no result, no error, no method - id only
+                peekedItems.append(_PeekObject(item))
+            except JsonRpcParseError:
+                peekedItems.append(JsonRpcPeeked(
+                    JsonRpcParsedType.INVALID, None, _GuessId(item)))
+        return peekedItems
+
+    @classmethod
+    def ParseBatch(cls, jsonstr):
+        '''Parses json formatted JSON-RPC 2.0 batch (array of messages).
+        The array is decoded once, every element is parsed separately.
+        Invalid elements do not fail the batch, they are reported in place as
+        `JsonRpcParsed` of `JsonRpcParsedType.INVALID` type with
+        a `JsonRpcErrorResponse` payload.
+        Raises `JsonRpcParseError` if the json is invalid, is not an array
+        or the array is empty.
+        Return a list of `JsonRpcParsed`.'''
+        jsonobj = cls._Decode(jsonstr)
+        if not isinstance(jsonobj, list):
             raise JsonRpcParseError(
-                JsonRpcError.InvalidRequest('No reqired fields'))
+                JsonRpcError.InvalidRequest('Batch should be an array'))
+        return cls._ParseBatchItems(jsonobj)
+
+    @classmethod
+    def _Decode(cls, jsonstr):
+        '''Decodes json formatted string.
+        Raises `JsonRpcParseError` if it is not a valid json, the error data
+        is the beginning of jsonstr.'''
         try:
-            jsondict = json.loads(jsonstr)
+            return _jsonBackend.Loads(jsonstr)
         except ValueError as e:
-            raise JsonRpcParseError(JsonRpcError.ParseError(jsonstr))
+            raise JsonRpcParseError(
+                JsonRpcError.ParseError(_Excerpt(jsonstr)))
+
+    @classmethod
+    def _ParseBatchItems(cls, items):
+        '''Parses already decoded batch elements.
+        Raises `JsonRpcParseError` if the batch is empty.
+        Return a list of `JsonRpcParsed`.'''
+        if not items:
+            raise JsonRpcParseError(
+                JsonRpcError.InvalidRequest('Empty batch'))
+        # invalid elements are reported without raising
+        return [_TryParseObject(item) for item in items]
+
+    @classmethod
+    def _ParseObject(cls, jsondict):
+        '''Parses already decoded JSON-RPC 2.0 message object.
+        Raises `JsonRpcParseError` if Parse fails
+        Return a `JsonRpcParsed`.'''
+        if not isinstance(jsondict, dict):
+            raise JsonRpcParseError(
+                JsonRpcError.InvalidRequest('Message should be an object'))
         try:
-            parsedObjInfo = SubParseJsonRpcObject(jsondict)
-        except JsonRpcParseError as e:
+            return _ParseMessage(jsondict)
+        except JsonRpcParseError:
             raise
         except Exception as e:
             raise JsonRpcParseError(JsonRpcError.InternalError(str(e)))
-        return parsedObjInfo
+
+
+class JsonRpcPeeked(object):
+    '''Presents a json string peek result: parsedType, method and id.
+    Params:
+        parsedType  -- <Enum|`JsonRpcParsedType`>,
+        method      -- str, None for responses and invalid messages,
+        id          -- request id, None for notifications'''
+    __slots__ = ('parsedType', 'method', 'id')
+
+    def __init__(self, parsedType, method, reqId):
+        self.parsedType = parsedType
+        self.method = method
+        self.id = reqId
+
+    def _AsDict(self):
+        return {'parsedType': self.parsedType, 'method': self.method,
+                'id': self.id}
+
+
+def _PeekObject(jsondict):
+    '''Classifies decoded JSON-RPC 2.0 message object the way
+    `JsonRpcParsed._ParseObject` does.
+    Raises `JsonRpcParseError` if the message is invalid.
+    Returns `JsonRpcPeeked`.'''
+    if not isinstance(jsondict, dict):
+        raise JsonRpcParseError(
+            JsonRpcError.InvalidRequest('Message should be an object'))
+    try:
+        parsedType, reqId, method = _ClassifyMessage(jsondict)
+        if parsedType == JsonRpcParsedType.ERROR:
+            _ValidateErrorObj(jsondict['error'])
+    except JsonRpcParseError:
+        raise
+    except Exception as e:
+        raise JsonRpcParseError(JsonRpcError.InternalError(str(e)))
+    return JsonRpcPeeked(parsedType, method, reqId)
+
+
+class JsonRpcErrorCodes(object):
+    '''Registry of error codes allowed in JSON-RPC 2.0 Error objects.
+    Predefined codes and the server error range are always allowed,
+    an application may register its own codes with `Register`.
+    All the checks are constant-time.'''
+    PARSE_ERROR = -32700
+    INVALID_REQUEST = -32600
+    METHOD_NOT_FOUND = -32601
+    INVALID_PARAMS = -32602
+    INTERNAL_ERROR = -32603
+    SERVER_ERROR_MIN = -32099
+    SERVER_ERROR_MAX = -32000
+    RESERVED_MIN = -32768
+    RESERVED_MAX = -32000
+
+    PREDEFINED = {
+        PARSE_ERROR: 'Parse Error',
+        INVALID_REQUEST: 'Invalid Request',
+        METHOD_NOT_FOUND: 'Method Not Found',
+        INVALID_PARAMS: 'Invalid Params',
+        INTERNAL_ERROR: 'Internal Error',
+    }
+
+    _registered = {}
+
+    @classmethod
+    def IsServerError(cls, code):
+        '''Checks if code is in the implementation-defined server error
+        range -32099..-32000.'''
+        return cls.SERVER_ERROR_MIN <= code <= cls.SERVER_ERROR_MAX
+
+    @classmethod
+    def IsAllowed(cls, code):
+        '''Checks if code may be used in an Error object: predefined,
+        server error or registered by the application.'''
+        if not isinstance(code, int) or isinstance(code, bool):
+            return False
+        return code in cls.PREDEFINED or \
+            cls.SERVER_ERROR_MIN <= code <= cls.SERVER_ERROR_MAX or \
+            code in cls._registered
+
+    @classmethod
+    def Register(cls, code, message):
+        '''Registers application error code with its default message.
+        The code should be a server error or be out of the reserved
+        -32768..-32000 range.
+        Raises `JsonRpcException` if the code can not be registered.'''
+        if not isinstance(code, int) or isinstance(code, bool):
+            raise JsonRpcException('Error code should be an int')
+        if cls.RESERVED_MIN <= code <= cls.RESERVED_MAX and \
+                not cls.IsServerError(code):
+            raise JsonRpcException(
+                'Error code %d is reserved by JSON-RPC 2.0' % code)
+        cls._registered[code] = message
+
+    @classmethod
+    def Unregister(cls, code):
+        '''Removes application error code registered by `Register`.'''
+        cls._registered.pop(code, None)
+
+    @classmethod
+    def Message(cls, code):
+        '''Returns default message of predefined or registered code,
+        None if the code is unknown.'''
+        message = cls.PREDEFINED.get(code, None)
+        if message is None:
+            message = cls._registered.get(code, None)
+        return message
 
 
 class JsonRpcError(object):
     '''Class implements JSON-RPC 2.0 Error Object.
+    Predefined errors without data are immutable shared instances.
     Params:
         code -- negative int number JSON-RPC 2.0 error code,
         message -- string, error message,
-        data -- any type, extra info (may be ommited)
+        data -- any type, extra info (may be ommited), omitted data is `ABSENT`
     '''
+    __slots__ = ('code', 'message', 'data')
 
     def __init__(self, code, message, data=None):
         self.code = code
         self.message = message
-        if data is not None:
-            self.data = data
+        self.data = ABSENT if data is None else data
+
+    def __reduce_ex__(self, protocol):
+        if type(self) is not JsonRpcError:
+            # subclasses are pickled their own way
+            return object.__reduce_ex__(self, protocol)
+        return (JsonRpcError, (self.code, self.message, self.data))
+
+    def _AsDict(self):
+        d = {'code': self.code, 'message': self.message}
+        if self.data is not ABSENT:
+            d['data'] = self.data
+        return d
+
+    def _WireJson(self, encode, encodeString):
+        wire = '{"code":' + _WireScalar(self.code, encode, encodeString) + \
+            ',"message":' + _WireScalar(self.message, encode, encodeString)
+        if self.data is not ABSENT:
+            wire += ',"data":' + encode(self.data)
+        return wire + '}'
 
     @classmethod
     def Error(cls, code, message, data=None):
         '''Creates common Error object.'''
         return JsonRpcError(code, message, data)
 
+    @classmethod
+    def Registered(cls, code, data=None):
+        '''Creates Error object for a code registered in `JsonRpcErrorCodes`,
+        the message is taken from the registry.
+        Raises `JsonRpcException` if the code is unknown.'''
+        message = JsonRpcErrorCodes.Message(code)
+        if message is None:
+            raise JsonRpcException('Error code %r is not registered' % code)
+        if data is None and code in _PREBUILT_ERRORS:
+            return _PREBUILT_ERRORS[code]
+        return JsonRpcError(code, message, data)
+
     @classmethod
     def ParseError(cls, data=None):
         '''Creates `JsonRpcError` instance for prdefined JSON-RPC 2.0 error
         Code -32700. Invalid JSON was received by the server.
         An error occurred on the server while parsing the JSON text.
         '''
-        code = -32700
-        message = 'Parse Error'
-        return JsonRpcError(code, message, data)
+        if data is None:
+            return _PREBUILT_ERRORS[JsonRpcErrorCodes.PARSE_ERROR]
+        return JsonRpcError(-32700, 'Parse Error', data)
 
     @classmethod
     def InvalidRequest(cls, data=None):
         '''Creates `JsonRpcError` instance for prdefined JSON-RPC 2.0 error
         Code -32600. The JSON sent is not a valid Request object.'''
-        code = -32600
-        message = 'Invalid Request'
-        return JsonRpcError(code, message, data)
+        if data is None:
+            return _PREBUILT_ERRORS[JsonRpcErrorCodes.INVALID_REQUEST]
+        return JsonRpcError(-32600, 'Invalid Request', data)
 
     @classmethod
     def MethodNotFound(cls, data=None):
         '''Creates `JsonRpcError` instance for prdefined JSON-RPC 2.0 error
         Code -32601. The method does not exist / is not available.'''
-        code = -32601
-        message = 'Method Not Found'
-        return JsonRpcError(code, message, data)
+        if data is None:
+            return _PREBUILT_ERRORS[JsonRpcErrorCodes.METHOD_NOT_FOUND]
+        return JsonRpcError(-32601, 'Method Not Found', data)
 
     @classmethod
     def InvalidParams(cls, data=None):
         '''Creates `JsonRpcError` instance for prdefined JSON-RPC 2.0 error
         Code -32602. Invalid method parameter(s).'''
-        code = -32602
-        message = 'Invalid Params'
-        return JsonRpcError(code, message, data)
+        if data is None:
+            return _PREBUILT_ERRORS[JsonRpcErrorCodes.INVALID_PARAMS]
+        return JsonRpcError(-32602, 'Invalid Params', data)
 
     @classmethod
     def InternalError(cls, data=None):
         '''Creates `JsonRpcError` instance for prdefined JSON-RPC 2.0 error.
         Code -32603. Internal JSON-RPC error.'''
-        code = -32603
-        message = 'Internal Error'
-        return JsonRpcError(code, message, data)
+        if data is None:
+            return _PREBUILT_ERRORS[JsonRpcErrorCodes.INTERNAL_ERROR]
+        return JsonRpcError(-32603, 'Internal Error', data)
+
+
+class _PrebuiltJsonRpcError(JsonRpcError):
+    '''Immutable shared `JsonRpcError` without data.
+    Its json is prepared once, see `_PREBUILT_ERROR_JSON`.'''
+    __slots__ = ()
+
+    def __init__(self, code, message):
+        object.__setattr__(self, 'code', code)
+        object.__setattr__(self, 'message', message)
+        object.__setattr__(self, 'data', ABSENT)
+
+    def _WireJson(self, encode, encodeString):
+        return _PREBUILT_ERROR_WIRE_JSON[self.code]
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Shared JsonRpcError can not be changed, '
+                             'create a new one')
+
+    def __delattr__(self, name):
+        raise AttributeError('Shared JsonRpcError can not be changed, '
+                             'create a new one')
+
+    def __reduce__(self):
+        # unpickled in another process as the shared error of that process
+        return (_PrebuiltError, (self.code,))
+
+
+def _PrebuiltError(code):
+    return _PREBUILT_ERRORS[code]
+
+
+class JsonRpcResponseTemplate(object):
+    '''Response encoded once with a slot for the id: a response is written
+    by concatenation, the result or error is not encoded again.
+    Registered templates are used by `AsWireJson` and `AsWireBytes` of
+    every response carrying their result or error. Templates of the shared
+    predefined errors, of null, true, false, [] and {} results are
+    registered on import.
+    Create templates with `Success` and `Error`.
+    Params:
+        field -- 'result' or 'error',
+        value -- result or `JsonRpcError`'''
+    __slots__ = ('field', 'value', '_prefixes', '_prefixesBytes')
+
+    def __init__(self, field, value):
+        if field != 'result' and field != 'error':
+            raise JsonRpcException('Template field should be result or '
+                                   'error')
+        self.field = field
+        self.value = value
+        # keyed by the string encoder, it tells if non-ASCII is escaped
+        self._prefixes = {}
+        self._prefixesBytes = {}
+        for escape in (True, False):
+            encode = _WIRE_ENCODE[escape]
+            encodeString = _WIRE_ENCODE_STRING[escape]
+            if field == 'error':
+                body = JsonRpcError._WireJson(value, encode, encodeString)
+            else:
+                body = _WireValue(value, encode)
+            prefix = '{"jsonrpc":"2.0","' + field + '":' + body + ',"id":'
+            self._prefixes[encodeString] = prefix
+            self._prefixesBytes[escape] = prefix.encode('utf-8')
+
+    @classmethod
+    def Success(cls, result):
+        '''Returns template of success response with result'''
+        return cls('result', result)
+
+    @classmethod
+    def Error(cls, rpcError):
+        '''Returns template of error response with `JsonRpcError`, the
+        error must not be changed after'''
+        return cls('error', rpcError)
+
+    def _Wire(self, reqId, encode, encodeString):
+        return self._prefixes[encodeString] + \
+            _WireScalar(reqId, encode, encodeString) + '}'
+
+    def AsWireJson(self, reqId, escape=True):
+        '''Returns response to request reqId, see
+        `JsonRpcMessage.AsWireJson`'''
+        return self._Wire(reqId, _WIRE_ENCODE[escape],
+                          _WIRE_ENCODE_STRING[escape])
+
+    def AsWireBytes(self, reqId, escape=True):
+        '''Returns response to request reqId as UTF-8 bytes'''
+        if type(reqId) is int:
+            idJson = int.__repr__(reqId)
+        else:
+            idJson = _WireScalar(reqId, _WIRE_ENCODE[escape],
+                                 _WIRE_ENCODE_STRING[escape])
+        return self._prefixesBytes[escape] + idJson.encode('utf-8') + b'}'
+
+    def Response(self, reqId):
+        '''Returns `JsonRpcSuccessResponse` or `JsonRpcErrorResponse` to
+        request reqId'''
+        if self.field == 'error':
+            return JsonRpcErrorResponse(reqId, self.value)
+        return JsonRpcSuccessResponse(reqId, self.value)
+
+    @classmethod
+    def Register(cls, template):
+        '''Registers hot response template: responses carrying its result
+        or error are written with it. A result should be hashable, an
+        empty list or an empty dict; an error is matched by identity.
+        Replaces the template registered for the same result or error.
+        Raises `JsonRpcException` if the result can not be matched.
+        Returns template.'''
+        if template.field == 'error':
+            _hotErrors[template.value] = template
+        else:
+            _hotResults[_HotResultKey(template.value)] = template
+        return template
+
+    @classmethod
+    def Unregister(cls, template):
+        '''Removes template registered for its result or error'''
+        if template.field == 'error':
+            _hotErrors.pop(template.value, None)
+        else:
+            _hotResults.pop(_HotResultKey(template.value), None)
+
+
+def _HotResultKey(result):
+    '''Returns key of a hot result: a result equal to another one of the
+    same type shares its template'''
+    resultType = type(result)
+    if resultType is list or resultType is dict:
+        if result:
+            raise JsonRpcException('Only an empty list or dict result can '
+                                   'have a template')
+        return (resultType, None)
+    try:
+        hash(result)
+    except TypeError:
+        raise JsonRpcException('Result of a template should be hashable')
+    return (resultType, result)
+
+
+def _HotResultTemplate(result):
+    '''Returns template registered for result, None if there is none'''
+    resultType = type(result)
+    if resultType is list or resultType is dict:
+        if result:
+            return None
+        return _hotResults.get((resultType, None))
+    try:
+        return _hotResults.get((resultType, result))
+    except TypeError:
+        return None
+
+
+# Registered `JsonRpcResponseTemplate` keyed by `_HotResultKey` of their
+# result and by their `JsonRpcError`
+_hotResults = {}
+_hotErrors = {}
+
+
+_jsonBackend = None
+_WIRE_ENCODE = {}
+_hook = None
+_clock = time.perf_counter
+
+
+def getJsonBackend():
+    '''Returns `JsonBackend` used to decode and encode messages.'''
+    return _jsonBackend
+
+
+def setJsonBackend(backend):
+    '''Sets `JsonBackend` used to decode and encode messages.
+    The fastest installed backend is set on import, see
+    `detectJsonBackend`.'''
+    global _jsonBackend, _WIRE_ENCODE
+    _jsonBackend = backend
+    # compact encoders used by `JsonRpcMessage.AsWireJson`, keyed by escape
+    _WIRE_ENCODE = {
+        True: backend.Encoder(True, defaultJsonEncode),
+        False: backend.Encoder(False, defaultJsonEncode),
+    }
+
+
+setJsonBackend(detectJsonBackend())
+
+
+def getInstrumentHook():
+    '''Returns hook receiving measurements, None if there is none.'''
+    return _hook
+
+
+def setInstrumentHook(hook):
+    '''Installs hook receiving measurements of `JsonRpcParsed.Parse`,
+    `JsonRpcParsed.TryParse`, `AsJson` and `AsWireJson` of messages and
+    batches, see `JsonRpcInstrumentHook`. None removes it: without a hook
+    the measured calls only check that there is none.'''
+    global _hook
+    _hook = hook
+
+
+_PREBUILT_ERRORS = dict(
+    (code, _PrebuiltJsonRpcError(code, message))
+    for code, message in JsonRpcErrorCodes.PREDEFINED.items())
+
+# Error objects in `JsonRpcMessage.AsJson` format, ready to be embedded
+_PREBUILT_ERROR_JSON = dict(
+    (code, _jsonBackend.Dumps(err, True, False, (',', ': '),
+                              defaultJsonEncode))
+    for code, err in _PREBUILT_ERRORS.items())
+
+# string encoders used by `JsonRpcMessage.AsWireJson`, keyed by escape
+_WIRE_ENCODE_STRING = {
+    True: encode_basestring_ascii,
+    False: encode_basestring,
+}
+
+_PREBUILT_ERROR_WIRE_JSON = dict(
+    (code, JsonRpcError._WireJson(err, _WIRE_ENCODE[True],
+                                  _WIRE_ENCODE_STRING[True]))
+    for code, err in _PREBUILT_ERRORS.items())
+
+for _err in _PREBUILT_ERRORS.values():
+    JsonRpcResponseTemplate.Register(JsonRpcResponseTemplate.Error(_err))
+for _result in (None, True, False, [], {}):
+    JsonRpcResponseTemplate.Register(JsonRpcResponseTemplate.Success(_result))
+del _err, _result
+
+
+# Members `JsonRpcParsed.ParseLazy` leaves undecoded
+_LAZY_MEMBERS = frozenset(['params', 'result'])
+
+_NULL_JSON = ('null', b'null')
+
+
+def _WrapRawJson(text, start, end):
+    '''Returns raw json value found by `JsonRpcParsed.ParseLazy`, null is
+    decoded to keep omitted params the way `JsonRpcParsed.Parse` does.'''
+    text = text[start:end]
+    if text in _NULL_JSON:
+        return None
+    if not isinstance(text, (str, bytes)):
+        # keep no reference to the input buffer
+        text = bytes(text)
+    return JsonRpcRawJson(text)
+
+
+def _SkipRawJson(text, start, end):
+    '''Marks raw value skipped by `JsonRpcParsed.Peek`, only presence of
+    the member matters.'''
+    return ABSENT
+
+
+# Parse engine. Built once at import, used by `JsonRpcParsed` for every
+# decoded message object.
+
+_MISSING = object()
+
+
+def _ErrorObjProblem(errobj):
+    '''Checks if Error object has JSON-RPC 2.0 required fields.
+    Returns `JsonRpcError` describing the problem, None if there is none.'''
+    if not (isinstance(errobj, dict) and 'code' in errobj and
+            'message' in errobj):
+        return JsonRpcError.InvalidParams(
+            'Invalid JSON-RPC 2.0 Error object structure')
+    if not JsonRpcErrorCodes.IsAllowed(errobj['code']):
+        return JsonRpcError.InvalidParams('Invalid JSON-RPC 2.0 Error code')
+    return None
+
+
+def _ValidateErrorObj(errobj):
+    '''Checks if Error object has JSON-RPC 2.0 required fields.
+    Raises `JsonRpcParseError` if it has not.'''
+    problem = _ErrorObjProblem(errobj)
+    if problem is not None:
+        raise JsonRpcParseError(problem)
+
+
+def _BuildRequest(jsondict, reqId, method):
+    params = jsondict.get('params', None)
+    if type(params) is JsonRpcRawJson:
+        payload = _LazyRequest(reqId, method, params)
+    else:
+        payload = JsonRpcRequest(reqId, method, params)
+    return JsonRpcParsed(JsonRpcParsedType.REQUEST, payload)
+
+
+def _BuildNotification(jsondict, reqId, method):
+    params = jsondict.get('params', None)
+    if type(params) is JsonRpcRawJson:
+        payload = _LazyNotification(method, params)
+    else:
+        payload = JsonRpcNotification(method, params)
+    return JsonRpcParsed(JsonRpcParsedType.NOTIFICATION, payload)
+
+
+def _BuildSuccessResponse(jsondict, reqId, method):
+    result = jsondict['result']
+    if type(result) is JsonRpcRawJson:
+        payload = _LazySuccessResponse(reqId, result)
+    else:
+        payload = JsonRpcSuccessResponse(reqId, result)
+    return JsonRpcParsed(JsonRpcParsedType.SUCCESS, payload)
+
+
+def _BuildErrorResponse(jsondict, reqId, method):
+    # the error object is validated already
+    errobj = jsondict['error']
+    err = JsonRpcError(errobj['code'], errobj['message'],
+                       errobj.get('data', None))
+    return JsonRpcParsed(JsonRpcParsedType.ERROR,
+                         JsonRpcErrorResponse(reqId, err))
+
+
+_PARSED_TYPE_BUILDERS = {
+    JsonRpcParsedType.REQUEST: _BuildRequest,
+    JsonRpcParsedType.NOTIFICATION: _BuildNotification,
+    JsonRpcParsedType.SUCCESS: _BuildSuccessResponse,
+    JsonRpcParsedType.ERROR: _BuildErrorResponse,
+}
+
+
+def _Classify(jsondict):
+    '''Validates the envelope of decoded message and detects its type.
+    Every envelope member is looked up once, nothing is raised for an
+    invalid envelope.
+    Returns tuple (`JsonRpcParsedType`, id, method), tuple (INVALID, None,
+    `JsonRpcError`) if the envelope is invalid.'''
+    version = jsondict.get('jsonrpc', _MISSING)
+    if version != '2.0':
+        if version is _MISSING:
+            return JsonRpcParsedType.INVALID, None, \
+                JsonRpcError.InvalidRequest('Message have no "jsonrpc" field')
+        return JsonRpcParsedType.INVALID, None, \
+            JsonRpcError.InvalidRequest('"jsonrpc" field value should be 2.0')
+    reqId = jsondict.get('id', None)
+    method = jsondict.get('method', _MISSING)
+    hasMethod = method is not _MISSING and method is not None and \
+        len(method) > 0
+    if reqId is None or reqId == '':
+        if hasMethod:
+            return JsonRpcParsedType.NOTIFICATION, None, method
+        if method is _MISSING and reqId is None and 'error' in jsondict \
+                and 'id' in jsondict:
+            # the answer to a message whose id could not be detected
+            return JsonRpcParsedType.ERROR, None, None
+        if method is _MISSING:
+            return JsonRpcParsedType.INVALID, None, \
+                JsonRpcError.InvalidRequest('No "method" field')
+        return JsonRpcParsedType.INVALID, None, \
+            JsonRpcError.InvalidRequest('Invalid "method" field value')
+    if hasMethod:
+        return JsonRpcParsedType.REQUEST, reqId, method
+    if 'result' in jsondict:
+        return JsonRpcParsedType.SUCCESS, reqId, None
+    if 'error' in jsondict:
+        return JsonRpcParsedType.ERROR, reqId, None
+    return JsonRpcParsedType.INVALID, None, \
+        JsonRpcError.InvalidRequest('No reqired fields')
+
+
+def _ClassifyMessage(jsondict):
+    '''Validates the envelope of decoded message and detects its type.
+    Raises `JsonRpcParseError` if the envelope is invalid.
+    Returns tuple (`JsonRpcParsedType`, id, method).'''
+    parsedType, reqId, method = _Classify(jsondict)
+    if parsedType == JsonRpcParsedType.INVALID:
+        raise JsonRpcParseError(method)
+    return parsedType, reqId, method
+
+
+def _ParseMessage(jsondict):
+    '''Parses decoded JSON-RPC 2.0 message object.
+    Raises `JsonRpcParseError` if the message is invalid.
+    Returns `JsonRpcParsed`.'''
+    parsedType, reqId, method = _ClassifyMessage(jsondict)
+    if parsedType == JsonRpcParsedType.ERROR:
+        _ValidateErrorObj(jsondict['error'])
+    return _PARSED_TYPE_BUILDERS[parsedType](jsondict, reqId, method)
+
+
+def _InvalidParsed(reqId, rpcError):
+    '''Returns `JsonRpcParsed` reporting an invalid message'''
+    return JsonRpcParsed(JsonRpcParsedType.INVALID,
+                         JsonRpcErrorResponse(reqId, rpcError))
+
+
+def _TryParseObject(jsonobj):
+    '''Parses decoded JSON-RPC 2.0 message object the way
+    `JsonRpcParsed._ParseObject` does, an invalid message is returned as
+    INVALID result with the error `_ParseObject` raises.
+    Returns `JsonRpcParsed`.'''
+    if not isinstance(jsonobj, dict):
+        return _InvalidParsed(None, JsonRpcError.InvalidRequest(
+            'Message should be an object'))
+    try:
+        parsedType, reqId, method = _Classify(jsonobj)
+        if parsedType == JsonRpcParsedType.INVALID:
+            return _InvalidParsed(_GuessId(jsonobj), method)
+        if parsedType == JsonRpcParsedType.ERROR:
+            problem = _ErrorObjProblem(jsonobj['error'])
+            if problem is not None:
+                return _InvalidParsed(_GuessId(jsonobj), problem)
+        return _PARSED_TYPE_BUILDERS[parsedType](jsonobj, reqId, method)
+    except Exception as e:
+        # members of unexpected types only, like a method without length
+        return _InvalidParsed(_GuessId(jsonobj),
+                              JsonRpcError.InternalError(str(e)))
+
+
+# Instrumented twins of the parse and encode paths, used only while a hook
+# is installed. Results are exactly the ones of the plain paths.
+
+def _ParseInstrumented(jsonstr, hook, raising):
+    '''`JsonRpcParsed.Parse` if raising, `JsonRpcParsed.TryParse` otherwise,
+    reporting every stage to hook'''
+    started = _clock()
+    try:
+        jsonobj = _jsonBackend.Loads(jsonstr)
+    except ValueError:
+        jsonobj = _MISSING
+    hook.Stage('parse.decode', _clock() - started)
+    hook.Bytes('parse', len(jsonstr))
+    if jsonobj is _MISSING:
+        parsed = _InvalidParsed(None,
+                                JsonRpcError.ParseError(_Excerpt(jsonstr)))
+    elif not isinstance(jsonobj, list):
+        parsed = _TryParseObjectInstrumented(jsonobj, hook)
+        if raising and parsed.parsedType == JsonRpcParsedType.INVALID:
+            raise JsonRpcParseError(parsed.payload.error)
+        return parsed
+    elif jsonobj:
+        return [_TryParseObjectInstrumented(item, hook) for item in jsonobj]
+    else:
+        parsed = _InvalidParsed(None,
+                                JsonRpcError.InvalidRequest('Empty batch'))
+    hook.Message('parse', JsonRpcParsedType.INVALID, parsed.payload.error.code)
+    if raising:
+        raise JsonRpcParseError(parsed.payload.error)
+    return parsed
+
+
+def _TryParseObjectInstrumented(jsonobj, hook):
+    '''`_TryParseObject` reporting validation and construction to hook'''
+    started = _clock()
+    validated = None
+    try:
+        if not isinstance(jsonobj, dict):
+            parsedType, method = JsonRpcParsedType.INVALID, \
+                JsonRpcError.InvalidRequest('Message should be an object')
+        else:
+            parsedType, reqId, method = _Classify(jsonobj)
+            if parsedType == JsonRpcParsedType.ERROR:
+                problem = _ErrorObjProblem(jsonobj['error'])
+                if problem is not None:
+                    parsedType, method = JsonRpcParsedType.INVALID, problem
+        validated = _clock()
+        if parsedType == JsonRpcParsedType.INVALID:
+            parsed = _InvalidParsed(_GuessId(jsonobj), method)
+        else:
+            parsed = _PARSED_TYPE_BUILDERS[parsedType](jsonobj, reqId, method)
+    except Exception as e:
+        parsed = _InvalidParsed(_GuessId(jsonobj),
+                                JsonRpcError.InternalError(str(e)))
+    finished = _clock()
+    if validated is None:
+        hook.Stage('parse.validate', finished - started)
+    else:
+        hook.Stage('parse.validate', validated - started)
+        if parsed.parsedType != JsonRpcParsedType.INVALID:
+            hook.Stage('parse.build', finished - validated)
+    payload = parsed.payload
+    hook.Message('parse', parsed.parsedType,
+                 payload.error.code if type(payload) is JsonRpcErrorResponse
+                 else None)
+    return parsed
+
+
+def _ReportEncode(hook, messages, text, started):
+    hook.Stage('encode', _clock() - started)
+    hook.Bytes('encode', len(text))
+    for msg in messages:
+        if isinstance(msg, JsonRpcErrorResponse):
+            hook.Message('encode', JsonRpcParsedType.ERROR, msg.error.code)
+        elif isinstance(msg, JsonRpcSuccessResponse):
+            hook.Message('encode', JsonRpcParsedType.SUCCESS, None)
+        elif isinstance(msg, JsonRpcNotification):
+            hook.Message('encode', JsonRpcParsedType.NOTIFICATION, None)
+        else:
+            hook.Message('encode', JsonRpcParsedType.REQUEST, None)
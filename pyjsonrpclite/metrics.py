@@ -0,0 +1,186 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from pyjsonrpclite.instrument import JsonRpcHistogram
+
+# Upper bounds of call latency buckets in seconds
+DEFAULT_LATENCY_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                          0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                          10.0)
+# Method label of calls of methods which are not registered, so unknown
+# names sent by clients do not grow the metrics
+UNKNOWN_METHOD = ''
+
+
+class _MethodStats(object):
+    '''Counters of one method kept by one thread'''
+    __slots__ = ('started', 'finished', 'errors', 'latency')
+
+    def __init__(self, bounds):
+        self.started = 0
+        self.finished = 0
+        self.errors = {}
+        self.latency = JsonRpcHistogram(bounds)
+
+    def Merge(self, other):
+        self.started += other.started
+        self.finished += other.finished
+        for code, count in list(other.errors.items()):
+            self.errors[code] = self.errors.get(code, 0) + count
+        self.latency.Merge(other.latency)
+
+
+class JsonRpcMetrics(object):
+    '''Per-method service metrics: finished calls, errors by code, calls in
+    flight and latency histograms, keyed by method name. Given to
+    `JsonRpcDispatcher` or `JsonRpcAsyncDispatcher` it measures every call
+    of a handler, a cache hit included.
+    Each thread records into counters of its own without locks, they are
+    merged only by `Snapshot` and `AsPrometheus`. A scrape running while
+    calls are recorded may miss the calls in progress, never counts one
+    twice.
+    Params:
+        bounds -- upper bounds of latency buckets in seconds,
+        clock -- function returning current time in seconds'''
+    def __init__(self, bounds=DEFAULT_LATENCY_BOUNDS, clock=time.perf_counter):
+        self.bounds = tuple(bounds)
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []       # list of (thread, {method: _MethodStats})
+        self._retired = {}      # counters of finished threads
+
+    def _Stats(self, method):
+        '''Returns counters of method of the current thread, creates them
+        on first use'''
+        methods = getattr(self._local, 'methods', None)
+        if methods is None:
+            methods = self._local.methods = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), methods))
+        stats = methods.get(method)
+        if stats is None:
+            stats = methods[method] = _MethodStats(self.bounds)
+        return stats
+
+    def Start(self, method):
+        '''Counts call of method in flight.
+        Returns start time to be given to `Finish`.'''
+        try:
+            self._local.methods[method].started += 1
+        except (AttributeError, KeyError):
+            self._Stats(method).started += 1
+        return self._clock()
+
+    def Finish(self, method, started, errorCode=None):
+        '''Counts call of method finished.
+        Params:
+            started -- time returned by `Start`, the call may finish in
+                another thread,
+            errorCode -- int, code of the error the call is answered with,
+                None for a result'''
+        elapsed = self._clock() - started
+        try:
+            stats = self._local.methods[method]
+        except (AttributeError, KeyError):
+            stats = self._Stats(method)
+        stats.finished += 1
+        stats.latency.Record(elapsed)
+        if errorCode is not None:
+            errors = stats.errors
+            errors[errorCode] = errors.get(errorCode, 0) + 1
+
+    def Snapshot(self):
+        '''Merges counters of all threads.
+        Returns dict {method: dict} with keys:
+            calls -- int, finished calls,
+            inFlight -- int, calls started and not finished,
+            errors -- dict {code: count},
+            latency -- `JsonRpcHistogram` of call seconds'''
+        merged = {}
+        with self._lock:
+            # counters of finished threads are folded once and dropped
+            alive = []
+            for thread, methods in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, methods))
+                else:
+                    self._Fold(self._retired, methods)
+            self._shards = alive
+            self._Fold(merged, self._retired)
+            for _, methods in alive:
+                self._Fold(merged, methods)
+        return dict((method, {
+            'calls': stats.finished,
+            'inFlight': stats.started - stats.finished,
+            'errors': stats.errors,
+            'latency': stats.latency,
+        }) for method, stats in merged.items())
+
+    def _Fold(self, target, methods):
+        for method, stats in list(methods.items()):
+            total = target.get(method)
+            if total is None:
+                total = target[method] = _MethodStats(self.bounds)
+            total.Merge(stats)
+
+    def AsPrometheus(self, prefix='jsonrpc'):
+        '''Returns metrics in Prometheus text exposition format:
+            <prefix>_calls_total -- counter of finished calls,
+            <prefix>_errors_total -- counter of error responses by code,
+            <prefix>_in_flight -- gauge of running calls,
+            <prefix>_call_duration_seconds -- histogram of call latency,
+        labeled by method, the unregistered ones by an empty method.'''
+        snapshot = sorted(self.Snapshot().items())
+        lines = []
+
+        def Header(name, kind, help):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+        Header('calls_total', 'counter', 'Finished calls by method.')
+        for method, stats in snapshot:
+            lines.append('%s_calls_total{method="%s"} %d' % (
+                prefix, _EscapeLabel(method), stats['calls']))
+        Header('errors_total', 'counter',
+               'Calls answered with an error by method and code.')
+        for method, stats in snapshot:
+            label = _EscapeLabel(method)
+            for code, count in sorted(stats['errors'].items()):
+                lines.append('%s_errors_total{method="%s",code="%d"} %d' % (
+                    prefix, label, code, count))
+        Header('in_flight', 'gauge', 'Calls running by method.')
+        for method, stats in snapshot:
+            lines.append('%s_in_flight{method="%s"} %d' % (
+                prefix, _EscapeLabel(method), stats['inFlight']))
+        Header('call_duration_seconds', 'histogram',
+               'Call latency by method.')
+        name = prefix + '_call_duration_seconds'
+        for method, stats in snapshot:
+            label = _EscapeLabel(method)
+            latency = stats['latency']
+            # buckets are cumulative, the count is the +Inf bucket
+            cumulative = 0
+            for bound, count in zip(latency.bounds + ('+Inf',),
+                                    latency.counts):
+                cumulative += count
+                lines.append('%s_bucket{method="%s",le="%s"} %d' % (
+                    name, label, _FormatBound(bound), cumulative))
+            lines.append('%s_sum{method="%s"} %r' % (name, label,
+                                                     float(latency.total)))
+            lines.append('%s_count{method="%s"} %d' % (name, label,
+                                                       cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+def _EscapeLabel(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _FormatBound(bound):
+    if isinstance(bound, str):
+        return bound
+    return repr(float(bound))
@@ -0,0 +1,387 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+'''Envelope scanner: finds JSON-RPC message members in json text without
+decoding the values which are not needed.
+Values are skipped by their structure only: brackets and strings. Values
+left raw are proven valid by the json grammar, one which can not be proven
+is reported by `JsonScanError`: the text is decoded then.'''
+import re
+
+
+class JsonScanError(ValueError):
+    '''Raised if the scanner can not handle the text. The text should be
+    decoded by a json decoder then, it reports the exact error.'''
+    pass
+
+
+# Longest string the patterns skip, longer ones are skipped by find
+_SHORT_STRING_LEN = 64
+# Nesting of containers the patterns skip in one match
+_SKIP_NESTING = 3
+
+
+def _SkipPatterns():
+    '''Returns patterns (token, value): token skips everything but
+    brackets and long or escaped strings and captures the character it stops
+    at, containers nested up to _SKIP_NESTING levels are skipped as a whole;
+    value matches such a container.
+    Possessive quantifiers keep matching linear, they need Python 3.11,
+    older versions get token skipping text between brackets and no value
+    pattern.'''
+    text = r'[^"{}\[\]]++|"[^"\\]{0,%d}+"' % _SHORT_STRING_LEN
+    inner = '(?:%s)*+' % text
+    for _ in range(_SKIP_NESTING):
+        container = r'[{\[]%s[}\]]' % inner
+        inner = '(?:%s|%s)*+' % (text, container)
+    try:
+        re.compile(inner)
+    except re.error:
+        return r'[^"{}\[\]]*([{}\[\]"])', None
+    return inner + r'([{}\[\]"])', r'[{\[]%s[}\]]' % inner
+
+
+_TOKEN_PATTERN, _VALUE_PATTERN = _SkipPatterns()
+
+# Nesting of containers `proveValue` follows, deeper values are decoded:
+# the decoder may refuse them
+_PROVE_NESTING = 256
+# Nesting of containers the prove patterns match as a whole
+_PROVE_RUN_NESTING = 3
+
+
+def _ProvePatterns():
+    '''Returns patterns (value, member, arrayRun, objectRun) of the json
+    grammar: value matches a value nested up to _PROVE_RUN_NESTING levels,
+    member a member name with its colon. A run matches elements or members
+    of a container up to its closing bracket or a deeper container, each
+    element with the comma after it. A comma is allowed only before another
+    element, so a run ends at the closing bracket only right after a value,
+    and every container level embeds the level below once.
+    Possessive quantifiers keep matching linear, they need Python 3.11:
+    older versions get None, values are not proven and the text is decoded.
+    A string holds any character but controls, in bytes text any byte: they
+    are checked to be UTF-8 then.'''
+    try:
+        re.compile('a++')
+    except re.error:
+        return None
+    space = r'[ \t\n\r]*+'
+    char = r'[^"\\\x00-\x1f]*+'
+    string = r'"%s(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})%s)*+"' % (char, char)
+    scalar = r'(?:%s|-?+(?:0|[1-9][0-9]*+)(?:\.[0-9]++)?+' \
+        r'(?:[eE][-+]?+[0-9]++)?+|true|false|null)' % string
+    member = r'%s%s:%s' % (string, space, space)
+    value = scalar
+    for _ in range(_PROVE_RUN_NESTING):
+        array = r'\[%s(?:%s%s(?:,%s(?!\])|(?=\])))*+\]' % (
+            space, value, space, space)
+        obj = r'\{%s(?:%s%s%s(?:,%s(?!\})|(?=\})))*+\}' % (
+            space, member, value, space, space)
+        value = '(?:%s|%s|%s)' % (scalar, array, obj)
+    arrayRun = r'(?:%s%s(?:,%s(?!\])|(?=\])))*+' % (value, space, space)
+    objectRun = r'(?:%s%s(?:,%s%s(?!\})|(?=\})))*+' % (value, space, space,
+                                                      member)
+    return value, member, arrayRun, objectRun
+
+
+_PROVE_PATTERNS = _ProvePatterns()
+
+
+class _Syntax(object):
+    '''Compiled patterns and characters for str or bytes text'''
+    def __init__(self, pattern, char):
+        self.space = re.compile(pattern(r'[ \t\r\n]*'))
+        self.key = re.compile(pattern(r'"([^"\\]*)"[ \t\r\n]*:[ \t\r\n]*'))
+        self.scalar = re.compile(pattern(r'[-+0-9.eE]+|[a-z]+'))
+        self.token = re.compile(pattern(_TOKEN_PATTERN))
+        self.value = None
+        if _VALUE_PATTERN is not None:
+            self.value = re.compile(pattern(_VALUE_PATTERN))
+        self._pattern = pattern
+        self._proven = None
+        self.objectStart = char('{')
+        self.objectEnd = char('}')
+        self.arrayStart = char('[')
+        self.arrayEnd = char(']')
+        self.quote = char('"')
+        self.backslash = char('\\')
+        self.comma = char(',')
+        self.quoteText = pattern('"')
+
+    def Proven(self):
+        '''Returns compiled prove patterns (value, member, arrayRun,
+        objectRun), None if there are none. They are big, compiled on first
+        use.'''
+        if self._proven is None and _PROVE_PATTERNS is not None:
+            self._proven = tuple(re.compile(self._pattern(p))
+                                 for p in _PROVE_PATTERNS)
+        return self._proven
+
+
+_STR_SYNTAX = _Syntax(lambda p: p, lambda c: c)
+_BYTES_SYNTAX = _Syntax(lambda p: p.encode('ascii'), ord)
+
+
+def _SyntaxOf(text):
+    if isinstance(text, str):
+        return _STR_SYNTAX
+    return _BYTES_SYNTAX
+
+
+def _SkipString(text, pos, syntax):
+    '''Returns position after the string starting at pos'''
+    end = pos
+    while True:
+        end = text.find(syntax.quoteText, end + 1)
+        if end < 0:
+            raise JsonScanError('Unterminated string')
+        escape = end - 1
+        while text[escape] == syntax.backslash:
+            escape -= 1
+        # the quote is escaped by odd number of backslashes
+        if (end - escape) % 2:
+            return end + 1
+
+
+def skipValue(text, pos, syntax=None):
+    '''Finds the end of json value starting at pos.
+    Params:
+        text -- str, bytes or bytearray json text
+    Raises `JsonScanError` if the value is not complete.
+    Returns position after the value.'''
+    if syntax is None:
+        syntax = _SyntaxOf(text)
+    if pos >= len(text):
+        raise JsonScanError('Value expected')
+    first = text[pos]
+    if first == syntax.quote:
+        return _SkipString(text, pos, syntax)
+    if first != syntax.objectStart and first != syntax.arrayStart:
+        found = syntax.scalar.match(text, pos)
+        if found is None:
+            raise JsonScanError('Value expected')
+        return found.end()
+    if syntax.value is not None:
+        found = syntax.value.match(text, pos)
+        if found is not None:
+            return found.end()
+    depth = 0
+    matchToken = syntax.token.match
+    while True:
+        found = matchToken(text, pos)
+        if found is None:
+            raise JsonScanError('Unterminated value')
+        pos = found.end()
+        char = text[pos - 1]
+        if char == syntax.quote:
+            pos = _SkipString(text, pos - 1, syntax)
+        elif char == syntax.objectStart or char == syntax.arrayStart:
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def proveValue(text, pos, syntax=None):
+    '''Finds the end of json value starting at pos like `skipValue`, and
+    checks the value follows the json grammar. Containers nested deeper
+    than the patterns match are followed by a stack.
+    Params:
+        text -- str, bytes or bytearray json text
+    Raises `JsonScanError` if the value is not complete or is not proven
+    valid: invalid json, NaN and Infinity, nesting deeper than
+    _PROVE_NESTING, bytes which are not UTF-8 or Python older than 3.11.
+    Returns position after the value.'''
+    if syntax is None:
+        syntax = _SyntaxOf(text)
+    proven = syntax.Proven()
+    if proven is None:
+        raise JsonScanError('Values are proven by Python 3.11 or newer')
+    found = proven[0].match(text, pos)
+    if found is not None:
+        end = found.end()
+    else:
+        end = _ProveContainer(text, pos, syntax, proven)
+    if syntax is _BYTES_SYNTAX:
+        value = text[pos:end]
+        if not value.isascii():
+            try:
+                # json text is decoded with surrogatepass too
+                value.decode('utf-8', 'surrogatepass')
+            except UnicodeDecodeError:
+                raise JsonScanError('Value is not UTF-8')
+    return end
+
+
+def _ProveContainer(text, pos, syntax, proven):
+    '''Proves container starting at pos which is nested deeper than the
+    patterns match, containers are followed by a stack of their closing
+    brackets.
+    Returns position after the container.'''
+    size = len(text)
+    matchSpace = syntax.space.match
+    closers = []
+    while True:
+        # a container starts at pos
+        if pos >= size:
+            raise JsonScanError('Value expected')
+        char = text[pos]
+        if char == syntax.arrayStart:
+            closers.append(syntax.arrayEnd)
+        elif char == syntax.objectStart:
+            closers.append(syntax.objectEnd)
+        else:
+            raise JsonScanError('Value not proven valid')
+        if len(closers) > _PROVE_NESTING:
+            raise JsonScanError('Value nested too deep')
+        pos = matchSpace(text, pos + 1).end()
+        if pos < size and text[pos] == closers[-1]:
+            closed = True
+        else:
+            pos, closed = _ProveElements(text, pos, syntax, proven,
+                                         closers[-1])
+        while closed:
+            closers.pop()
+            pos += 1
+            if not closers:
+                return pos
+            pos = matchSpace(text, pos).end()
+            if pos >= size:
+                raise JsonScanError('Unterminated value')
+            char = text[pos]
+            if char == closers[-1]:
+                continue
+            if char != syntax.comma:
+                raise JsonScanError('Comma expected')
+            pos = matchSpace(text, pos + 1).end()
+            pos, closed = _ProveElements(text, pos, syntax, proven,
+                                         closers[-1])
+
+
+def _ProveElements(text, pos, syntax, proven, closer):
+    '''Matches elements or members of a container from pos, which follows
+    the opening bracket or a comma.
+    Returns (position, bool): the position is at the closing bracket if
+    the bool is True, at a value the run can not match otherwise.'''
+    _, member, arrayRun, objectRun = proven
+    if closer == syntax.objectEnd:
+        found = member.match(text, pos)
+        if found is None:
+            raise JsonScanError('Member name expected')
+        pos = found.end()
+        run = objectRun
+    else:
+        run = arrayRun
+    end = run.match(text, pos).end()
+    # a run ends before the closing bracket only right after a value
+    return end, end > pos and end < len(text) and text[end] == closer
+
+
+def scanObject(text, pos, syntax=None, provenNames=()):
+    '''Scans json object starting at pos, member values are skipped.
+    Params:
+        provenNames -- set of member names whose values are checked by
+            `proveValue`, names of bytes text are bytes
+    Raises `JsonScanError` if the object is not complete, has escaped
+    member names or a value which is not proven valid.
+    Returns (list of (name, valueStart, valueEnd), position after the
+    object).'''
+    if syntax is None:
+        syntax = _SyntaxOf(text)
+    if text[pos] != syntax.objectStart:
+        raise JsonScanError('Object expected')
+    pos = syntax.space.match(text, pos + 1).end()
+    members = []
+    if pos < len(text) and text[pos] == syntax.objectEnd:
+        return members, pos + 1
+    while True:
+        found = syntax.key.match(text, pos)
+        if found is None:
+            raise JsonScanError('Member name expected')
+        name = found.group(1)
+        valueStart = found.end()
+        if name in provenNames:
+            valueEnd = proveValue(text, valueStart, syntax)
+        else:
+            valueEnd = skipValue(text, valueStart, syntax)
+        members.append((name, valueStart, valueEnd))
+        pos = syntax.space.match(text, valueEnd).end()
+        if pos >= len(text):
+            raise JsonScanError('Unterminated object')
+        if text[pos] == syntax.objectEnd:
+            return members, pos + 1
+        if text[pos] != syntax.comma:
+            raise JsonScanError('Comma expected')
+        pos = syntax.space.match(text, pos + 1).end()
+
+
+def loadsLazy(text, loads, rawNames, wrapRaw):
+    '''Decodes JSON-RPC message or batch, values of message members named
+    in rawNames are not decoded but wrapped by wrapRaw.
+    Params:
+        text -- str or bytes-like json text,
+        loads -- function decoding json text,
+        rawNames -- set of member names to leave raw, str,
+        wrapRaw -- function wrapping raw value, gets text, start and end of
+            the value
+    Raises `JsonScanError` if the text can not be scanned or a raw value is
+    not proven valid, at once if values can not be proven at all, and errors
+    of loads for invalid values.'''
+    if rawNames and _PROVE_PATTERNS is None:
+        raise JsonScanError('Values are proven by Python 3.11 or newer')
+    if isinstance(text, memoryview):
+        # find is used to skip strings, memoryview has no find
+        text = bytes(text)
+    syntax = _SyntaxOf(text)
+    if syntax is _BYTES_SYNTAX:
+        rawNames = set(name.encode('ascii') for name in rawNames)
+    pos = syntax.space.match(text, 0).end()
+    if pos >= len(text):
+        raise JsonScanError('Value expected')
+    if text[pos] == syntax.arrayStart:
+        result = []
+        pos = syntax.space.match(text, pos + 1).end()
+        if pos < len(text) and text[pos] == syntax.arrayEnd:
+            end = pos + 1
+        else:
+            while True:
+                if pos < len(text) and text[pos] == syntax.objectStart:
+                    item, pos = _LoadsObjectLazy(
+                        text, pos, syntax, loads, rawNames, wrapRaw)
+                else:
+                    itemEnd = skipValue(text, pos, syntax)
+                    item = loads(text[pos:itemEnd])
+                    pos = itemEnd
+                result.append(item)
+                pos = syntax.space.match(text, pos).end()
+                if pos >= len(text):
+                    raise JsonScanError('Unterminated array')
+                if text[pos] == syntax.arrayEnd:
+                    end = pos + 1
+                    break
+                if text[pos] != syntax.comma:
+                    raise JsonScanError('Comma expected')
+                pos = syntax.space.match(text, pos + 1).end()
+    elif text[pos] == syntax.objectStart:
+        result, end = _LoadsObjectLazy(
+            text, pos, syntax, loads, rawNames, wrapRaw)
+    else:
+        raise JsonScanError('Object or array expected')
+    if syntax.space.match(text, end).end() != len(text):
+        raise JsonScanError('Extra data')
+    return result
+
+
+def _LoadsObjectLazy(text, pos, syntax, loads, rawNames, wrapRaw):
+    members, end = scanObject(text, pos, syntax, rawNames)
+    result = {}
+    for name, valueStart, valueEnd in members:
+        if name in rawNames:
+            value = wrapRaw(text, valueStart, valueEnd)
+        else:
+            value = loads(text[valueStart:valueEnd])
+        if not isinstance(name, str):
+            name = name.decode('utf-8')
+        result[name] = value
+    return result, end
@@ -0,0 +1,290 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+
+from pyjsonrpclite.jsonrpc import JsonRpcException
+
+# Keywords which describe a schema and are not checked
+_ANNOTATIONS = frozenset(['$schema', '$id', '$comment', 'title',
+                          'description', 'default', 'examples'])
+_TYPE_NAMES = {
+    type(None): 'null',
+    bool: 'boolean',
+    int: 'integer',
+    float: 'number',
+    str: 'string',
+    list: 'array',
+    dict: 'object',
+}
+_TYPES = {
+    'null': (type(None),),
+    'boolean': (bool,),
+    'integer': (int,),
+    'number': (int, float),
+    'string': (str,),
+    'array': (list,),
+    'object': (dict,),
+}
+_NUMBER_TYPES = (int, float)
+_KEYWORDS = {}
+
+
+def _Keywords(*names):
+    '''Registers compiler of the keywords, called with the whole schema'''
+    def Register(compiler):
+        for name in names:
+            _KEYWORDS[name] = compiler
+        return compiler
+    return Register
+
+
+def _TypeName(value):
+    return _TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+def _Accept(value):
+    return None
+
+
+def _Reject(value):
+    return [], 'Not allowed'
+
+
+def _Compile(schema):
+    '''Returns check of schema: function of a decoded value returning None
+    if it is valid, a tuple (path, message) otherwise. The path is a list
+    of keys from the failing value up to the checked one.'''
+    if schema is True:
+        return _Accept
+    if schema is False:
+        return _Reject
+    if not isinstance(schema, dict):
+        raise JsonRpcException('Schema should be an object or a boolean')
+    checks = []
+    compilers = []
+    for name in schema:
+        if name in _ANNOTATIONS:
+            continue
+        compiler = _KEYWORDS.get(name)
+        if compiler is None:
+            raise JsonRpcException('Unsupported schema keyword: ' + name)
+        if compiler not in compilers:
+            compilers.append(compiler)
+    # the type is checked first, other keywords may rely on it
+    if 'type' in schema:
+        compilers.remove(_CompileType)
+        compilers.insert(0, _CompileType)
+    for compiler in compilers:
+        checks.append(compiler(schema))
+    if not checks:
+        return _Accept
+    if len(checks) == 1:
+        return checks[0]
+    checks = tuple(checks)
+
+    def CheckAll(value):
+        for check in checks:
+            problem = check(value)
+            if problem is not None:
+                return problem
+        return None
+    return CheckAll
+
+
+@_Keywords('type')
+def _CompileType(schema):
+    names = schema['type']
+    if isinstance(names, str):
+        names = [names]
+    for name in names:
+        if name not in _TYPES:
+            raise JsonRpcException('Unknown schema type: %s' % (name,))
+    expected = ' or '.join(names)
+    types = frozenset(t for name in names for t in _TYPES[name])
+    # an integer may be written as 1.0, a bool is never a number
+    integral = 'integer' in names and float not in types
+    if len(types) == 1 and not integral:
+        pythonType = next(iter(types))
+
+        def CheckType(value):
+            if type(value) is not pythonType:
+                return [], 'Expected %s, got %s' % (expected,
+                                                    _TypeName(value))
+            return None
+        return CheckType
+
+    def CheckTypes(value):
+        valueType = type(value)
+        if valueType not in types and not (
+                integral and valueType is float and value.is_integer()):
+            return [], 'Expected %s, got %s' % (expected, _TypeName(value))
+        return None
+    return CheckTypes
+
+
+@_Keywords('enum')
+def _CompileEnum(schema):
+    # 1 and 1.0 are the same value, true and 1 are not
+    allowed = tuple((_TypeName(item) == 'boolean', item)
+                    for item in schema['enum'])
+    message = 'Expected one of ' + ', '.join(repr(item)
+                                             for item in schema['enum'])
+
+    def CheckEnum(value):
+        isBool = type(value) is bool
+        for itemIsBool, item in allowed:
+            if itemIsBool is isBool and item == value:
+                return None
+        return [], message
+    return CheckEnum
+
+
+@_Keywords('minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum')
+def _CompileRange(schema):
+    low = schema.get('minimum')
+    high = schema.get('maximum')
+    lowExclusive = schema.get('exclusiveMinimum')
+    highExclusive = schema.get('exclusiveMaximum')
+    for limit in (low, high, lowExclusive, highExclusive):
+        if limit is not None and type(limit) not in _NUMBER_TYPES:
+            raise JsonRpcException('Schema range should be a number')
+
+    def CheckRange(value):
+        if type(value) is not int and type(value) is not float:
+            return None
+        if low is not None and value < low:
+            return [], 'Expected at least %r' % (low,)
+        if high is not None and value > high:
+            return [], 'Expected at most %r' % (high,)
+        if lowExclusive is not None and value <= lowExclusive:
+            return [], 'Expected more than %r' % (lowExclusive,)
+        if highExclusive is not None and value >= highExclusive:
+            return [], 'Expected less than %r' % (highExclusive,)
+        return None
+    return CheckRange
+
+
+@_Keywords('minLength', 'maxLength', 'pattern')
+def _CompileString(schema):
+    minLength = schema.get('minLength', 0)
+    maxLength = schema.get('maxLength')
+    pattern = schema.get('pattern')
+    search = re.compile(pattern).search if pattern is not None else None
+
+    def CheckString(value):
+        if type(value) is not str:
+            return None
+        length = len(value)
+        if length < minLength:
+            return [], 'Expected at least %d characters' % minLength
+        if maxLength is not None and length > maxLength:
+            return [], 'Expected at most %d characters' % maxLength
+        if search is not None and search(value) is None:
+            return [], 'Expected to match ' + pattern
+        return None
+    return CheckString
+
+
+@_Keywords('items', 'prefixItems', 'minItems', 'maxItems')
+def _CompileArray(schema):
+    if isinstance(schema.get('items'), list):
+        raise JsonRpcException('Schema items should be a schema, '
+                               'use prefixItems for positions')
+    prefix = tuple(_Compile(item) for item in schema.get('prefixItems', ()))
+    items = _Compile(schema['items']) if 'items' in schema else None
+    minItems = schema.get('minItems', 0)
+    maxItems = schema.get('maxItems')
+
+    def CheckArray(value):
+        if type(value) is not list:
+            return None
+        count = len(value)
+        if count < minItems:
+            return [], 'Expected at least %d items' % minItems
+        if maxItems is not None and count > maxItems:
+            return [], 'Expected at most %d items' % maxItems
+        for index, check in enumerate(prefix[:count]):
+            problem = check(value[index])
+            if problem is not None:
+                problem[0].append(index)
+                return problem
+        if items is not None:
+            for index in range(len(prefix), count):
+                problem = items(value[index])
+                if problem is not None:
+                    problem[0].append(index)
+                    return problem
+        return None
+    return CheckArray
+
+
+@_Keywords('properties', 'required', 'additionalProperties')
+def _CompileObject(schema):
+    properties = tuple((name, _Compile(sub)) for name, sub
+                       in schema.get('properties', {}).items())
+    required = tuple(schema.get('required', ()))
+    additional = schema.get('additionalProperties', True)
+    known = frozenset(name for name, _ in properties)
+    additionalCheck = None if additional is True else _Compile(additional)
+
+    def CheckObject(value):
+        if type(value) is not dict:
+            return None
+        for name in required:
+            if name not in value:
+                return [name], 'Missing required property'
+        for name, check in properties:
+            if name in value:
+                problem = check(value[name])
+                if problem is not None:
+                    problem[0].append(name)
+                    return problem
+        if additionalCheck is not None:
+            for name in value:
+                if name not in known:
+                    problem = additionalCheck(value[name])
+                    if problem is not None:
+                        if additional is False:
+                            return [name], 'Unexpected property'
+                        problem[0].append(name)
+                        return problem
+        return None
+    return CheckObject
+
+
+def _Pointer(path):
+    '''Returns JSON Pointer of the reversed path'''
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1')
+                   for key in reversed(path))
+
+
+class JsonRpcParamsSchema(object):
+    '''Params schema of a method, compiled once to checks specialized for
+    its keywords. A JSON Schema subset is supported:
+        type -- null, boolean, integer, number, string, array, object or a
+            list of them,
+        enum,
+        minimum, maximum, exclusiveMinimum, exclusiveMaximum -- numbers,
+        minLength, maxLength, pattern -- strings,
+        items, prefixItems, minItems, maxItems -- arrays,
+        properties, required, additionalProperties -- objects,
+    and true or false as a schema. Keywords of a type other than the
+    value's are ignored, like JSON Schema does. title, description and
+    other annotations are ignored too.
+    Params:
+        schema -- dict, the schema of params
+    Raises `JsonRpcException` if the schema has an unsupported keyword.'''
+    def __init__(self, schema):
+        self.schema = schema
+        self._check = _Compile(schema)
+
+    def Validate(self, params):
+        '''Checks params: list, dict or None for omitted ones.
+        Returns None if they are valid, dict with the JSON Pointer to the
+        first invalid value and the problem otherwise:
+        {"path": "/items/2/price", "message": "Expected at least 0"}'''
+        problem = self._check(params)
+        if problem is None:
+            return None
+        path, message = problem
+        return {'path': _Pointer(path), 'message': message}
@@ -0,0 +1,233 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import heapq
+import time
+from concurrent import futures
+
+from pyjsonrpclite.jsonrpc import JsonRpcException, JsonRpcMessage,\
+    JsonRpcParsedType, JsonRpcSuccessResponse, JsonRpcErrorResponse,\
+    JsonRpcError
+
+# Max calls waiting for responses in one session
+DEFAULT_MAX_PENDING = 65536
+# Ids are allocated from 1 to MAX_ID, then from 1 again
+MAX_ID = 2 ** 31 - 1
+
+
+class JsonRpcCallError(JsonRpcException):
+    """Raised by the future of a call answered with an error.
+    Params:
+        rpcError - `JsonRpcError`"""
+    def __init__(self, rpcError):
+        JsonRpcException.__init__(self, rpcError)
+        self.rpcError = rpcError
+
+
+class JsonRpcCallTimeout(JsonRpcCallError):
+    """Raised by the future of a call which got no response in time."""
+    pass
+
+
+class _PendingCall(object):
+    '''Entry of the pending call table'''
+    __slots__ = ('id', 'future', 'callback', 'deadline')
+
+    def __init__(self, reqId, future, callback, deadline):
+        self.id = reqId
+        self.future = future
+        self.callback = callback
+        self.deadline = deadline
+
+
+class JsonRpcClientSession(object):
+    '''Client side of a connection: allocates request ids and matches
+    responses to the calls waiting for them.
+    Ids are small integers reused after MAX_ID, an id of a pending call is
+    never reused. Each call is completed once: with its response, on its
+    timeout, by `Cancel` or `Close`.
+    A call is completed through a future or a callback. The future gets
+    the result or `JsonRpcCallError`, `JsonRpcCallTimeout` on timeout. The
+    callback gets the response: `JsonRpcSuccessResponse` or
+    `JsonRpcErrorResponse`, the one with `JsonRpcCallTimeout` error on
+    timeout.
+    Memory is bounded: at most maxPending calls wait at once, and the
+    timeout queue is compacted when most of its entries are completed.
+    Params:
+        maxPending -- int, max calls waiting for responses,
+        timeout -- default seconds to wait for a response, None for no
+            limit,
+        futureFactory -- function creating a future, like
+            asyncio.get_running_loop().create_future; concurrent.futures
+            Future by default,
+        clock -- function returning current time in seconds'''
+    def __init__(self, maxPending=DEFAULT_MAX_PENDING, timeout=None,
+                 futureFactory=futures.Future, clock=time.monotonic):
+        self.maxPending = maxPending
+        self.timeout = timeout
+        self._futureFactory = futureFactory
+        self._clock = clock
+        self._pending = {}
+        self._deadlines = []    # heap of (deadline, seq, _PendingCall)
+        self._seq = 0
+        self._nextId = 1
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, reqId):
+        return reqId in self._pending
+
+    def _AllocateId(self):
+        reqId = self._nextId
+        while reqId in self._pending:
+            reqId = reqId + 1 if reqId < MAX_ID else 1
+        self._nextId = reqId + 1 if reqId < MAX_ID else 1
+        return reqId
+
+    def Request(self, method, params=None, timeout=None, callback=None):
+        '''Creates a request and registers the call waiting for its
+        response.
+        Params:
+            timeout -- seconds to wait for the response, the session
+                timeout if None,
+            callback -- function called with the response, no future is
+                created if it is given
+        Raises `JsonRpcException` if maxPending calls are waiting already.
+        Returns tuple (`JsonRpcRequest`, future or None).'''
+        if len(self._pending) >= self.maxPending:
+            raise JsonRpcException('Too many pending calls')
+        reqId = self._AllocateId()
+        future = None
+        if callback is None:
+            future = self._futureFactory()
+        if timeout is None:
+            timeout = self.timeout
+        call = _PendingCall(reqId, future, callback, None)
+        self._pending[reqId] = call
+        if timeout is not None:
+            call.deadline = self._clock() + timeout
+            self._seq += 1
+            heapq.heappush(self._deadlines, (call.deadline, self._seq, call))
+            self._CompactDeadlines()
+        return JsonRpcMessage.Request(reqId, method, params), future
+
+    def Notification(self, method, params=None):
+        '''Returns `JsonRpcNotification`, no response is waited for'''
+        return JsonRpcMessage.Notification(method, params)
+
+    def Resolve(self, response):
+        '''Completes the call of response.
+        Params:
+            response -- `JsonRpcSuccessResponse`, `JsonRpcErrorResponse`,
+                `JsonRpcParsed` or list of them for a batch, responses may
+                come in any order
+        Returns number of calls completed, responses to unknown or
+        completed calls are ignored. An INVALID `JsonRpcParsed` whose id
+        is of a pending call completes it with `JsonRpcCallError` of the
+        parse error.'''
+        if isinstance(response, list):
+            completed = 0
+            for item in response:
+                completed += self.Resolve(item)
+            return completed
+        parsedType = getattr(response, 'parsedType', None)
+        if parsedType is not None:
+            if parsedType != JsonRpcParsedType.SUCCESS and \
+                    parsedType != JsonRpcParsedType.ERROR and \
+                    parsedType != JsonRpcParsedType.INVALID:
+                return 0
+            # the error response of an invalid message has its id if it
+            # could be found, the call waiting for it fails with the error
+            response = response.payload
+        if not isinstance(response, (JsonRpcSuccessResponse,
+                                     JsonRpcErrorResponse)):
+            return 0
+        try:
+            call = self._pending.pop(response.id, None)
+        except TypeError:
+            # unhashable id, no call has it
+            return 0
+        if call is None:
+            return 0
+        if isinstance(response, JsonRpcErrorResponse):
+            self._Complete(call, response, JsonRpcCallError(response.error))
+        else:
+            self._Complete(call, response, None)
+        return 1
+
+    def _Complete(self, call, response, error):
+        if call.callback is not None:
+            call.callback(response)
+            return
+        future = call.future
+        if future.done():
+            # cancelled by the caller
+            return
+        if error is None:
+            future.set_result(response.result)
+        else:
+            future.set_exception(error)
+
+    def Cancel(self, reqId):
+        '''Forgets the call, a late response to it is ignored.
+        Returns True if the call was pending.'''
+        call = self._pending.pop(reqId, None)
+        if call is None:
+            return False
+        if call.future is not None:
+            call.future.cancel()
+        return True
+
+    def NextDeadline(self):
+        '''Returns seconds until the next call times out, None if no call
+        waits with a timeout.'''
+        deadlines = self._deadlines
+        while deadlines and self._pending.get(deadlines[0][2].id) is not \
+                deadlines[0][2]:
+            heapq.heappop(deadlines)
+        if not deadlines:
+            return None
+        return max(0.0, deadlines[0][0] - self._clock())
+
+    def Expire(self):
+        '''Completes the calls whose timeout has passed with
+        `JsonRpcCallTimeout`.
+        Returns number of calls expired.'''
+        now = self._clock()
+        deadlines = self._deadlines
+        expired = 0
+        while deadlines and deadlines[0][0] <= now:
+            call = heapq.heappop(deadlines)[2]
+            if self._pending.get(call.id) is not call:
+                continue
+            del self._pending[call.id]
+            error = JsonRpcError.InternalError('Request timed out')
+            self._Complete(call, JsonRpcMessage.Error(call.id, error),
+                           JsonRpcCallTimeout(error))
+            expired += 1
+        return expired
+
+    def Close(self, rpcError=None):
+        '''Completes all pending calls with `JsonRpcCallError`, when the
+        connection is lost.
+        Params:
+            rpcError -- `JsonRpcError`, InternalError by default'''
+        if rpcError is None:
+            rpcError = JsonRpcError.InternalError('Connection closed')
+        pending = self._pending
+        self._pending = {}
+        self._deadlines = []
+        for call in pending.values():
+            self._Complete(call, JsonRpcMessage.Error(call.id, rpcError),
+                           JsonRpcCallError(rpcError))
+
+    def _CompactDeadlines(self):
+        '''Drops entries of completed calls when they are the most of the
+        queue, keeps it proportional to the pending calls'''
+        deadlines = self._deadlines
+        if len(deadlines) <= 2 * len(self._pending) + 64:
+            return
+        pending = self._pending
+        self._deadlines = [entry for entry in deadlines
+                           if pending.get(entry[2].id) is entry[2]]
+        heapq.heapify(self._deadlines)
@@ -0,0 +1,315 @@
+﻿#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+'''asyncio stream transport: TCP and Unix socket server and client.
+Messages are framed by `JsonRpcStreamDecoder` in newline delimited mode
+(NDJSON) by default or by `JsonRpcContentLengthCodec`.
+Both sides pipeline: any number of calls are in flight on a connection,
+responses are written as soon as they are ready. Frames written during one
+event loop iteration are sent with one write. When the socket write buffer
+is full the server stops reading requests and the client waits before
+sending new ones, until the buffer drains. The server also stops reading
+while a connection has too many messages being handled.'''
+import asyncio
+
+from pyjsonrpclite.jsonrpc import JsonRpcBatch, JsonRpcParsedType
+from pyjsonrpclite.framing import JsonRpcStreamDecoder
+from pyjsonrpclite.session import JsonRpcClientSession, DEFAULT_MAX_PENDING
+
+# Max messages of a connection being handled before the server stops
+# reading it
+DEFAULT_MAX_TASKS = 1024
+
+
+def ndjsonCodec():
+    '''Returns codec of newline delimited messages, the default framing'''
+    return JsonRpcStreamDecoder(newlineDelimited=True)
+
+
+class _JsonRpcProtocol(asyncio.Protocol):
+    '''Connection end: frames messages with codec, coalesces writes'''
+    def __init__(self, codecFactory, escape):
+        self._codec = codecFactory()
+        self._escape = escape
+        self._transport = None
+        self._outbox = []
+        self._flushScheduled = False
+        self._writePaused = False
+        self._drainWaiters = []
+        self._closed = False
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        self._closed = True
+        self._outbox = []
+        self._WakeDrainWaiters()
+
+    def pause_writing(self):
+        self._writePaused = True
+
+    def resume_writing(self):
+        self._writePaused = False
+        self._WakeDrainWaiters()
+
+    def _WakeDrainWaiters(self):
+        waiters = self._drainWaiters
+        self._drainWaiters = []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _Drain(self):
+        '''Waits until the socket write buffer drains'''
+        if self._writePaused and not self._closed:
+            waiter = asyncio.get_running_loop().create_future()
+            self._drainWaiters.append(waiter)
+            await waiter
+
+    def Write(self, msg):
+        '''Queues message to be written at the end of this loop iteration.
+        Params:
+            msg -- `JsonRpcMessage` or `JsonRpcBatch`'''
+        if self._closed:
+            return
+        frame = self._codec.Encode(msg, self._escape)
+        if not frame:
+            return
+        self._outbox.append(frame)
+        if not self._flushScheduled:
+            self._flushScheduled = True
+            asyncio.get_running_loop().call_soon(self._Flush)
+
+    def _Flush(self):
+        self._flushScheduled = False
+        outbox = self._outbox
+        if not outbox or self._closed:
+            return
+        self._outbox = []
+        self._transport.write(outbox[0] if len(outbox) == 1 else
+                              b''.join(outbox))
+
+    def Close(self):
+        '''Sends queued messages and closes the connection'''
+        if self._transport is not None and not self._closed:
+            self._Flush()
+            self._transport.close()
+
+
+class JsonRpcServerProtocol(_JsonRpcProtocol):
+    '''Server end of a connection: dispatches received messages with
+    `JsonRpcAsyncDispatcher`, each message concurrently, and writes the
+    responses in the order they are ready.
+    Params:
+        dispatcher -- `JsonRpcAsyncDispatcher`,
+        maxConcurrency -- int, max handlers of the connection running at
+            once, None for no limit,
+        codecFactory -- function returning a codec: `JsonRpcStreamDecoder`
+            or `JsonRpcContentLengthCodec`,
+        escape -- bool, escape non-ASCII characters of responses,
+        maxTasks -- int, reading stops when this many messages are being
+            handled, waiting ones included, and resumes when half of them
+            are done. Messages of one received chunk are all taken.'''
+    def __init__(self, dispatcher, maxConcurrency=None,
+                 codecFactory=ndjsonCodec, escape=True,
+                 maxTasks=DEFAULT_MAX_TASKS):
+        _JsonRpcProtocol.__init__(self, codecFactory, escape)
+        self._connection = dispatcher.Connection(maxConcurrency)
+        self._maxTasks = maxTasks
+        self._tasks = set()
+        self._readPaused = False
+
+    def data_received(self, data):
+        loop = asyncio.get_running_loop()
+        for parsed in self._codec.Feed(data):
+            if not isinstance(parsed, list) and \
+                    parsed.parsedType == JsonRpcParsedType.INVALID:
+                self.Write(parsed.payload)
+                continue
+            task = loop.create_task(self._Handle(parsed))
+            self._tasks.add(task)
+            task.add_done_callback(self._TaskDone)
+        if len(self._tasks) >= self._maxTasks:
+            self._PauseReading()
+
+    def _TaskDone(self, task):
+        self._tasks.discard(task)
+        if self._readPaused and len(self._tasks) <= self._maxTasks // 2:
+            self._ResumeReading()
+
+    def _PauseReading(self):
+        if not self._readPaused and not self._closed:
+            self._readPaused = True
+            self._transport.pause_reading()
+
+    def _ResumeReading(self):
+        '''Resumes reading unless the write buffer is full or too many
+        messages are being handled'''
+        if self._readPaused and not self._closed and \
+                not self._writePaused and \
+                len(self._tasks) <= self._maxTasks // 2:
+            self._readPaused = False
+            self._transport.resume_reading()
+
+    async def _Handle(self, parsed):
+        response = await self._connection.Dispatch(parsed)
+        if response is not None:
+            self.Write(response)
+
+    def pause_writing(self):
+        # stop taking requests until the client reads the responses
+        _JsonRpcProtocol.pause_writing(self)
+        self._PauseReading()
+
+    def resume_writing(self):
+        _JsonRpcProtocol.resume_writing(self)
+        self._ResumeReading()
+
+    def connection_lost(self, exc):
+        _JsonRpcProtocol.connection_lost(self, exc)
+        for task in list(self._tasks):
+            task.cancel()
+
+
+class JsonRpcAsyncClient(_JsonRpcProtocol):
+    '''Client end of a connection. Calls are matched with responses by
+    `JsonRpcClientSession`, any number of them may be in flight.
+    Params:
+        timeout -- default seconds to wait for a response, None for no
+            limit,
+        maxPending -- int, max calls waiting for responses,
+        codecFactory -- function returning a codec: `JsonRpcStreamDecoder`
+            or `JsonRpcContentLengthCodec`,
+        escape -- bool, escape non-ASCII characters of requests'''
+    def __init__(self, timeout=None, maxPending=DEFAULT_MAX_PENDING,
+                 codecFactory=ndjsonCodec, escape=True):
+        _JsonRpcProtocol.__init__(self, codecFactory, escape)
+        self._timeout = timeout
+        self._maxPending = maxPending
+        self.session = None
+        self._expireTimer = None
+        self._expireAt = None
+
+    def connection_made(self, transport):
+        _JsonRpcProtocol.connection_made(self, transport)
+        loop = asyncio.get_running_loop()
+        self.session = JsonRpcClientSession(
+            self._maxPending, self._timeout, loop.create_future, loop.time)
+
+    def data_received(self, data):
+        for parsed in self._codec.Feed(data):
+            self.session.Resolve(parsed)
+
+    def connection_lost(self, exc):
+        _JsonRpcProtocol.connection_lost(self, exc)
+        if self._expireTimer is not None:
+            self._expireTimer.cancel()
+        self.session.Close()
+
+    def _ScheduleExpire(self):
+        delay = self.session.NextDeadline()
+        if delay is None:
+            return
+        loop = asyncio.get_running_loop()
+        expireAt = loop.time() + delay
+        if self._expireTimer is not None:
+            if self._expireAt <= expireAt:
+                return
+            self._expireTimer.cancel()
+        self._expireAt = expireAt
+        self._expireTimer = loop.call_at(expireAt, self._Expire)
+
+    def _Expire(self):
+        self._expireTimer = None
+        self.session.Expire()
+        self._ScheduleExpire()
+
+    async def _Ready(self):
+        '''Waits until a message can be written.
+        Raises ConnectionError if the connection is closed.'''
+        await self._Drain()
+        if self._closed:
+            raise ConnectionError('Connection closed')
+
+    def _Request(self, method, params, timeout):
+        msg, future = self.session.Request(method, params, timeout)
+        if timeout is not None or self.session.timeout is not None:
+            self._ScheduleExpire()
+        return msg, future
+
+    async def Call(self, method, params=None, timeout=None):
+        '''Calls method, waits for the response.
+        Raises `JsonRpcCallError` if the response is an error,
+        `JsonRpcCallTimeout` on timeout.
+        Returns result.'''
+        await self._Ready()
+        msg, future = self._Request(method, params, timeout)
+        self.Write(msg)
+        return await future
+
+    async def CallBatch(self, calls, timeout=None):
+        '''Calls methods in one batch, waits for all the responses.
+        Params:
+            calls -- list of tuples (method, params)
+        Returns list of results in the order of calls, a call answered
+        with an error has `JsonRpcCallError` in place of its result.'''
+        await self._Ready()
+        requests = []
+        waiters = []
+        for method, params in calls:
+            msg, future = self._Request(method, params, timeout)
+            requests.append(msg)
+            waiters.append(future)
+        self.Write(JsonRpcBatch(requests))
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    async def Notify(self, method, params=None):
+        '''Sends notification, no response is waited for'''
+        await self._Ready()
+        self.Write(self.session.Notification(method, params))
+
+
+async def startServer(dispatcher, host=None, port=None, path=None,
+                      maxConcurrency=None, codecFactory=ndjsonCodec,
+                      escape=True, maxTasks=DEFAULT_MAX_TASKS, **kwargs):
+    '''Starts server dispatching messages with `JsonRpcAsyncDispatcher`.
+    Listens on a Unix socket if path is given, TCP host and port otherwise.
+    Params:
+        maxConcurrency -- int, max handlers of a connection running at
+            once, None for no limit,
+        maxTasks -- int, max messages of a connection being handled before
+            the server stops reading it,
+        kwargs -- passed to loop.create_server or loop.create_unix_server
+    Returns asyncio Server.'''
+    loop = asyncio.get_running_loop()
+
+    def Protocol():
+        return JsonRpcServerProtocol(dispatcher, maxConcurrency,
+                                     codecFactory, escape, maxTasks)
+    if path is not None:
+        return await loop.create_unix_server(Protocol, path, **kwargs)
+    return await loop.create_server(Protocol, host, port, **kwargs)
+
+
+async def openConnection(host=None, port=None, path=None, timeout=None,
+                         maxPending=DEFAULT_MAX_PENDING,
+                         codecFactory=ndjsonCodec, escape=True, **kwargs):
+    '''Connects to a server, to a Unix socket if path is given, TCP host and
+    port otherwise.
+    Params:
+        timeout -- default seconds to wait for a response, None for no
+            limit,
+        kwargs -- passed to loop.create_connection or
+            loop.create_unix_connection
+    Returns `JsonRpcAsyncClient`.'''
+    loop = asyncio.get_running_loop()
+
+    def Protocol():
+        return JsonRpcAsyncClient(timeout, maxPending, codecFactory, escape)
+    if path is not None:
+        _, client = await loop.create_unix_connection(Protocol, path,
+                                                      **kwargs)
+    else:
+        _, client = await loop.create_connection(Protocol, host, port,
+                                                 **kwargs)
+    return client
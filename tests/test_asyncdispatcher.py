@@ -0,0 +1,179 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import unittest
+import testutils
+from concurrent import futures
+
+import pyjsonrpclite
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcBatch,\
+    JsonRpcAsyncDispatcher, JsonRpcExecutorPolicy
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def BatchJson(messages):
+    return '[' + ','.join(msg.AsWireJson() for msg in messages) + ']'
+
+
+def BlockingSleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def Square(value):
+    return value * value
+
+
+class InFlight(object):
+    '''Counts handlers running at once'''
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.notified = []
+
+    async def Sleep(self, seconds, value=None):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.current -= 1
+        return value
+
+    async def Notify(self, value):
+        await asyncio.sleep(0.001)
+        self.notified.append(value)
+
+
+class TestAsyncDispatcher(unittest.TestCase):
+    def MakeDispatcher(self, maxConcurrency=None):
+        dispatcher = JsonRpcAsyncDispatcher(maxConcurrency)
+        self.inFlight = InFlight()
+        dispatcher.Register(self.inFlight.Sleep, 'sleep')
+        dispatcher.Register(self.inFlight.Notify, 'notify')
+        dispatcher.Register(lambda a, b: a + b, 'add')
+        return dispatcher
+
+    def testBatchRunsConcurrently(self):
+        dispatcher = self.MakeDispatcher()
+        requests = [JsonRpcMessage.Request(i, 'sleep', [0.2 - i * 0.001, i])
+                    for i in range(100)]
+        messages = requests + [JsonRpcMessage.Notification('notify', [1]),
+                               JsonRpcMessage.Request(100, 'add', [1, 2]),
+                               JsonRpcMessage.Request(101, 'missing')]
+        started = time.time()
+        response = asyncio.run(
+            dispatcher.DispatchJsonAsync(BatchJson(messages)))
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(100, self.inFlight.peak)
+        self.assertEqual([1], self.inFlight.notified)
+        expected = JsonRpcBatch(
+            [JsonRpcMessage.Success(i, i) for i in range(100)] +
+            [JsonRpcMessage.Success(100, 3),
+             JsonRpcMessage.Error(101, JsonRpcError.MethodNotFound())])
+        self.assertEqual(expected.AsWireJson(), response.AsWireJson())
+
+    def testLimits(self):
+        dispatcher = self.MakeDispatcher(maxConcurrency=5)
+        batch = BatchJson([JsonRpcMessage.Request(i, 'sleep', [0.01, i])
+                           for i in range(20)])
+
+        async def Run():
+            first = dispatcher.Connection(maxConcurrency=2)
+            second = dispatcher.Connection()
+            return await asyncio.gather(first.DispatchJson(batch),
+                                        second.DispatchJson(batch))
+        responses = asyncio.run(Run())
+        self.assertEqual(5, self.inFlight.peak)
+        for response in responses:
+            self.assertEqual(list(range(20)),
+                             [msg.result for msg in response])
+        with self.assertRaises(ValueError):
+            dispatcher.Connection(0)
+
+    def testConnectionLimit(self):
+        dispatcher = self.MakeDispatcher()
+        batch = BatchJson([JsonRpcMessage.Request(i, 'sleep', [0.01, i])
+                           for i in range(10)])
+        connection = dispatcher.Connection(maxConcurrency=3)
+        asyncio.run(connection.DispatchJson(batch))
+        self.assertEqual(3, self.inFlight.peak)
+
+    def testLimitsAcrossLoops(self):
+        # made before any loop runs, then used by two of them
+        dispatcher = self.MakeDispatcher(maxConcurrency=2)
+        connection = dispatcher.Connection(maxConcurrency=2)
+        batch = BatchJson([JsonRpcMessage.Request(i, 'sleep', [0.001, i])
+                           for i in range(5)])
+        for _ in range(2):
+            response = asyncio.run(connection.DispatchJson(batch))
+            self.assertEqual(list(range(5)),
+                             [msg.result for msg in response])
+        self.assertEqual(2, self.inFlight.peak)
+
+    def testSingleMessages(self):
+        dispatcher = self.MakeDispatcher()
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Success(1, 3), asyncio.run(
+                dispatcher.DispatchJsonAsync(
+                    JsonRpcMessage.Request(1, 'add', [1, 2]).AsWireJson())))
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Error(2, JsonRpcError.InvalidParams(
+                'Expected 2 params, got 1')), asyncio.run(
+                dispatcher.DispatchJsonAsync(
+                    JsonRpcMessage.Request(2, 'add', [1]).AsWireJson())))
+        self.assertIsNone(asyncio.run(dispatcher.DispatchJsonAsync(
+            JsonRpcMessage.Notification('notify', [2]).AsWireJson())))
+        self.assertEqual([2], self.inFlight.notified)
+        self.assertIsNone(asyncio.run(dispatcher.DispatchJsonAsync(
+            BatchJson([JsonRpcMessage.Notification('notify', [3])]))))
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Error(None, JsonRpcError.ParseError('[')),
+            asyncio.run(dispatcher.DispatchJsonAsync('[')))
+
+
+    def testExecutorPolicies(self):
+        dispatcher = JsonRpcAsyncDispatcher()
+        timeoutError = JsonRpcError.Error(-32001, 'Too slow')
+        with futures.ThreadPoolExecutor(8) as threads, \
+                futures.ProcessPoolExecutor(2) as processes:
+            dispatcher.Register(BlockingSleep, policy=JsonRpcExecutorPolicy(
+                threads, timeout=0.5, timeoutError=timeoutError))
+            dispatcher.Register(Square, policy=JsonRpcExecutorPolicy(
+                processes))
+            messages = [JsonRpcMessage.Request(i, 'BlockingSleep', [0.1])
+                        for i in range(8)] + \
+                [JsonRpcMessage.Request(8, 'BlockingSleep', [1]),
+                 JsonRpcMessage.Request(9, 'Square', [7])]
+            started = time.time()
+            response = asyncio.run(
+                dispatcher.DispatchJsonAsync(BatchJson(messages)))
+            # blocking handlers do not stall the event loop
+            self.assertLess(time.time() - started, 0.9)
+        expected = JsonRpcBatch(
+            [JsonRpcMessage.Success(i, 0.1) for i in range(8)] +
+            [JsonRpcMessage.Error(8, timeoutError),
+             JsonRpcMessage.Success(9, 49)])
+        self.assertEqual(expected.AsWireJson(), response.AsWireJson())
+
+    def testImportedOnUse(self):
+        # asyncio is not imported with the package
+        root = os.path.dirname(os.path.dirname(pyjsonrpclite.__file__))
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, pyjsonrpclite; '
+             'print("asyncio" in sys.modules)'], cwd=root)
+        self.assertEqual(b'False', output.strip())
+        self.assertIs(JsonRpcAsyncDispatcher,
+                      pyjsonrpclite.JsonRpcAsyncDispatcher)
+        self.assertIn('JsonRpcAsyncConnection', dir(pyjsonrpclite))
+        with self.assertRaises(AttributeError):
+            pyjsonrpclite.JsonRpcMissing  # pylint: disable=W0104
+
+
+if __name__ == '__main__':
+    unittest.main()
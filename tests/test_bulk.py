@@ -0,0 +1,91 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import unittest
+import testutils
+from concurrent import futures
+
+from pyjsonrpclite import JsonRpcParsed, JsonRpcParsedType, parseMany,\
+    countMany
+
+sys.path.insert(0, os.path.abspath('..'))
+
+LINES = [
+    '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": 1}',
+    '{"jsonrpc": "2.0", "method": "notify", "params": {"a": "\\u00e9"}}',
+    '',
+    '{"jsonrpc": "2.0", "result": 3, "id": 1}',
+    '{"jsonrpc": "2.0", "method": "sum"',
+    '[{"jsonrpc": "2.0", "method": "sum", "id": 2}, {"id": 3}]',
+    '   ',
+    '{"jsonrpc": "2.0", "error": {"code": -32601, "message": "m"}, "id": 4}',
+]
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(30):
+                f.write('\r\n'.join(LINES).encode('utf-8') + b'\n')
+        self.expected = [JsonRpcParsed.TryParse(line)
+                         for line in LINES if line.strip()] * 30
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testParseFileInOrder(self):
+        for chunkSize in [1, 100, 1 << 20]:
+            testutils.assertEqualObjects(
+                self.expected,
+                list(parseMany(self.path, workers=1, chunkSize=chunkSize)))
+
+    def testParseFileInProcessPool(self):
+        testutils.assertEqualObjects(
+            self.expected, list(parseMany(self.path, workers=2,
+                                          chunkSize=500)))
+
+    def testParseIterable(self):
+        with futures.ThreadPoolExecutor(2) as executor:
+            results = parseMany(LINES * 30, chunkSize=200, executor=executor)
+            testutils.assertEqualObjects(self.expected, list(results))
+        testutils.assertEqualObjects(
+            self.expected[:6],
+            list(parseMany([line.encode('utf-8') for line in LINES],
+                           workers=1)))
+
+    def testCount(self):
+        expected = {
+            (JsonRpcParsedType.REQUEST, 'sum'): 60,
+            (JsonRpcParsedType.NOTIFICATION, 'notify'): 30,
+            (JsonRpcParsedType.SUCCESS, None): 30,
+            (JsonRpcParsedType.ERROR, None): 30,
+            (JsonRpcParsedType.INVALID, None): 60,
+        }
+        self.assertEqual(expected, countMany(self.path, workers=1,
+                                             chunkSize=300))
+        self.assertEqual(expected, countMany(self.path, workers=2,
+                                             chunkSize=300))
+        self.assertEqual(expected, countMany(LINES * 30, workers=1))
+        # long lines are scanned, malformed params are still invalid
+        malformed = '{"jsonrpc": "2.0", "method": "sum", "params": ' \
+            '["%s",,1 2 nope], "id": 1}' % ('x' * 2048)
+        self.assertEqual({(JsonRpcParsedType.INVALID, None): 2},
+                         countMany([malformed] * 2, workers=1))
+        # method names which are not strings are counted as invalid
+        methodList = '{"jsonrpc": "2.0", "method": ["a"], "id": 1}'
+        self.assertEqual({(JsonRpcParsedType.INVALID, None): 2},
+                         countMany([methodList, '[%s]' % methodList],
+                                   workers=1))
+
+    def testEmptyFile(self):
+        with open(self.path, 'wb'):
+            pass
+        self.assertEqual([], list(parseMany(self.path, workers=2)))
+        self.assertEqual({}, countMany(self.path, workers=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
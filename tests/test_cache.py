@@ -0,0 +1,145 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import unittest
+import testutils
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcRawJson, JsonRpcDispatcher, JsonRpcAsyncDispatcher,\
+    JsonRpcMethodError, JsonRpcResultCache
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+class Counted(object):
+    '''Handler counting its calls'''
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, a, b=0):
+        self.calls += 1
+        if a < 0:
+            raise JsonRpcMethodError(JsonRpcError.InvalidParams('negative'))
+        return {'sum': a + b, 'items': [a, b]}
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = testutils.Clock()
+        self.cache = JsonRpcResultCache(maxSize=3, ttl=10, clock=self.clock)
+        self.handler = Counted()
+        self.dispatcher = JsonRpcDispatcher()
+        self.dispatcher.Register(self.handler, 'sum', cache=self.cache)
+
+    def Dispatch(self, reqId, params):
+        return self.dispatcher.DispatchJson(
+            JsonRpcMessage.Request(reqId, 'sum', params).AsWireJson())
+
+    def testHitSplicesId(self):
+        first = self.Dispatch(1, [1, 2])
+        second = self.Dispatch('x', [1, 2])
+        self.assertEqual(1, self.handler.calls)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual('{"jsonrpc":"2.0","result":{"sum":3,"items":[1,2]},'
+                         '"id":1}', first.AsWireJson())
+        self.assertEqual('{"jsonrpc":"2.0","result":{"sum":3,"items":[1,2]},'
+                         '"id":"x"}', second.AsWireJson())
+        self.assertEqual({'sum': 3, 'items': [1, 2]}, second.result.Decode())
+        self.assertIsInstance(self.dispatcher.Call('sum', [1, 2]),
+                              JsonRpcRawJson)
+
+    def testCanonicalParams(self):
+        self.Dispatch(1, [1, 2])
+        self.Dispatch(2, {'b': 2, 'a': 1})
+        self.Dispatch(3, {'a': 1, 'b': 2})
+        self.assertEqual(1, self.handler.calls)
+        self.Dispatch(4, [1])
+        self.Dispatch(5, {'a': 1})
+        self.Dispatch(6, [1, 0])
+        self.assertEqual(3, self.handler.calls)
+        self.assertEqual(('sum', '{"a":1,"b":2}'),
+                         self.cache.Key('sum', {'b': 2, 'a': 1}))
+        self.assertEqual(('sum', '[1,2]'), self.cache.Key('sum', [1, 2]))
+        self.assertEqual(('sum', None), self.cache.Key('sum', None))
+
+    def testErrorsAreNotCached(self):
+        self.Dispatch(1, [-1])
+        response = self.Dispatch(2, [-1])
+        self.assertEqual(2, self.handler.calls)
+        self.assertEqual((-32602, 'negative'),
+                         (response.error.code, response.error.data))
+        self.assertEqual(0, len(self.cache))
+
+    def testLeastRecentlyUsedEvicted(self):
+        for a in range(3):
+            self.Dispatch(a, [a])
+        self.Dispatch(9, [0])
+        self.Dispatch(10, [3])
+        self.assertEqual(3, len(self.cache))
+        self.Dispatch(11, [0])
+        self.Dispatch(12, [1])
+        self.assertEqual(5, self.handler.calls)
+
+    def testTimeToLive(self):
+        self.Dispatch(1, [1])
+        self.clock.now += 9.5
+        self.Dispatch(2, [1])
+        self.assertEqual(1, self.handler.calls)
+        self.clock.now += 0.5
+        self.Dispatch(3, [1])
+        self.assertEqual(2, self.handler.calls)
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+
+    def testInvalidate(self):
+        self.dispatcher.Register(lambda: 'pong', 'ping', cache=self.cache)
+        self.Dispatch(1, [1])
+        self.Dispatch(2, [2])
+        self.dispatcher.DispatchJson('{"jsonrpc":"2.0","method":"ping",'
+                                     '"id":3}')
+        self.assertEqual(2, self.cache.Invalidate('sum'))
+        self.assertEqual(0, self.cache.Invalidate('sum'))
+        self.assertEqual(1, len(self.cache))
+        self.Dispatch(4, [1])
+        self.assertEqual(3, self.handler.calls)
+        self.assertEqual(2, self.cache.Invalidate())
+        self.assertEqual(0, len(self.cache))
+
+    def testNotEncodableResultPassedThrough(self):
+        cache = JsonRpcResultCache()
+        self.dispatcher.Register(lambda: float('nan'), 'nan', cache=cache)
+        self.assertNotEqual(self.dispatcher.Call('nan'),
+                            self.dispatcher.Call('nan'))
+        self.assertEqual(0, len(cache))
+
+    def testAsyncDispatcher(self):
+        dispatcher = JsonRpcAsyncDispatcher(maxConcurrency=1)
+        calls = []
+
+        async def Slow(value):
+            calls.append(value)
+            await asyncio.sleep(0)
+            return [value]
+        dispatcher.Register(Slow, cache=self.cache)
+
+        async def Run():
+            first = await dispatcher.DispatchJsonAsync(
+                '{"jsonrpc":"2.0","method":"Slow","params":[5],"id":1}')
+            second = await dispatcher.DispatchJsonAsync(
+                '{"jsonrpc":"2.0","method":"Slow","params":{"value":5},'
+                '"id":2}')
+            return first, second
+        first, second = asyncio.run(Run())
+        self.assertEqual([5], calls)
+        self.assertEqual('{"jsonrpc":"2.0","result":[5],"id":2}',
+                         second.AsWireJson())
+        self.assertEqual(JsonRpcParsed.Parse(first.AsWireJson()).payload.id,
+                         1)
+
+    def testInvalidSize(self):
+        self.assertRaises(ValueError, JsonRpcResultCache, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import unittest
+import testutils
+from concurrent import futures
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcBatch, JsonRpcRawJson, JsonRpcDispatcher, JsonRpcMethodError,\
+    JsonRpcExecutorPolicy
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def Subtract(minuend, subtrahend=0):
+    return minuend - subtrahend
+
+
+def Join(*items, **options):
+    return options.get('sep', ',').join(items)
+
+
+def Scale(value, *, factor):
+    return value * factor
+
+
+def Fail():
+    raise ValueError('broken')
+
+
+def Deny(reason):
+    raise JsonRpcMethodError(JsonRpcError.Error(-32001, reason))
+
+
+def CallsBadly():
+    return Subtract()
+
+
+def Sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def SumSquares(count):
+    return {'sum': sum(i * i for i in range(count)), 'pid': os.getpid()}
+
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+
+    def Add(self, step=1):
+        self.count += step
+        return self.count
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = JsonRpcDispatcher()
+        for handler in [Subtract, Join, Scale, Fail, Deny, CallsBadly]:
+            self.dispatcher.Register(handler)
+        self.counter = Counter()
+        self.dispatcher.Register(self.counter.Add, 'add')
+        self.dispatcher.Register(len, 'len')
+
+    def Dispatch(self, msg):
+        return self.dispatcher.DispatchJson(msg.AsWireJson())
+
+    def assertSuccess(self, result, msg):
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Success(msg.id, result), self.Dispatch(msg))
+
+    def assertError(self, rpcError, msg):
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Error(msg.id, rpcError), self.Dispatch(msg))
+
+    def testBindParams(self):
+        self.assertSuccess(2, JsonRpcMessage.Request(1, 'Subtract', [5, 3]))
+        self.assertSuccess(5, JsonRpcMessage.Request(2, 'Subtract', [5]))
+        self.assertSuccess(-2, JsonRpcMessage.Request(
+            3, 'Subtract', {'subtrahend': 5, 'minuend': 3}))
+        self.assertSuccess('', JsonRpcMessage.Request(
+            4, 'Join', {'sep': ';'}))
+        self.assertSuccess('a,b', JsonRpcMessage.Request(5, 'Join',
+                                                         ['a', 'b']))
+        self.assertSuccess(6, JsonRpcMessage.Request(
+            6, 'Scale', {'value': 2, 'factor': 3}))
+        self.assertSuccess(1, JsonRpcMessage.Request(7, 'add'))
+        self.assertSuccess(3, JsonRpcMessage.Request(8, 'add', [2]))
+        self.assertSuccess(2, JsonRpcMessage.Request(9, 'len', [[1, 2]]))
+
+    def testInvalidParams(self):
+        cases = [
+            ('Subtract', [], 'Expected 1 to 2 params, got 0'),
+            ('Subtract', [1, 2, 3], 'Expected 1 to 2 params, got 3'),
+            ('Subtract', None, 'Params expected'),
+            ('Subtract', {'subtrahend': 1}, 'Missing params: minuend'),
+            ('Subtract', {'minuend': 1, 'x': 2, 'a': 3},
+             'Unexpected params: a, x'),
+            ('Scale', [2, 3], 'Params should be an object'),
+            ('Scale', {'value': 2}, 'Missing params: factor'),
+        ]
+        for reqId, (method, params, data) in enumerate(cases):
+            self.assertError(JsonRpcError.InvalidParams(data),
+                             JsonRpcMessage.Request(reqId, method, params))
+
+    def testErrors(self):
+        self.assertError(JsonRpcError.MethodNotFound(),
+                         JsonRpcMessage.Request(1, 'missing', [1]))
+        self.assertError(JsonRpcError.InternalError('broken'),
+                         JsonRpcMessage.Request(2, 'Fail'))
+        self.assertError(JsonRpcError.Error(-32001, 'no'),
+                         JsonRpcMessage.Request(3, 'Deny', ['no']))
+        # TypeError inside a handler is not an invalid params error
+        response = self.Dispatch(JsonRpcMessage.Request(4, 'CallsBadly'))
+        self.assertEqual(JsonRpcError.InternalError().code,
+                         response.error.code)
+        testutils.assertEqualObjects(
+            JsonRpcMessage.Error(None, JsonRpcError.ParseError('{')),
+            self.dispatcher.DispatchJson('{'))
+
+    def testNotificationsAndBatch(self):
+        self.assertIsNone(self.Dispatch(JsonRpcMessage.Notification('add')))
+        self.assertIsNone(self.Dispatch(JsonRpcMessage.Notification('Fail')))
+        self.assertEqual(1, self.counter.count)
+        batch = [
+            JsonRpcMessage.Request(1, 'add', [2]),
+            JsonRpcMessage.Notification('add'),
+            JsonRpcMessage.Request(2, 'missing'),
+        ]
+        parsed = JsonRpcParsed.Parse(
+            '[' + ','.join(msg.AsWireJson() for msg in batch) + ',1]')
+        expected = JsonRpcBatch([
+            JsonRpcMessage.Success(1, 3),
+            JsonRpcMessage.Error(2, JsonRpcError.MethodNotFound()),
+            JsonRpcMessage.Error(None, JsonRpcError.InvalidRequest(
+                'Message should be an object')),
+        ])
+        self.assertEqual(expected.AsWireJson(),
+                         self.dispatcher.Dispatch(parsed).AsWireJson())
+        self.assertEqual(4, self.counter.count)
+        self.assertIsNone(self.dispatcher.DispatchJson(
+            '[' + JsonRpcMessage.Notification('add').AsWireJson() + ']'))
+        self.assertEqual(5, self.counter.count)
+
+    def testRegister(self):
+        dispatcher = JsonRpcDispatcher()
+
+        @dispatcher.Register
+        def echo(value):
+            return value
+        self.assertIn('echo', dispatcher)
+        self.assertEqual(3, dispatcher.Call('echo', [3]))
+        dispatcher.Unregister('echo')
+        self.assertNotIn('echo', dispatcher)
+        with self.assertRaises(JsonRpcMethodError):
+            dispatcher.Call('echo', [3])
+
+
+    def testExecutorPolicies(self):
+        timeoutError = JsonRpcError.Error(-32001, 'Too slow')
+        failureError = JsonRpcError.Error(-32002, 'Failed')
+        dispatcher = JsonRpcDispatcher()
+        with futures.ThreadPoolExecutor(2) as threads, \
+                futures.ProcessPoolExecutor(2) as processes:
+            dispatcher.Register(Sleep, policy=JsonRpcExecutorPolicy(
+                threads, timeout=0.05, timeoutError=timeoutError))
+            dispatcher.Register(SumSquares, policy=JsonRpcExecutorPolicy(
+                processes))
+            dispatcher.Register(Fail, policy=JsonRpcExecutorPolicy(
+                processes, failureError=failureError))
+            dispatcher.Register(Deny, policy=JsonRpcExecutorPolicy(
+                failureError=failureError))
+            self.assertEqual(0.01, dispatcher.Call('Sleep', [0.01]))
+            response = dispatcher.DispatchJson(
+                JsonRpcMessage.Request(1, 'Sleep', [0.5]).AsWireJson())
+            testutils.assertEqualObjects(
+                JsonRpcMessage.Error(1, timeoutError), response)
+            result = dispatcher.Call('SumSquares', [4])
+            self.assertIsInstance(result, JsonRpcRawJson)
+            self.assertEqual(14, result.Decode()['sum'])
+            self.assertNotEqual(os.getpid(), result.Decode()['pid'])
+            response = dispatcher.DispatchJson(
+                JsonRpcMessage.Request(2, 'SumSquares', [3]).AsWireJson())
+            self.assertTrue(response.AsWireJson().startswith(
+                '{"jsonrpc":"2.0","result":{"sum":5,"pid":'))
+            responses = [
+                dispatcher.DispatchJson(msg.AsWireJson()) for msg in [
+                    JsonRpcMessage.Request(3, 'SumSquares', [1, 2]),
+                    JsonRpcMessage.Request(4, 'Fail'),
+                    JsonRpcMessage.Request(5, 'Deny', ['no'])]]
+            testutils.assertEqualObjects([
+                JsonRpcMessage.Error(3, JsonRpcError.InvalidParams(
+                    'Expected 1 params, got 2')),
+                JsonRpcMessage.Error(4, failureError),
+                JsonRpcMessage.Error(5, JsonRpcError.Error(-32001, 'no'))],
+                responses)
+
+
+if __name__ == '__main__':
+    unittest.main()
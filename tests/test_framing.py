@@ -0,0 +1,225 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import unittest
+import testutils
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcParsedType, JsonRpcBatch, JsonRpcStreamDecoder,\
+    JsonRpcContentLengthCodec
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def FeedInChunks(decoder, data, chunkSize):
+    results = []
+    for i in range(0, len(data), chunkSize):
+        results.extend(decoder.Feed(memoryview(data)[i:i + chunkSize]))
+    results.extend(decoder.Close())
+    return results
+
+
+def Invalid(rpcError):
+    return JsonRpcParsed(JsonRpcParsedType.INVALID,
+                         JsonRpcMessage.Error(None, rpcError))
+
+
+class TestJsonRpcStreamDecoder(unittest.TestCase):
+    def setUp(self):
+        self.request = JsonRpcMessage.Request(1, 'sum', ['}', '"{', '\\'])
+        self.notification = JsonRpcMessage.Notification('alarm')
+        self.success = JsonRpcMessage.Success(2, {'a': [1, {}]})
+        self.expected = [
+            JsonRpcParsed(JsonRpcParsedType.REQUEST, self.request),
+            JsonRpcParsed(JsonRpcParsedType.NOTIFICATION, self.notification),
+            [JsonRpcParsed(JsonRpcParsedType.SUCCESS, self.success)],
+        ]
+
+    # pylint: disable=R0201
+    def testBackToBackAnyChunks(self):
+        '''Back to back messages are decoded whatever chunks they come in'''
+        data = self.request.AsWireBytes() + self.notification.AsWireBytes() +\
+            b' \r\n\t' + JsonRpcBatch([self.success]).AsWireBytes()
+        for chunkSize in [1, 2, 3, 7, len(data)]:
+            decoder = JsonRpcStreamDecoder()
+            testutils.assertEqualObjects(
+                self.expected, FeedInChunks(decoder, data, chunkSize))
+
+    # pylint: disable=R0201
+    def testNewlineDelimitedAnyChunks(self):
+        data = self.request.AsWireBytes() + b'\n\n  \n' +\
+            self.notification.AsWireBytes() + b'\r\n' +\
+            JsonRpcBatch([self.success]).AsWireBytes()
+        for chunkSize in [1, 2, 5, len(data)]:
+            decoder = JsonRpcStreamDecoder(newlineDelimited=True)
+            testutils.assertEqualObjects(
+                self.expected, FeedInChunks(decoder, data, chunkSize))
+
+    # pylint: disable=R0201
+    def testResultsAsSoonAsComplete(self):
+        decoder = JsonRpcStreamDecoder()
+        data = self.request.AsWireBytes()
+        self.assertEqual([], decoder.Feed(data[:-1]))
+        testutils.assertEqualObjects(self.expected[:1],
+                                     decoder.Feed(data[-1:]))
+
+    # pylint: disable=R0201
+    def testInvalidMessagesReported(self):
+        data = b'{INVALID} 5 ] ' + self.request.AsWireBytes() + b' {"a": 1'
+        expected = [
+            Invalid(JsonRpcError.ParseError('{INVALID}')),
+            Invalid(JsonRpcError.InvalidRequest(
+                'Message should be an object')),
+            Invalid(JsonRpcError.ParseError(']')),
+            self.expected[0],
+            Invalid(JsonRpcError.ParseError('Incomplete message')),
+        ]
+        for chunkSize in [1, len(data)]:
+            decoder = JsonRpcStreamDecoder()
+            testutils.assertEqualObjects(
+                expected, FeedInChunks(decoder, data, chunkSize))
+
+    # pylint: disable=R0201
+    def testMaxMessageSize(self):
+        '''Too large message is dropped while it arrives, decoding goes on'''
+        large = JsonRpcMessage.Success(3, 'x' * 1000).AsWireBytes()
+        tooLarge = Invalid(JsonRpcError.InvalidRequest(
+            'Message exceeds 100 bytes'))
+        for newlineDelimited in [False, True]:
+            data = large + b'\n' + self.request.AsWireBytes() + b'\n'
+            for chunkSize in [1, 10, len(data)]:
+                decoder = JsonRpcStreamDecoder(newlineDelimited,
+                                               maxMessageSize=100)
+                results = []
+                for i in range(0, len(data), chunkSize):
+                    results.extend(decoder.Feed(data[i:i + chunkSize]))
+                    self.assertTrue(len(decoder._buf) <= 100 + chunkSize)
+                testutils.assertEqualObjects(
+                    [tooLarge, self.expected[0]], results)
+
+    def testEncode(self):
+        data = JsonRpcStreamDecoder(True).Encode(self.request) + \
+            JsonRpcStreamDecoder(True).Encode(self.notification)
+        self.assertEqual(2, data.count(b'\n'))
+        testutils.assertEqualObjects(
+            self.expected[:2],
+            JsonRpcStreamDecoder(newlineDelimited=True).Feed(data))
+        self.assertEqual(self.request.AsWireBytes(),
+                         JsonRpcStreamDecoder().Encode(self.request))
+        self.assertEqual(b'', JsonRpcStreamDecoder(True).Encode(
+            JsonRpcBatch()))
+
+
+def PipeTransfer(frames, codec):
+    '''Writes frames to a local pipe in a thread, reads them back through
+    codec. Returns results.'''
+    readFd, writeFd = os.pipe()
+
+    def Writer():
+        with os.fdopen(writeFd, 'wb', buffering=0) as pipe:
+            for frame in frames:
+                view = memoryview(frame)
+                while view:
+                    view = view[pipe.write(view):]
+
+    writer = threading.Thread(target=Writer)
+    writer.start()
+    results = []
+    with os.fdopen(readFd, 'rb', buffering=0) as pipe:
+        while True:
+            chunk = pipe.read(65536)
+            if not chunk:
+                break
+            results.extend(codec.Feed(chunk))
+    writer.join()
+    return results
+
+
+class TestJsonRpcContentLengthCodec(unittest.TestCase):
+    # pylint: disable=R0201
+    def testEncode(self):
+        codec = JsonRpcContentLengthCodec()
+        msg = JsonRpcMessage.Notification('alarm')
+        self.assertEqual(b'Content-Length: 34\r\n\r\n' +
+                         b'{"jsonrpc":"2.0","method":"alarm"}',
+                         codec.Encode(msg))
+        self.assertEqual(b'', codec.Encode(JsonRpcBatch()))
+        written = []
+        codec.Write(written.append, msg)
+        codec.Write(written.append, JsonRpcBatch())
+        self.assertEqual([codec.Encode(msg)], written)
+
+    # pylint: disable=R0201
+    def testFeedAnyChunks(self):
+        codec = JsonRpcContentLengthCodec()
+        request = JsonRpcMessage.Request(1, 'sum', [1, 2])
+        success = JsonRpcMessage.Success(2, u'\u00e9')
+        data = codec.Encode(request) +\
+            b'content-type: application/json\r\ncontent-length: 9\r\n' +\
+            b'\r\n{INVALID}' + codec.Encode(JsonRpcBatch([success])) +\
+            b'X-Header: 1\r\n\r\n' + codec.Encode(success, escape=False)
+        expected = [
+            JsonRpcParsed(JsonRpcParsedType.REQUEST, request),
+            Invalid(JsonRpcError.ParseError('{INVALID}')),
+            [JsonRpcParsed(JsonRpcParsedType.SUCCESS, success)],
+            Invalid(JsonRpcError.InvalidRequest(
+                'Invalid Content-Length header')),
+            JsonRpcParsed(JsonRpcParsedType.SUCCESS, success),
+        ]
+        for chunkSize in [1, 2, 3, 17, len(data)]:
+            codec = JsonRpcContentLengthCodec()
+            results = []
+            for i in range(0, len(data), chunkSize):
+                results.extend(codec.Feed(data[i:i + chunkSize]))
+            testutils.assertEqualObjects(expected, results)
+            self.assertEqual(0, len(codec._buf))
+
+    # pylint: disable=R0201
+    def testMaxMessageSize(self):
+        codec = JsonRpcContentLengthCodec(maxMessageSize=100)
+        request = JsonRpcMessage.Request(1, 'sum', [1, 2])
+        data = codec.Encode(JsonRpcMessage.Success(3, 'x' * 1000)) +\
+            codec.Encode(request)
+        expected = [
+            Invalid(JsonRpcError.InvalidRequest('Message exceeds 100 bytes')),
+            JsonRpcParsed(JsonRpcParsedType.REQUEST, request),
+        ]
+        for chunkSize in [1, 50, len(data)]:
+            codec = JsonRpcContentLengthCodec(maxMessageSize=100)
+            results = []
+            for i in range(0, len(data), chunkSize):
+                results.extend(codec.Feed(data[i:i + chunkSize]))
+                self.assertTrue(len(codec._buf) <= 200 + chunkSize)
+            testutils.assertEqualObjects(expected, results)
+
+    # pylint: disable=R0201
+    def testPipeSmallMessages(self):
+        codec = JsonRpcContentLengthCodec()
+        messages = [JsonRpcMessage.Request(i, 'sum', [i, i + 1])
+                    for i in range(20000)]
+        frames = [codec.Encode(msg) for msg in messages]
+        results = PipeTransfer(frames, codec)
+        self.assertEqual(len(messages), len(results))
+        for msg, parsed in zip(messages[::1000], results[::1000]):
+            self.assertEqual(msg.id, parsed.payload.id)
+
+    # pylint: disable=R0201
+    def testPipeLargeMessages(self):
+        codec = JsonRpcContentLengthCodec()
+        result = {'rows': [['item %d' % i, i, i * 0.5]
+                           for i in range(100000)]}
+        messages = [JsonRpcMessage.Success(i, result) for i in range(4)]
+        frames = [codec.Encode(msg) for msg in messages]
+        results = PipeTransfer(frames, codec)
+        self.assertEqual(len(messages), len(results))
+        for msg, parsed in zip(messages, results):
+            self.assertEqual(JsonRpcParsedType.SUCCESS, parsed.parsedType)
+            self.assertEqual(msg.id, parsed.payload.id)
+            self.assertEqual(result, parsed.payload.result)
+        self.assertTrue(sum(len(frame) for frame in frames) > 4 * 2 ** 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
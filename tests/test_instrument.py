@@ -0,0 +1,188 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import json
+import os
+import sys
+import unittest
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcParsedType, JsonRpcParseError, JsonRpcBatch,\
+    JsonRpcInstrumentHook, JsonRpcHistogram, JsonRpcHistogramHook,\
+    getInstrumentHook, setInstrumentHook
+
+sys.path.insert(0, os.path.abspath('..'))
+
+REQUEST = '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": 1}'
+
+
+class RecordingHook(JsonRpcInstrumentHook):
+    def __init__(self):
+        self.stages = []
+        self.sizes = []
+        self.messages = []
+
+    def Stage(self, stage, seconds):
+        self.stages.append(stage)
+        assert seconds >= 0
+
+    def Bytes(self, event, size):
+        self.sizes.append((event, size))
+
+    def Message(self, event, parsedType, errorCode):
+        self.messages.append((event, parsedType, errorCode))
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.hook = RecordingHook()
+        setInstrumentHook(self.hook)
+
+    def tearDown(self):
+        setInstrumentHook(None)
+
+    def testParseStages(self):
+        self.assertIs(getInstrumentHook(), self.hook)
+        parsed = JsonRpcParsed.Parse(REQUEST)
+        self.assertEqual(parsed.parsedType, JsonRpcParsedType.REQUEST)
+        self.assertEqual(parsed.payload.params, [1, 2])
+        self.assertEqual(self.hook.stages,
+                         ['parse.decode', 'parse.validate', 'parse.build'])
+        self.assertEqual(self.hook.sizes, [('parse', len(REQUEST))])
+        self.assertEqual(self.hook.messages,
+                         [('parse', JsonRpcParsedType.REQUEST, None)])
+
+    def testParseRaisesSameErrors(self):
+        for jsonstr in ['{"jsonrpc": "2.0", "method"', '[]',
+                        '{"jsonrpc": "1.0", "method": "a", "id": 1}', '5']:
+            setInstrumentHook(None)
+            with self.assertRaises(JsonRpcParseError) as plain:
+                JsonRpcParsed.Parse(jsonstr)
+            setInstrumentHook(self.hook)
+            with self.assertRaises(JsonRpcParseError) as hooked:
+                JsonRpcParsed.Parse(jsonstr)
+            self.assertEqual(
+                (hooked.exception.rpcError.code,
+                 hooked.exception.rpcError.data),
+                (plain.exception.rpcError.code, plain.exception.rpcError.data))
+        self.assertEqual([code for _, _, code in self.hook.messages],
+                         [-32700, -32600, -32600, -32600])
+
+    def testTryParseReportsInvalid(self):
+        jsonstr = '[%s, {"jsonrpc": "2.0", "id": 2}, 7]' % REQUEST
+        setInstrumentHook(None)
+        plain = JsonRpcParsed.TryParse(jsonstr)
+        setInstrumentHook(self.hook)
+        hooked = JsonRpcParsed.TryParse(jsonstr)
+        setInstrumentHook(None)
+        self.assertEqual([item.payload.AsJson() for item in hooked],
+                         [item.payload.AsJson() for item in plain])
+        self.assertEqual(self.hook.messages, [
+            ('parse', JsonRpcParsedType.REQUEST, None),
+            ('parse', JsonRpcParsedType.INVALID, -32600),
+            ('parse', JsonRpcParsedType.INVALID, -32600)])
+        self.assertEqual(self.hook.stages.count('parse.build'), 1)
+        self.assertEqual(self.hook.stages.count('parse.validate'), 3)
+
+    def testEncodeEvents(self):
+        msg = JsonRpcMessage.Error(3, JsonRpcError.MethodNotFound())
+        text = msg.AsWireJson()
+        self.assertEqual(self.hook.stages, ['encode'])
+        self.assertEqual(self.hook.sizes, [('encode', len(text))])
+        self.assertEqual(self.hook.messages,
+                         [('encode', JsonRpcParsedType.ERROR, -32601)])
+        self.hook.messages = []
+        batch = JsonRpcBatch([JsonRpcMessage.Success(1, 2),
+                              JsonRpcMessage.Notification('a'),
+                              JsonRpcMessage.Request(2, 'b')])
+        batch.AsJson()
+        self.assertEqual(self.hook.messages, [
+            ('encode', JsonRpcParsedType.SUCCESS, None),
+            ('encode', JsonRpcParsedType.NOTIFICATION, None),
+            ('encode', JsonRpcParsedType.REQUEST, None)])
+
+    def testTemplatedWireBytes(self):
+        '''Responses written from templates are reported like the others'''
+        msgs = [JsonRpcMessage.Error(1, JsonRpcError.MethodNotFound()),
+                JsonRpcMessage.Success(2, None),
+                JsonRpcMessage.Success(3, {'a': 1})]
+        data = [msg.AsWireBytes() for msg in msgs]
+        self.assertEqual(self.hook.stages, ['encode'] * 3)
+        self.assertEqual(self.hook.sizes,
+                         [('encode', len(item)) for item in data])
+        self.assertEqual(self.hook.messages, [
+            ('encode', JsonRpcParsedType.ERROR, -32601),
+            ('encode', JsonRpcParsedType.SUCCESS, None),
+            ('encode', JsonRpcParsedType.SUCCESS, None)])
+
+    def testSameTextWithHook(self):
+        msgs = [JsonRpcMessage.Success(1, {'a': [1, 'b']}),
+                JsonRpcMessage.Error(2, JsonRpcError.InvalidParams()),
+                JsonRpcMessage.Error(3, JsonRpcError.InternalError('x')),
+                JsonRpcBatch([JsonRpcMessage.Request(4, 'c', [1])])]
+        setInstrumentHook(None)
+        plain = [(msg.AsJson(), msg.AsWireJson(False)) for msg in msgs]
+        setInstrumentHook(self.hook)
+        hooked = [(msg.AsJson(), msg.AsWireJson(False)) for msg in msgs]
+        self.assertEqual(hooked, plain)
+        self.assertEqual(self.hook.stages, ['encode'] * 8)
+
+    def testNoEventsWithoutHook(self):
+        setInstrumentHook(None)
+        self.assertIsNone(getInstrumentHook())
+        JsonRpcParsed.Parse(REQUEST)
+        JsonRpcParsed.TryParse('{')
+        JsonRpcMessage.Success(1, 2).AsJson()
+        self.assertEqual(self.hook.stages, [])
+        self.assertEqual(self.hook.messages, [])
+
+    def testHistogramHook(self):
+        hook = JsonRpcHistogramHook()
+        setInstrumentHook(hook)
+        JsonRpcParsed.Parse(REQUEST)
+        JsonRpcParsed.TryParse('{"jsonrpc": "2.0", "id": 2}')
+        JsonRpcMessage.Error(1, JsonRpcError.InvalidParams()).AsWireJson()
+        dump = hook.Dump()
+        self.assertEqual(dump, json.loads(json.dumps(dump)))
+        self.assertEqual(dump['stages']['parse.decode']['count'], 2)
+        self.assertEqual(dump['stages']['parse.build']['count'], 1)
+        self.assertEqual(dump['sizes']['parse']['count'], 2)
+        self.assertEqual(dump['messages']['parse'],
+                         {'REQUEST': 1, 'INVALID': 1})
+        self.assertEqual(dump['errors'],
+                         {'parse': {'-32600': 1}, 'encode': {'-32602': 1}})
+        hook.Reset()
+        self.assertEqual(hook.Dump(), {'stages': {}, 'sizes': {},
+                                       'messages': {}, 'errors': {}})
+
+
+class TestHistogram(unittest.TestCase):
+    def testRecord(self):
+        histogram = JsonRpcHistogram([1, 10, 100])
+        for value in [0.5, 1, 5, 50, 50, 500]:
+            histogram.Record(value)
+        self.assertEqual(histogram.counts, [2, 1, 2, 1])
+        self.assertEqual(histogram.count, 6)
+        self.assertEqual(histogram.total, 606.5)
+        self.assertEqual((histogram.min, histogram.max), (0.5, 500))
+        self.assertEqual(histogram.Quantile(0.5), 10)
+        self.assertEqual(histogram.Quantile(0.8), 100)
+        self.assertEqual(histogram.Quantile(1), 500)
+        self.assertEqual(histogram.Dump()['buckets'],
+                         [[1, 2], [10, 1], [100, 2], [None, 1]])
+
+    def testMerge(self):
+        first = JsonRpcHistogram([1, 10])
+        second = JsonRpcHistogram([1, 10])
+        first.Record(2)
+        second.Record(0)
+        second.Record(20)
+        first.Merge(second)
+        self.assertEqual(first.counts, [1, 1, 1])
+        self.assertEqual((first.min, first.max, first.count), (0, 20, 3))
+        self.assertIsNone(JsonRpcHistogram([1]).Quantile(0.5))
+        with self.assertRaises(ValueError):
+            first.Merge(JsonRpcHistogram([1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
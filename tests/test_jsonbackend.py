@@ -0,0 +1,98 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+import testutils
+
+from pyjsonrpclite import JsonBackend, OrjsonBackend, JsonRpcParsed,\
+    JsonRpcParseError, JsonRpcError, JsonRpcMessage, getJsonBackend,\
+    setJsonBackend
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def AvailableBackends():
+    backends = [JsonBackend()]
+    try:
+        backends.append(OrjsonBackend())
+    except ImportError:
+        pass
+    return backends
+
+
+VALID_JSON = [
+    '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2.5], "id": 1}',
+    '18446744073709551616',
+    '-9223372036854775809',
+    '[1e400]',
+    '"\\ud800"',
+    '{"a": 1, "a": 2}',
+    b'{"a": "\\u00e9"}',
+    b'\xef\xbb\xbf[1]',
+    bytearray(b'[1, 2]'),
+    '[' * 500 + ']' * 500,
+    '[' * 70 + '"\\")(\\""' + ']' * 70,
+    '[%s]' % ','.join(['{"a": "]\\\\", "b": [[1]]}'] * 100),
+]
+
+INVALID_JSON = ['NaN', '[Infinity]', '[-Infinity]', '{INVALID_JSON}',
+                '[1,]', '"a\tb"', '', b'\xff', '[' * 100000,
+                '[' * 3000 + ']' * 3000, '{"a":' * 3000 + '1' + '}' * 3000]
+
+
+class TestJsonBackend(unittest.TestCase):
+    def setUp(self):
+        self.defaultBackend = getJsonBackend()
+
+    def tearDown(self):
+        setJsonBackend(self.defaultBackend)
+
+    # pylint: disable=R0201
+    def testLoadsSameResults(self):
+        '''Every backend decodes json exactly as the standard library'''
+        reference = JsonBackend()
+        for backend in AvailableBackends():
+            for text in VALID_JSON:
+                expected = reference.Loads(text)
+                actual = backend.Loads(text)
+                self.assertEqual(repr(expected), repr(actual))
+
+    # pylint: disable=R0201
+    def testLoadsInvalidRaisesValueError(self):
+        for backend in AvailableBackends():
+            for text in INVALID_JSON:
+                with self.assertRaises(ValueError):
+                    backend.Loads(text)
+            with self.assertRaises(TypeError):
+                backend.Loads(5)
+
+    # pylint: disable=R0201
+    def testEncoderRejectsNaN(self):
+        for backend in AvailableBackends():
+            encode = backend.Encoder(True, None)
+            self.assertEqual('{"a":[1,"\\u00e9"]}',
+                             encode({'a': [1, u'é']}))
+            with self.assertRaises(ValueError):
+                encode(float('nan'))
+
+    # pylint: disable=R0201
+    def testParseSameWithEveryBackend(self):
+        testReqJson = '{"jsonrpc": "2.0", "result": [NaN], "id": 521}'
+        for backend in AvailableBackends():
+            setJsonBackend(backend)
+            with self.assertRaises(JsonRpcParseError) as context:
+                JsonRpcParsed.Parse(testReqJson)
+            expectedErr = JsonRpcError.ParseError(testReqJson)
+            testutils.assertEqualObjects(expectedErr,
+                                         context.exception.rpcError)
+
+            msg = JsonRpcMessage.Success(521, [1, u'é'])
+            actual = JsonRpcParsed.Parse(msg.AsWireJson())
+            testutils.assertEqualObjects(msg, actual.payload)
+            with self.assertRaises(ValueError):
+                JsonRpcMessage.Success(1, float('inf')).AsWireJson()
+
+
+if __name__ == '__main__':
+    unittest.main()
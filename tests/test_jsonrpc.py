@@ -1,14 +1,18 @@
 ﻿#!/usr/bin/python
 # -*- coding: utf-8 -*-
+import collections
 import os
 import sys
+import pickle
 import unittest
 import testutils
 
 from pyjsonrpclite import JsonRpcMessage, JsonRpcRequest, JsonRpcNotification,\
-    JsonRpcSuccessResponse, JsonRpcErrorResponse,\
-    JsonRpcError, JsonRpcParsedType, JsonRpcParsed,\
-    JsonRpcParseError
+    JsonRpcSuccessResponse, JsonRpcErrorResponse, JsonRpcBatch,\
+    JsonRpcRawJson, JsonRpcError, JsonRpcErrorCodes, JsonRpcParsedType,\
+    JsonRpcParsed, JsonRpcPeeked, JsonRpcParseError, JsonRpcException,\
+    JsonRpcResponseTemplate, ABSENT
+from pyjsonrpclite.jsonrpc import PEEK_MIN_SIZE
 
 sys.path.insert(0, os.path.abspath('..'))
 sys.path.insert(0, os.path.abspath('..\..'))
@@ -30,7 +34,7 @@ class TestJsonRpc(unittest.TestCase):
     # pylint: disable=R0201
     def testJsonRpcMessageRequestNoParamsCorrect(self):
         expected = JsonRpcRequest(1, 'login')
-        actual = JsonRpcMessage.Request(1, 'log0in')
+        actual = JsonRpcMessage.Request(1, 'login')
         testutils.assertEqualObjects(expected, actual)
 
     # pylint: disable=R0201
@@ -408,6 +412,549 @@ class TestJsonRpc(unittest.TestCase):
             'Invalid JSON-RPC 2.0 Error object structure')
         testutils.assertEqualObjects(expectedErr, context.exception.rpcError)
 
+    # pylint: disable=R0201
+    def testParseBatch(self):
+        '''Checks if JSON-RPC 2.0 batch parsed correct, invalid elements
+        reported in place'''
+        testReqJson = '''[
+            {"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": "1"},
+            {"jsonrpc": "2.0", "method": "notify_hello", "params": [7]},
+            {"jsonrpc": "2.0", "id": 5},
+            1,
+            {"jsonrpc": "2.0", "result": 19, "id": "2"}
+        ]'''
+        expected = [
+            JsonRpcParsed(JsonRpcParsedType.REQUEST,
+                          JsonRpcRequest('1', 'sum', [1, 2])),
+            JsonRpcParsed(JsonRpcParsedType.NOTIFICATION,
+                          JsonRpcNotification('notify_hello', [7])),
+            JsonRpcParsed(JsonRpcParsedType.INVALID, JsonRpcErrorResponse(
+                5, JsonRpcError.InvalidRequest('No reqired fields'))),
+            JsonRpcParsed(JsonRpcParsedType.INVALID, JsonRpcErrorResponse(
+                None,
+                JsonRpcError.InvalidRequest('Message should be an object'))),
+            JsonRpcParsed(JsonRpcParsedType.SUCCESS,
+                          JsonRpcSuccessResponse('2', 19)),
+        ]
+        testutils.assertEqualObjects(expected,
+                                     JsonRpcParsed.ParseBatch(testReqJson))
+        testutils.assertEqualObjects(expected,
+                                     JsonRpcParsed.Parse(testReqJson))
+
+    # pylint: disable=R0201
+    def testParseBatchInvalidRaisesException(self):
+        '''ParseBatch raises JsonRpcParseError for an empty batch, a non array
+        and invalid json'''
+        with self.assertRaises(JsonRpcParseError) as context:
+            JsonRpcParsed.Parse('[]')
+        expectedErr = JsonRpcError.InvalidRequest('Empty batch')
+        testutils.assertEqualObjects(expectedErr, context.exception.rpcError)
+
+        with self.assertRaises(JsonRpcParseError) as context:
+            JsonRpcParsed.ParseBatch('{"jsonrpc": "2.0", "method": "a"}')
+        expectedErr = JsonRpcError.InvalidRequest('Batch should be an array')
+        testutils.assertEqualObjects(expectedErr, context.exception.rpcError)
+
+        with self.assertRaises(JsonRpcParseError) as context:
+            JsonRpcParsed.ParseBatch('[{INVALID_JSON}]')
+        expectedErr = JsonRpcError.ParseError('[{INVALID_JSON}]')
+        testutils.assertEqualObjects(expectedErr, context.exception.rpcError)
+
+    # pylint: disable=R0201
+    def testJsonRpcBatchAsJsonCorrect(self):
+        '''Batch serialized as one array, notifications included'''
+        batch = JsonRpcBatch([
+            JsonRpcMessage.Request(1, 'login'),
+            JsonRpcMessage.Notification('alarm'),
+            JsonRpcMessage.Success(2, 7),
+        ])
+        batch.Append(JsonRpcMessage.Error(3, JsonRpcError.InternalError()))
+        self.assertEqual(4, len(batch))
+        expected = '[\n{\n"id": 1,\n"method": "login"\n},' +\
+            '\n{\n"method": "alarm"\n},' +\
+            '\n{\n"id": 2,\n"result": 7\n},' +\
+            '\n{\n"error": {\n"code": -32603,' +\
+            '\n"message": "Internal Error"\n},\n"id": 3\n}\n]'
+        self.assertEqual(expected, batch.AsJson(indent=False, escape=True))
+
+    # pylint: disable=R0201
+    def testJsonRpcBatchKeepsNotifications(self):
+        '''A client batch is sent with its notifications'''
+        request = JsonRpcMessage.Request(1, 'login')
+        notification = JsonRpcMessage.Notification('alarm', [1])
+        batch = JsonRpcBatch([request, notification])
+        self.assertEqual('[' + request.AsWireJson() + ',' +
+                         notification.AsWireJson() + ']', batch.AsWireJson())
+        testutils.assertEqualObjects(
+            [JsonRpcParsed(JsonRpcParsedType.REQUEST, request),
+             JsonRpcParsed(JsonRpcParsedType.NOTIFICATION, notification)],
+            JsonRpcParsed.Parse(batch.AsWireJson()))
+        self.assertEqual(2, batch.AsJson().count('"method"'))
+        self.assertEqual('[' + notification.AsWireJson() + ']',
+                         JsonRpcBatch([notification]).AsWireJson())
+        self.assertEqual('', JsonRpcBatch().AsJson())
+        self.assertEqual('', JsonRpcBatch().AsWireJson())
+
+    # pylint: disable=R0201
+    def testPredefinedErrorShared(self):
+        '''Predefined errors without data are shared and immutable'''
+        self.assertIs(JsonRpcError.MethodNotFound(),
+                      JsonRpcError.MethodNotFound())
+        self.assertIsNot(JsonRpcError.MethodNotFound('data'),
+                         JsonRpcError.MethodNotFound('data'))
+        msg = JsonRpcError.InvalidRequest()
+        with self.assertRaises(AttributeError):
+            msg.data = 'data'
+        self.assertIs(ABSENT, msg.data)
+
+    # pylint: disable=R0201
+    def testErrorResponseSharedErrorAsJson(self):
+        expected = '{\n"error": {\n"code": -32601,' +\
+            '\n"message": "Method Not Found"\n},\n"id": 1\n}'
+        msg = JsonRpcMessage.Error(1, JsonRpcError.MethodNotFound())
+        self.assertEqual(expected, msg.AsJson(indent=False, escape=True))
+        for indent in (2, 0, None):
+            self.assertEqual(JsonRpcMessage.AsJson(msg, indent=indent),
+                             msg.AsJson(indent=indent))
+        self.assertEqual('{"error": {"code": -32601,"message": '
+                         '"Method Not Found"},"id": 1}',
+                         msg.AsJson(indent=None))
+
+    # pylint: disable=R0201
+    def testErrorCodesAllowed(self):
+        for code in [-32700, -32600, -32603, -32099, -32000]:
+            self.assertTrue(JsonRpcErrorCodes.IsAllowed(code))
+        for code in [-32701, -32604, -32599, -32100, -31999, 1, '-32000',
+                     -32000.0, None]:
+            self.assertFalse(JsonRpcErrorCodes.IsAllowed(code))
+
+    # pylint: disable=R0201
+    def testErrorCodesRegister(self):
+        '''Registered application error code is accepted by Parse'''
+        testReqJson = '''{
+            "jsonrpc": "2.0",
+            "error": {"code": 17, "message": "Locked"},
+            "id": 521
+        }'''
+        with self.assertRaises(JsonRpcParseError):
+            JsonRpcParsed.Parse(testReqJson)
+        JsonRpcErrorCodes.Register(17, 'Locked')
+        try:
+            expected = JsonRpcParsed(
+                JsonRpcParsedType.ERROR,
+                JsonRpcErrorResponse(521, JsonRpcError(17, 'Locked')))
+            testutils.assertEqualObjects(expected,
+                                         JsonRpcParsed.Parse(testReqJson))
+            testutils.assertEqualObjects(JsonRpcError(17, 'Locked', 'x'),
+                                         JsonRpcError.Registered(17, 'x'))
+        finally:
+            JsonRpcErrorCodes.Unregister(17)
+        self.assertFalse(JsonRpcErrorCodes.IsAllowed(17))
+        with self.assertRaises(JsonRpcException):
+            JsonRpcError.Registered(17)
+        with self.assertRaises(JsonRpcException):
+            JsonRpcErrorCodes.Register(-32650, 'Reserved')
+        self.assertIs(JsonRpcError.InternalError(),
+                      JsonRpcError.Registered(-32603))
+
+    # pylint: disable=R0201
+    def testMessagesHaveNoDict(self):
+        '''Messages are slotted, omitted optional fields are ABSENT'''
+        msgs = [JsonRpcRequest(1, 'login'), JsonRpcNotification('alarm'),
+                JsonRpcSuccessResponse(1, 2), JsonRpcError(-32000, 'Busy'),
+                JsonRpcErrorResponse(1, JsonRpcError.InternalError()),
+                JsonRpcParsed(JsonRpcParsedType.SUCCESS, None)]
+        for msg in msgs:
+            self.assertFalse(hasattr(msg, '__dict__'))
+        self.assertIs(ABSENT, msgs[0].params)
+        self.assertIs(ABSENT, msgs[1].params)
+        self.assertIs(ABSENT, msgs[3].data)
+        self.assertFalse(ABSENT)
+        self.assertIs(ABSENT, pickle.loads(pickle.dumps(ABSENT)))
+        for msg in msgs:
+            testutils.assertEqualObjects(msg,
+                                         pickle.loads(pickle.dumps(msg)))
+        self.assertIs(JsonRpcError.InternalError(),
+                      pickle.loads(pickle.dumps(msgs[4])).error)
+
+    # pylint: disable=R0201
+    def testJsonRpcMessageAsWireJsonCorrect(self):
+        msg = JsonRpcMessage.Request(1, 'login', ['user', 'password'])
+        self.assertEqual('{"jsonrpc":"2.0","method":"login",' +
+                         '"params":["user","password"],"id":1}',
+                         msg.AsWireJson())
+        msg = JsonRpcMessage.Notification('alarm')
+        self.assertEqual('{"jsonrpc":"2.0","method":"alarm"}',
+                         msg.AsWireJson())
+        msg = JsonRpcMessage.Success('a', {'n': u'\u00e9'})
+        self.assertEqual('{"jsonrpc":"2.0","result":{"n":"\\u00e9"},' +
+                         '"id":"a"}', msg.AsWireJson())
+        self.assertEqual(u'{"jsonrpc":"2.0","result":{"n":"\u00e9"},' +
+                         u'"id":"a"}', msg.AsWireJson(escape=False))
+        msg = JsonRpcMessage.Error(None, JsonRpcError.ParseError())
+        self.assertEqual('{"jsonrpc":"2.0","error":{"code":-32700,' +
+                         '"message":"Parse Error"},"id":null}',
+                         msg.AsWireJson())
+        msg = JsonRpcMessage.Error(7, JsonRpcError(-32000, 'Busy', [1]))
+        self.assertEqual('{"jsonrpc":"2.0","error":{"code":-32000,' +
+                         '"message":"Busy","data":[1]},"id":7}',
+                         msg.AsWireJson())
+
+    # pylint: disable=R0201
+    def testAsWireJsonRoundTrip(self):
+        '''Messages written by AsWireJson are parsed back unchanged'''
+        cases = [
+            (JsonRpcParsedType.REQUEST,
+             JsonRpcRequest(521, 'sum', {"param1": 1, "param2": 2})),
+            (JsonRpcParsedType.REQUEST, JsonRpcRequest('x', 'sum')),
+            (JsonRpcParsedType.NOTIFICATION,
+             JsonRpcNotification('alarm', [1, None])),
+            (JsonRpcParsedType.SUCCESS, JsonRpcSuccessResponse(1, None)),
+            (JsonRpcParsedType.ERROR,
+             JsonRpcErrorResponse(2, JsonRpcError.MethodNotFound('sum'))),
+            (JsonRpcParsedType.ERROR,
+             JsonRpcErrorResponse(3, JsonRpcError.InvalidRequest())),
+            (JsonRpcParsedType.ERROR,
+             JsonRpcErrorResponse(None, JsonRpcError.ParseError())),
+            (JsonRpcParsedType.ERROR,
+             JsonRpcErrorResponse(None, JsonRpcError.InvalidRequest('x'))),
+        ]
+        for parsedType, msg in cases:
+            expected = JsonRpcParsed(parsedType, msg)
+            actual = JsonRpcParsed.Parse(msg.AsWireJson())
+            testutils.assertEqualObjects(expected, actual)
+
+        batch = JsonRpcBatch([msg for _, msg in cases])
+        expected = [JsonRpcParsed(parsedType, msg)
+                    for parsedType, msg in cases]
+        actual = JsonRpcParsed.Parse(batch.AsWireJson())
+        testutils.assertEqualObjects(expected, actual)
+
+    # pylint: disable=R0201
+    def testParseBytesLike(self):
+        '''Parse accepts bytes, bytearray and memoryview slices'''
+        msg = JsonRpcMessage.Request(521, 'sum', [1, u'\u00e9'])
+        expected = JsonRpcParsed(JsonRpcParsedType.REQUEST, msg)
+        wire = msg.AsWireBytes(escape=False)
+        self.assertEqual(msg.AsWireJson(escape=False).encode('utf-8'), wire)
+        buf = bytearray(b'xx' + wire + b'yy')
+        for data in [wire, bytearray(wire), memoryview(buf)[2:-2]]:
+            testutils.assertEqualObjects(expected, JsonRpcParsed.Parse(data))
+        batch = JsonRpcBatch([msg])
+        testutils.assertEqualObjects(
+            [expected], JsonRpcParsed.Parse(batch.AsWireBytes()))
+
+    # pylint: disable=R0201
+    def testParseErrorExcerptBounded(self):
+        '''ParseError data holds the beginning of invalid input only'''
+        testReqJson = b'{INVALID_JSON' + b'x' * 100000
+        with self.assertRaises(JsonRpcParseError) as context:
+            JsonRpcParsed.Parse(memoryview(testReqJson))
+        expectedErr = JsonRpcError.ParseError(
+            testReqJson[:128].decode('ascii') + '...')
+        testutils.assertEqualObjects(expectedErr, context.exception.rpcError)
+
+    # pylint: disable=R0201
+    def testParseLazySameAsParse(self):
+        '''ParseLazy gives the same messages as Parse does'''
+        cases = [
+            '{"jsonrpc": "2.0", "method": "sum", "params": [1, {"a": "}"}],'
+            ' "id": 1}',
+            '{"jsonrpc": "2.0", "method": "update", "params": {"x": [1]}}',
+            '{"jsonrpc": "2.0", "method": "ping", "id": "a"}',
+            '{"jsonrpc": "2.0", "method": "ping", "params": null, "id": 2}',
+            '{"jsonrpc": "2.0", "result": {"v": "\\"]"}, "id": 3}',
+            '{"jsonrpc": "2.0", "result": null, "id": 4}',
+            '{"jsonrpc": "2.0", "error": {"code": -32601, "message": "x"},'
+            ' "id": 5}',
+            '[{"jsonrpc": "2.0", "method": "a", "params": [1], "id": 1}, 1,'
+            ' {"jsonrpc": "2.0", "result": [2], "id": 2}]',
+            '{"jsonrpc": "2.0", "method": "\\u0061", "params": [1], "id": 1}',
+            '{"jsonrpc": "2.0", "\\u006dethod": "a", "params": [1], "id": 1}',
+        ]
+        for case in cases:
+            for data in [case, case.encode('utf-8'),
+                         memoryview(case.encode('utf-8'))]:
+                testutils.assertEqualObjects(JsonRpcParsed.Parse(case),
+                                             JsonRpcParsed.ParseLazy(data))
+
+    @unittest.skipIf(sys.version_info < (3, 11), 'Python 3.11 is needed')
+    def testParseLazyDecodesOnAccess(self):
+        '''Params and result are kept raw until accessed'''
+        req = JsonRpcParsed.ParseLazy(
+            b'{"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": 1}'
+        ).payload
+        self.assertIsInstance(req, JsonRpcRequest)
+        paramsSlot = JsonRpcRequest.__dict__['params']
+        self.assertEqual(JsonRpcRawJson(b'[1, 2]').text,
+                         paramsSlot.__get__(req).text)
+        self.assertEqual([1, 2], req.params)
+        self.assertEqual([1, 2], paramsSlot.__get__(req))
+        req.params = {'a': 1}
+        self.assertEqual({'a': 1}, req.params)
+        res = JsonRpcParsed.ParseLazy(
+            '{"jsonrpc": "2.0", "result": {"a": [1]}, "id": 7}').payload
+        self.assertIsInstance(res, JsonRpcSuccessResponse)
+        self.assertEqual({'a': [1]}, res.result)
+
+    @unittest.skipIf(sys.version_info < (3, 11), 'Python 3.11 is needed')
+    def testParseLazyWireVerbatim(self):
+        '''Params and result never accessed are written to the wire as they
+        were received'''
+        reqJson = '{"jsonrpc": "2.0", "method": "sum",' \
+            ' "params": [1.50, "\\u00e9"], "id": 1}'
+        req = JsonRpcParsed.ParseLazy(reqJson).payload
+        self.assertEqual('{"jsonrpc":"2.0","method":"sum",'
+                         '"params":[1.50, "\\u00e9"],"id":1}',
+                         req.AsWireJson())
+        notifJson = b'{"jsonrpc": "2.0", "method": "n", "params": {"k": 1}}'
+        notif = JsonRpcParsed.ParseLazy(notifJson).payload
+        self.assertEqual('{"jsonrpc":"2.0","method":"n","params":{"k": 1}}',
+                         notif.AsWireJson())
+        resJson = '{"jsonrpc": "2.0", "result": [ 1 ], "id": "r"}'
+        res = JsonRpcParsed.ParseLazy(resJson).payload
+        self.assertEqual('{"jsonrpc":"2.0","result":[ 1 ],"id":"r"}',
+                         JsonRpcBatch([res]).AsWireJson()[1:-1])
+        testutils.assertEqualObjects(JsonRpcParsed.Parse(resJson).payload,
+                                     res)
+        response = JsonRpcMessage.Success(1, JsonRpcRawJson(b'{"a": 1}'))
+        self.assertEqual('{"jsonrpc":"2.0","result":{"a": 1},"id":1}',
+                         response.AsWireJson())
+        self.assertIn('"result": {\n"a": 1\n}', response.AsJson(indent=0))
+
+    def testParseLazyInvalid(self):
+        '''Invalid json is reported by ParseLazy the way Parse does, invalid
+        params and result included'''
+        invalidValues = ['[1 2]', '01', '-', '{"a":tru}', '"a\nb"', '[1,]',
+                         '{"a":1,}', '"\\x"', '1.', '[1]]']
+        invalidJsons = ['{"jsonrpc": "2.0", "method": "a", "id": 1',
+                        '{"jsonrpc": "2.0", "method": "a", "id": x}',
+                        '{"jsonrpc": "2.0", "method": "a"} 1', '', '[']
+        for value in invalidValues:
+            invalidJsons.append('{"jsonrpc": "2.0", "method": "a", '
+                                '"params": %s, "id": 1}' % value)
+            invalidJsons.append('[{"jsonrpc": "2.0", "result": %s, "id": 1}]'
+                                % value)
+        for invalidJson in invalidJsons:
+            for text in [invalidJson, invalidJson.encode('utf-8')]:
+                with self.assertRaises(JsonRpcParseError) as expected:
+                    JsonRpcParsed.Parse(text)
+                with self.assertRaises(JsonRpcParseError) as actual:
+                    JsonRpcParsed.ParseLazy(text)
+                testutils.assertEqualObjects(expected.exception.rpcError,
+                                             actual.exception.rpcError)
+
+    def testParseLazyValidRawValues(self):
+        '''Valid values, deep or non-ASCII bytes too, are kept raw and
+        decoded the way Parse does'''
+        paramsSlot = JsonRpcRequest.__dict__['params']
+        for params in ['[[[[[[[1]]]]]]]', '{"a": "\u00e9 \\u00e9"}',
+                       '[-0.5e+3, true, null, {"b": [], "c": {}}]',
+                       '[' * 50 + '{"a": ["\u00e9"]}' + ']' * 50]:
+            jsonstr = '{"jsonrpc": "2.0", "method": "a", "params": %s, ' \
+                '"id": 1}' % params
+            for text in [jsonstr, jsonstr.encode('utf-8')]:
+                req = JsonRpcParsed.ParseLazy(text).payload
+                if sys.version_info >= (3, 11):
+                    self.assertEqual(params,
+                                     paramsSlot.__get__(req).AsStr())
+                self.assertEqual(req.params,
+                                 JsonRpcParsed.Parse(text).payload.params)
+
+    def testPeekLongMalformedValues(self):
+        '''Long messages with malformed params or result fail Peek the way
+        they fail Parse'''
+        blob = '"%s"' % ('x' * PEEK_MIN_SIZE)
+        for value in ['[%s,,1 2 nope]' % blob, '{"a": tru, "b": %s}' % blob,
+                      '[%s, 01]' % blob, '[%s, "a\nb"]' % blob,
+                      '{%s: 1,}' % blob]:
+            for case in ['{"jsonrpc": "2.0", "method": "a", "params": %s, '
+                         '"id": 1}' % value,
+                         '{"jsonrpc": "2.0", "result": %s, "id": 1}' % value,
+                         '[{"jsonrpc": "2.0", "method": "a", "params": %s}]'
+                         % value]:
+                for data in [case, case.encode('utf-8')]:
+                    with self.assertRaises(JsonRpcParseError) as expected:
+                        JsonRpcParsed.Parse(data)
+                    with self.assertRaises(JsonRpcParseError) as actual:
+                        JsonRpcParsed.Peek(data)
+                    self.assertEqual(JsonRpcError.ParseError().code,
+                                     actual.exception.rpcError.code)
+                    testutils.assertEqualObjects(
+                        expected.exception.rpcError,
+                        actual.exception.rpcError)
+
+    def testPeekLongValidValues(self):
+        '''Long messages with deep or non-ASCII params are peeked the way
+        they are parsed'''
+        blob = '"%s"' % ('é' * PEEK_MIN_SIZE)
+        for value in ['[%s]' % blob, '[' * 30 + blob + ']' * 30,
+                      '{"a": [[[[{"b": %s}]]]]}' % blob]:
+            case = '{"jsonrpc": "2.0", "method": "a", "params": %s, ' \
+                '"id": 1}' % value
+            for data in [case, case.encode('utf-8')]:
+                peeked = JsonRpcParsed.Peek(data)
+                self.assertEqual(JsonRpcParsedType.REQUEST, peeked.parsedType)
+                self.assertEqual(('a', 1), (peeked.method, peeked.id))
+
+    def testPeekSameAsParse(self):
+        '''Peek classifies messages the way Parse does'''
+        cases = [
+            '{"jsonrpc": "2.0", "method": "sum", "params": [1, 2], "id": 1}',
+            '{"jsonrpc": "2.0", "method": "update", "params": {"a": 1}}',
+            '{"jsonrpc": "2.0", "method": "ping", "id": ""}',
+            '{"jsonrpc": "2.0", "result": {"v": 1}, "id": "a"}',
+            '{"jsonrpc": "2.0", "error": {"code": -32601, "message": "x"},'
+            ' "id": null}',
+            '{"jsonrpc": "2.0", "error": {"code": 1, "message": "x"},'
+            ' "id": 2}',
+            '{"jsonrpc": "2.0", "error": [], "id": 2}',
+            '{"jsonrpc": "1.0", "method": "a", "id": 1}',
+            '{"method": "a", "id": 1}',
+            '{"jsonrpc": "2.0", "method": "", "id": 1}',
+            '{"jsonrpc": "2.0", "method": 5, "id": 1}',
+            '{"jsonrpc": "2.0", "params": [1]}',
+            '{"jsonrpc": "2.0", "id": 3}',
+            '{"jsonrpc": "2.0", "\\u006dethod": "a", "id": 1}',
+            '[{"jsonrpc": "2.0", "method": "a", "id": 1}, 1, {"id": 4},'
+            ' {"jsonrpc": "2.0", "result": null, "id": 2}]',
+            '[]', '1', '{"jsonrpc": "2.0", "method": "a"', '',
+        ]
+
+        def Peeked(parsed):
+            if isinstance(parsed, list):
+                return [Peeked(item) for item in parsed]
+            payload = parsed.payload
+            return JsonRpcPeeked(parsed.parsedType,
+                                 getattr(payload, 'method', None),
+                                 getattr(payload, 'id', None))
+        # long messages are scanned, short ones are decoded
+        padding = ' ' * PEEK_MIN_SIZE
+        for case in cases + [case + padding for case in cases]:
+            try:
+                expected = Peeked(JsonRpcParsed.Parse(case))
+            except JsonRpcParseError as e:
+                with self.assertRaises(JsonRpcParseError) as context:
+                    JsonRpcParsed.Peek(case)
+                testutils.assertEqualObjects(e.rpcError,
+                                             context.exception.rpcError)
+                continue
+            for data in [case, case.encode('utf-8')]:
+                testutils.assertEqualObjects(expected,
+                                             JsonRpcParsed.Peek(data))
+
+
+    def testResponseTemplatesSameAsEncoding(self):
+        responses = [
+            JsonRpcMessage.Error(1, JsonRpcError.MethodNotFound()),
+            JsonRpcMessage.Error('a\u00e9', JsonRpcError.InvalidRequest()),
+            JsonRpcMessage.Error(4, JsonRpcError.ParseError()),
+            JsonRpcMessage.Success(7, True),
+            JsonRpcMessage.Success(2.5, None),
+            JsonRpcMessage.Success('x', []),
+            JsonRpcMessage.Success(3, {}),
+        ]
+        for response in responses:
+            for escape in [True, False]:
+                wire = response.AsWireJson(escape)
+                self.assertEqual(wire, JsonRpcBatch([response]).AsWireJson(
+                    escape)[1:-1])
+                self.assertEqual(wire.encode('utf-8'),
+                                 response.AsWireBytes(escape))
+                testutils.assertEqualObjects(
+                    response, JsonRpcParsed.Parse(wire).payload)
+        self.assertEqual('{"jsonrpc":"2.0","error":{"code":-32601,'
+                         '"message":"Method Not Found"},"id":1}',
+                         responses[0].AsWireJson())
+        self.assertEqual('{"jsonrpc":"2.0","result":[],"id":"x"}',
+                         responses[5].AsWireJson())
+
+    def testResponseTemplateRegister(self):
+        template = JsonRpcResponseTemplate.Success(True)
+        self.assertEqual(b'{"jsonrpc":"2.0","result":true,"id":5}',
+                         template.AsWireBytes(5))
+        greeting = JsonRpcResponseTemplate.Success('h\u00e9llo')
+        self.assertEqual('{"jsonrpc":"2.0","result":"h\\u00e9llo","id":1}',
+                         greeting.AsWireJson(1))
+        self.assertEqual('{"jsonrpc":"2.0","result":"h\u00e9llo","id":1}',
+                         greeting.AsWireJson(1, escape=False))
+        self.assertEqual(JsonRpcMessage.Success(3, 'h\u00e9llo').AsWireJson(),
+                         greeting.Response(3).AsWireJson())
+        JsonRpcResponseTemplate.Register(greeting)
+        try:
+            self.assertEqual(greeting.AsWireBytes('a'), JsonRpcMessage.Success(
+                'a', 'h\u00e9llo').AsWireBytes())
+        finally:
+            JsonRpcResponseTemplate.Unregister(greeting)
+        busy = JsonRpcError.Error(-32001, 'Busy', {'retry': 5})
+        busyTemplate = JsonRpcResponseTemplate.Register(
+            JsonRpcResponseTemplate.Error(busy))
+        try:
+            self.assertEqual('{"jsonrpc":"2.0","error":{"code":-32001,'
+                             '"message":"Busy","data":{"retry":5}},"id":9}',
+                             JsonRpcMessage.Error(9, busy).AsWireJson())
+            self.assertIsInstance(busyTemplate.Response(9),
+                                  JsonRpcErrorResponse)
+        finally:
+            JsonRpcResponseTemplate.Unregister(busyTemplate)
+        # only hashable results and empty containers can be matched
+        self.assertRaises(JsonRpcException, JsonRpcResponseTemplate.Register,
+                          JsonRpcResponseTemplate.Success([1]))
+        self.assertRaises(JsonRpcException, JsonRpcResponseTemplate.Register,
+                          JsonRpcResponseTemplate.Success(
+                              collections.OrderedDict()))
+        self.assertRaises(JsonRpcException, JsonRpcResponseTemplate, 'id', 1)
+        # equal results of other types are not matched
+        self.assertEqual('{"jsonrpc":"2.0","result":1,"id":1}',
+                         JsonRpcMessage.Success(1, 1).AsWireJson())
+        self.assertEqual('{"jsonrpc":"2.0","result":0.0,"id":1}',
+                         JsonRpcMessage.Success(1, 0.0).AsWireJson())
+
+
+    def testTryParseSameAsParse(self):
+        cases = [
+            '{"jsonrpc": "2.0", "method": "a", "params": [1], "id": 1}',
+            '{"jsonrpc": "2.0", "method": "a"}',
+            '{"jsonrpc": "2.0", "result": [1], "id": 3}',
+            '{"jsonrpc": "2.0", "error": {"code": -32600, "message": "m"},'
+            ' "id": 4}',
+            '[{"jsonrpc": "2.0", "method": "a", "id": 1}, 1, {"id": 4},'
+            ' {"jsonrpc": "2.0", "method": 5, "id": 6}]',
+            '{"jsonrpc": "2.0", "method": "a"', '', '1', '[]',
+        ]
+        for case in cases:
+            try:
+                expected = JsonRpcParsed.Parse(case)
+            except JsonRpcParseError as e:
+                expected = JsonRpcParsed(
+                    JsonRpcParsedType.INVALID,
+                    JsonRpcMessage.Error(None, e.rpcError))
+            testutils.assertEqualObjects(expected,
+                                         JsonRpcParsed.TryParse(case))
+
+    def testTryParseReportsInvalidWithId(self):
+        cases = [
+            ('{"jsonrpc": "1.0", "method": "a", "id": 7}', 7, -32600,
+             '"jsonrpc" field value should be 2.0'),
+            ('{"method": "a", "id": "x"}', 'x', -32600,
+             'Message have no "jsonrpc" field'),
+            ('{"jsonrpc": "2.0", "id": 8}', 8, -32600, 'No reqired fields'),
+            ('{"jsonrpc": "2.0", "error": {"code": 1}, "id": 9}', 9, -32602,
+             'Invalid JSON-RPC 2.0 Error object structure'),
+            ('{"jsonrpc": "2.0", "method": 5, "id": 10}', 10, -32603,
+             "object of type 'int' has no len()"),
+            ('{"jsonrpc": "2.0", "method": "a", "id": [1]', None, -32700,
+             '{"jsonrpc": "2.0", "method": "a", "id": [1]'),
+            ('[]', None, -32600, 'Empty batch'),
+        ]
+        for case, reqId, code, data in cases:
+            parsed = JsonRpcParsed.TryParse(case)
+            self.assertEqual(JsonRpcParsedType.INVALID, parsed.parsedType)
+            self.assertIsInstance(parsed.payload, JsonRpcErrorResponse)
+            self.assertEqual((reqId, code, data),
+                             (parsed.payload.id, parsed.payload.error.code,
+                              parsed.payload.error.data))
+
 
 if __name__ == '__main__':
     unittest.main()
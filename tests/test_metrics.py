@@ -0,0 +1,172 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import threading
+import unittest
+import testutils
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcDispatcher, JsonRpcAsyncDispatcher, JsonRpcMethodError,\
+    JsonRpcResultCache, JsonRpcMetrics
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def Divide(a, b):
+    if b == 0:
+        raise JsonRpcMethodError(JsonRpcError.InvalidParams('b is zero'))
+    return a / b
+
+
+def Fail():
+    raise RuntimeError('broken')
+
+
+def Request(reqId, method, params=None):
+    return JsonRpcParsed.Parse(
+        JsonRpcMessage.Request(reqId, method, params).AsWireJson())
+
+
+class TestMetrics(unittest.TestCase):
+    def MakeDispatcher(self, metrics):
+        dispatcher = JsonRpcDispatcher(metrics)
+        dispatcher.Register(Divide, 'divide')
+        dispatcher.Register(Fail, 'fail')
+        return dispatcher
+
+    def testCountsCallsAndErrors(self):
+        metrics = JsonRpcMetrics(bounds=[0.01, 1],
+                                 clock=testutils.Clock(step=0.005))
+        dispatcher = self.MakeDispatcher(metrics)
+        dispatcher.Dispatch(Request(1, 'divide', [4, 2]))
+        dispatcher.Dispatch(Request(2, 'divide', [4, 0]))
+        dispatcher.Dispatch(Request(3, 'divide', [4]))
+        dispatcher.Dispatch(Request(4, 'fail'))
+        dispatcher.Dispatch(Request(5, 'missing'))
+        snapshot = metrics.Snapshot()
+        self.assertEqual(sorted(snapshot), ['', 'divide', 'fail'])
+        divide = snapshot['divide']
+        self.assertEqual(divide['calls'], 3)
+        self.assertEqual(divide['inFlight'], 0)
+        self.assertEqual(divide['errors'], {-32602: 2})
+        self.assertEqual(divide['latency'].counts, [3, 0, 0])
+        self.assertEqual(snapshot['fail']['errors'], {-32603: 1})
+        self.assertEqual(snapshot['']['errors'], {-32601: 1})
+
+    def testInFlight(self):
+        metrics = JsonRpcMetrics()
+        dispatcher = JsonRpcDispatcher(metrics)
+        seen = []
+
+        def Probe():
+            seen.append(metrics.Snapshot()['probe']['inFlight'])
+            return True
+        dispatcher.Register(Probe, 'probe')
+        dispatcher.Dispatch(Request(1, 'probe'))
+        self.assertEqual(seen, [1])
+        self.assertEqual(metrics.Snapshot()['probe']['inFlight'], 0)
+
+    def testCacheHitsAreCalls(self):
+        metrics = JsonRpcMetrics()
+        dispatcher = JsonRpcDispatcher(metrics)
+        dispatcher.Register(Divide, 'divide', cache=JsonRpcResultCache())
+        for reqId in range(3):
+            dispatcher.Dispatch(Request(reqId, 'divide', [1, 2]))
+        self.assertEqual(metrics.Snapshot()['divide']['calls'], 3)
+
+    def testThreadsMerged(self):
+        metrics = JsonRpcMetrics()
+        dispatcher = self.MakeDispatcher(metrics)
+
+        def Work():
+            for i in range(100):
+                dispatcher.Call('divide', [i, 1])
+        threads = [threading.Thread(target=Work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        dispatcher.Call('divide', [1, 1])
+        snapshot = metrics.Snapshot()['divide']
+        self.assertEqual(snapshot['calls'], 401)
+        self.assertEqual(snapshot['latency'].count, 401)
+        # finished threads are folded, counts stay the same
+        self.assertEqual(metrics.Snapshot()['divide']['calls'], 401)
+
+    def testFinishInOtherThread(self):
+        metrics = JsonRpcMetrics()
+        started = metrics.Start('a')
+        thread = threading.Thread(target=metrics.Finish,
+                                  args=('a', started, -32000))
+        thread.start()
+        thread.join()
+        snapshot = metrics.Snapshot()['a']
+        self.assertEqual((snapshot['calls'], snapshot['inFlight']), (1, 0))
+        self.assertEqual(snapshot['errors'], {-32000: 1})
+
+    def testAsyncDispatcher(self):
+        metrics = JsonRpcMetrics()
+        dispatcher = JsonRpcAsyncDispatcher(metrics=metrics)
+        dispatcher.Register(Divide, 'divide')
+
+        async def Sleep():
+            await asyncio.sleep(10)
+        dispatcher.Register(Sleep, 'sleep')
+
+        async def Run():
+            await dispatcher.DispatchAsync(Request(1, 'divide', [1, 0]))
+            task = asyncio.ensure_future(
+                dispatcher.DispatchAsync(Request(2, 'sleep')))
+            await asyncio.sleep(0.01)
+            self.assertEqual(metrics.Snapshot()['sleep']['inFlight'], 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(Run())
+        snapshot = metrics.Snapshot()
+        self.assertEqual(snapshot['divide']['errors'], {-32602: 1})
+        self.assertEqual(snapshot['sleep']['inFlight'], 0)
+
+    def testPrometheusFormat(self):
+        metrics = JsonRpcMetrics(bounds=[0.01, 1],
+                                 clock=testutils.Clock(step=0.25))
+        dispatcher = self.MakeDispatcher(metrics)
+        dispatcher.Call('divide', [1, 2])
+        with self.assertRaises(JsonRpcMethodError):
+            dispatcher.Call('divide', [1, 0])
+        metrics.Start('a"b')
+        text = metrics.AsPrometheus()
+        self.assertEqual(text, '\n'.join([
+            '# HELP jsonrpc_calls_total Finished calls by method.',
+            '# TYPE jsonrpc_calls_total counter',
+            'jsonrpc_calls_total{method="a\\"b"} 0',
+            'jsonrpc_calls_total{method="divide"} 2',
+            '# HELP jsonrpc_errors_total Calls answered with an error by '
+            'method and code.',
+            '# TYPE jsonrpc_errors_total counter',
+            'jsonrpc_errors_total{method="divide",code="-32602"} 1',
+            '# HELP jsonrpc_in_flight Calls running by method.',
+            '# TYPE jsonrpc_in_flight gauge',
+            'jsonrpc_in_flight{method="a\\"b"} 1',
+            'jsonrpc_in_flight{method="divide"} 0',
+            '# HELP jsonrpc_call_duration_seconds Call latency by method.',
+            '# TYPE jsonrpc_call_duration_seconds histogram',
+            'jsonrpc_call_duration_seconds_bucket{method="a\\"b",le="0.01"} 0',
+            'jsonrpc_call_duration_seconds_bucket{method="a\\"b",le="1.0"} 0',
+            'jsonrpc_call_duration_seconds_bucket{method="a\\"b",le="+Inf"} 0',
+            'jsonrpc_call_duration_seconds_sum{method="a\\"b"} 0.0',
+            'jsonrpc_call_duration_seconds_count{method="a\\"b"} 0',
+            'jsonrpc_call_duration_seconds_bucket{method="divide",le="0.01"} '
+            '0',
+            'jsonrpc_call_duration_seconds_bucket{method="divide",le="1.0"} 2',
+            'jsonrpc_call_duration_seconds_bucket{method="divide",le="+Inf"} '
+            '2',
+            'jsonrpc_call_duration_seconds_sum{method="divide"} 0.5',
+            'jsonrpc_call_duration_seconds_count{method="divide"} 2',
+        ]) + '\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import unittest
+
+from pyjsonrpclite.scanner import JsonScanError, skipValue, scanObject,\
+    proveValue, loadsLazy
+
+sys.path.insert(0, os.path.abspath('..'))
+
+# values are proven with possessive quantifiers of Python 3.11
+PROVES_VALUES = sys.version_info >= (3, 11)
+
+
+class TestScanner(unittest.TestCase):
+    def testSkipValue(self):
+        values = ['1', '-1.5e3', 'null', 'true', '"a"', '"a\\"]"',
+                  '"' + 'x' * 1000 + '\\\\"', '"\\\\\\""', '[]', '{}',
+                  '[1, [2, {"a": "]}"}], "' + 'y' * 100 + '\\"["]',
+                  '{"a": {"b": ["}", "\\\\"]}}']
+        for value in values:
+            for text in [value + ' ,', (value + ' ,').encode('utf-8'),
+                         bytearray((value + ' ,').encode('utf-8'))]:
+                self.assertEqual(len(value), skipValue(text, 0), value)
+                json.loads(value)
+
+    def testSkipValueIncomplete(self):
+        for value in ['', '"a', '"a\\"', '[1, 2', '{"a": "]}"',
+                      '"' + 'x' * 100]:
+            with self.assertRaises(JsonScanError):
+                skipValue(value, 0)
+
+    def testScanObject(self):
+        text = b' {"a" : 1, "b":[1, "2"] ,"c":{}}x'
+        members, end = scanObject(text, 1)
+        self.assertEqual([(b'a', 8, 9), (b'b', 15, 23), (b'c', 29, 31)],
+                         members)
+        self.assertEqual(len(text) - 1, end)
+        with self.assertRaises(JsonScanError):
+            scanObject('{"\\u0061": 1}', 0)
+
+    @unittest.skipUnless(PROVES_VALUES, 'Python 3.11 is needed')
+    def testProveValue(self):
+        deep = '[' * 100 + '{"a": [1, "\u00e9"]}' + ']' * 100
+        wide = '[%s, [[[[[1]]]]], %s]' % (
+            ', '.join(['"x"'] * 100), ', '.join(['{"b": [[[[]]]]}'] * 10))
+        values = ['1', '-1.5e3', 'null', '"a\\\\"', '[]', '{}', '[1, [2]]',
+                  '{"a": {"b": ["}", "\\\\"]}}', deep, wide,
+                  '"\u00e9 \\ud800"']
+        for value in values:
+            json.loads(value)
+            for text in [value + ' ,', (value + ' ,').encode('utf-8'),
+                         bytearray((value + ' ,').encode('utf-8'))]:
+                self.assertEqual(len(text) - 2, proveValue(text, 0), value)
+        invalid = ['-', '[01]', '[1.]', '[1 2]', '[1, ]', '{"a": 1, }',
+                   '{"a": }', '{"a" 1}', '"a\nb"', '"\\x"', 'NaN',
+                   '[Infinity]', '[1}', '[[[[[1]]]], ]', '[',
+                   '[' * 300 + ']' * 300]
+        for value in invalid:
+            for text in [value, value.encode('utf-8')]:
+                with self.assertRaises(JsonScanError):
+                    proveValue(text, 0)
+        with self.assertRaises(JsonScanError):
+            proveValue(b'["\xff"]', 0)
+
+    @unittest.skipIf(PROVES_VALUES, 'Python 3.11 proves values')
+    def testLoadsLazyUnproven(self):
+        '''Before Python 3.11 no value is left raw, the text is decoded'''
+        with self.assertRaises(JsonScanError):
+            loadsLazy('{"a": 1}', json.loads, set(['a']), None)
+        self.assertEqual({'a': 1}, loadsLazy('{"a": 1}', json.loads, set(),
+                                             None))
+
+    @unittest.skipUnless(PROVES_VALUES, 'Python 3.11 is needed')
+    def testLoadsLazy(self):
+        text = '[{"a": [1, 2], "b": {"c": 3}}, 4, {}]'
+        expected = [{'a': ('[1, 2]',), 'b': {'c': 3}}, 4, {}]
+        for data in [text, text.encode('utf-8'),
+                     memoryview(text.encode('utf-8'))]:
+            actual = loadsLazy(data, json.loads, set(['a']),
+                               lambda text, start, end: (
+                                   bytes(text[start:end]).decode('utf-8')
+                                   if not isinstance(text, str)
+                                   else text[start:end],))
+            self.assertEqual(expected, actual)
+        for invalid in ['1', '{"a": 1} 2', '{"a": 1', '[1 2]']:
+            with self.assertRaises(JsonScanError):
+                loadsLazy(invalid, json.loads, set(), None)
+
+    @unittest.skipUnless(PROVES_VALUES, 'Python 3.11 is needed')
+    def testLoadsLazyRawValueProven(self):
+        '''A raw value is wrapped only if it is proven valid'''
+        wrap = lambda text, start, end: text[start:end]  # noqa
+        for value in ['{"b": [1, -2.5e3, "\\u00e9"]}', '"x"', 'null',
+                      '[[[[[[1]]]]]]', '"\u00e9"']:
+            text = '{"a": %s}' % value
+            self.assertEqual({'a': value},
+                             loadsLazy(text, json.loads, set(['a']), wrap))
+            self.assertEqual({'a': value.encode('utf-8')},
+                             loadsLazy(text.encode('utf-8'), json.loads,
+                                       set(['a']), wrap))
+        for value in ['01', '-', '{"b": tru}', '"a\nb"', '[1, ]']:
+            text = '{"a": %s}' % value
+            with self.assertRaises(JsonScanError):
+                loadsLazy(text.encode('utf-8'), json.loads, set(['a']),
+                          wrap)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import unittest
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcParsed, JsonRpcException,\
+    JsonRpcDispatcher, JsonRpcAsyncDispatcher, JsonRpcParamsSchema
+
+sys.path.insert(0, os.path.abspath('..'))
+
+ORDER = {
+    'type': 'object',
+    'required': ['customer', 'items'],
+    'additionalProperties': False,
+    'properties': {
+        'customer': {'type': 'string', 'minLength': 1, 'maxLength': 8},
+        'items': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': ['sku', 'count'],
+                'properties': {
+                    'sku': {'type': 'string', 'pattern': '^[A-Z]{3}$'},
+                    'count': {'type': 'integer', 'minimum': 1,
+                              'maximum': 100},
+                    'price': {'type': 'number', 'exclusiveMinimum': 0},
+                },
+            },
+        },
+        'note': {'type': ['string', 'null']},
+        'mode': {'enum': ['fast', 1]},
+    },
+}
+
+
+def Order(**changes):
+    order = {'customer': 'ann',
+             'items': [{'sku': 'ABC', 'count': 2, 'price': 1.5}]}
+    order.update(changes)
+    return order
+
+
+def PlaceOrder(customer, items, note=None, mode=None):
+    return len(items)
+
+
+class TestParamsSchema(unittest.TestCase):
+    def Problem(self, schema, params):
+        return JsonRpcParamsSchema(schema).Validate(params)
+
+    def testValid(self):
+        schema = JsonRpcParamsSchema(ORDER)
+        self.assertIsNone(schema.Validate(Order()))
+        self.assertIsNone(schema.Validate(Order(note=None, mode=1)))
+        self.assertIsNone(schema.Validate(Order(items=[
+            {'sku': 'XYZ', 'count': 3.0}])))
+
+    def testPaths(self):
+        cases = [
+            (Order(customer=''), '/customer',
+             'Expected at least 1 characters'),
+            (Order(customer=5), '/customer', 'Expected string, got integer'),
+            (Order(items=[]), '/items', 'Expected at least 1 items'),
+            (Order(items=[{'sku': 'ABC'}]), '/items/0/count',
+             'Missing required property'),
+            (Order(items=[{'sku': 'ABC', 'count': 1},
+                          {'sku': 'ABC', 'count': 101}]),
+             '/items/1/count', 'Expected at most 100'),
+            (Order(items=[{'sku': 'ABC', 'count': 1.5}]), '/items/0/count',
+             'Expected integer, got number'),
+            (Order(items=[{'sku': 'ABC', 'count': True}]), '/items/0/count',
+             'Expected integer, got boolean'),
+            (Order(items=[{'sku': 'abc', 'count': 1}]), '/items/0/sku',
+             'Expected to match ^[A-Z]{3}$'),
+            (Order(items=[{'sku': 'ABC', 'count': 1, 'price': 0}]),
+             '/items/0/price', 'Expected more than 0'),
+            (Order(note=1), '/note', 'Expected string or null, got integer'),
+            (Order(mode=True), '/mode', "Expected one of 'fast', 1"),
+            (Order(extra=1), '/extra', 'Unexpected property'),
+            ([1], '', 'Expected object, got array'),
+            (None, '', 'Expected object, got null'),
+        ]
+        for params, path, message in cases:
+            self.assertEqual(self.Problem(ORDER, params),
+                             {'path': path, 'message': message})
+
+    def testPositionalParams(self):
+        schema = {'type': 'array', 'maxItems': 3,
+                  'prefixItems': [{'type': 'string'}],
+                  'items': {'type': 'number'}}
+        self.assertIsNone(self.Problem(schema, ['a', 1, 2.5]))
+        self.assertIsNone(self.Problem(schema, []))
+        self.assertEqual(self.Problem(schema, [1]),
+                         {'path': '/0',
+                          'message': 'Expected string, got integer'})
+        self.assertEqual(self.Problem(schema, ['a', 1, 'b']),
+                         {'path': '/2',
+                          'message': 'Expected number, got string'})
+        self.assertEqual(self.Problem(schema, ['a', 1, 2, 3])['message'],
+                         'Expected at most 3 items')
+
+    def testAdditionalSchemaAndEscaping(self):
+        schema = {'additionalProperties': {'type': 'integer'},
+                  'properties': {'a/b': {'properties': {'c~d': False}}}}
+        self.assertIsNone(self.Problem(schema, {'x': 1, 'a/b': {}}))
+        self.assertEqual(self.Problem(schema, {'x': 'y'}),
+                         {'path': '/x',
+                          'message': 'Expected integer, got string'})
+        self.assertEqual(self.Problem(schema, {'a/b': {'c~d': 1}}),
+                         {'path': '/a~1b/c~0d', 'message': 'Not allowed'})
+
+    def testUnsupportedSchema(self):
+        for schema in [{'oneOf': []}, {'type': 'float'}, {'items': [{}]},
+                       {'minimum': '1'}, []]:
+            with self.assertRaises(JsonRpcException):
+                JsonRpcParamsSchema(schema)
+        self.assertIsNone(self.Problem({'title': 'any'}, {'a': 1}))
+
+
+class TestDispatcherSchema(unittest.TestCase):
+    def Dispatch(self, dispatcher, params):
+        msg = JsonRpcMessage.Request(1, 'order', params)
+        return dispatcher.Dispatch(JsonRpcParsed.Parse(msg.AsWireJson()))
+
+    def testInvalidParamsAnswered(self):
+        dispatcher = JsonRpcDispatcher()
+        calls = []
+
+        def Handler(**params):
+            calls.append(params)
+            return PlaceOrder(**params)
+        dispatcher.Register(Handler, 'order', schema=ORDER)
+        self.assertEqual(self.Dispatch(dispatcher, Order()).result, 1)
+        response = self.Dispatch(dispatcher, Order(items=[{'sku': 'ABC'}]))
+        self.assertEqual(response.error.code, -32602)
+        self.assertEqual(response.error.data,
+                         {'path': '/items/0/count',
+                          'message': 'Missing required property'})
+        self.assertEqual(len(calls), 1)
+
+    def testOmittedParamsCheckedAsNull(self):
+        dispatcher = JsonRpcDispatcher()
+        dispatcher.Register(lambda: 1, 'any', schema={'type': 'null'})
+        dispatcher.Register(lambda **kw: 1, 'object',
+                            schema=JsonRpcParamsSchema({'type': 'object'}))
+        self.assertEqual(dispatcher.Call('any'), 1)
+        response = dispatcher.DispatchJson(
+            '{"jsonrpc": "2.0", "method": "object", "id": 1}')
+        self.assertEqual(response.error.data['path'], '')
+
+    def testAsyncDispatcher(self):
+        dispatcher = JsonRpcAsyncDispatcher()
+
+        async def Handler(customer, items, **kw):
+            return customer
+        dispatcher.Register(Handler, 'order', schema=ORDER)
+
+        async def Run():
+            return await asyncio.gather(
+                dispatcher.DispatchJsonAsync(
+                    JsonRpcMessage.Request(1, 'order', Order()).AsWireJson()),
+                dispatcher.DispatchJsonAsync(JsonRpcMessage.Request(
+                    2, 'order', Order(customer='too long name')).AsWireJson()))
+        ok, invalid = asyncio.run(Run())
+        self.assertEqual(ok.result, 'ann')
+        self.assertEqual(invalid.error.data,
+                         {'path': '/customer',
+                          'message': 'Expected at most 8 characters'})
+
+
+if __name__ == '__main__':
+    unittest.main()
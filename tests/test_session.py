@@ -0,0 +1,130 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+import testutils
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError, JsonRpcParsed,\
+    JsonRpcException, JsonRpcClientSession, JsonRpcCallError,\
+    JsonRpcCallTimeout
+from pyjsonrpclite import session
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+class TestClientSession(unittest.TestCase):
+    def setUp(self):
+        self.clock = testutils.Clock()
+        self.session = JsonRpcClientSession(maxPending=100, clock=self.clock)
+
+    def testOutOfOrderBatch(self):
+        calls = [self.session.Request('sum', [i, i]) for i in range(5)]
+        self.assertEqual([1, 2, 3, 4, 5], [msg.id for msg, _ in calls])
+        self.assertEqual('{"jsonrpc":"2.0","method":"sum","params":[0,0],'
+                         '"id":1}', calls[0][0].AsWireJson())
+        batch = '[' + ','.join(msg.AsWireJson() for msg in [
+            JsonRpcMessage.Success(4, 6),
+            JsonRpcMessage.Error(2, JsonRpcError.InvalidParams()),
+            JsonRpcMessage.Success(1, 0),
+            JsonRpcMessage.Success(77, 0),
+            JsonRpcMessage.Error(None, JsonRpcError.ParseError())]) + ']'
+        self.assertEqual(3, self.session.Resolve(JsonRpcParsed.Parse(batch)))
+        self.assertEqual(0, calls[0][1].result())
+        self.assertEqual(6, calls[3][1].result())
+        with self.assertRaises(JsonRpcCallError) as context:
+            calls[1][1].result()
+        self.assertEqual(JsonRpcError.InvalidParams().code,
+                         context.exception.rpcError.code)
+        self.assertEqual(2, len(self.session))
+        # a late duplicate is ignored
+        self.assertEqual(0, self.session.Resolve(JsonRpcMessage.Success(4, 1)))
+        self.assertFalse(calls[2][1].done())
+
+    def testInvalidResponseFailsCall(self):
+        '''An invalid response with the id of a pending call fails it'''
+        msg, future = self.session.Request('ping')
+        other, otherFuture = self.session.Request('ping')
+        invalid = JsonRpcParsed.TryParse(
+            '{"jsonrpc": "2.0", "error": {"code": 1, "message": "app"}, '
+            '"id": %d}' % msg.id)
+        self.assertEqual('INVALID', invalid.parsedType)
+        self.assertEqual(1, self.session.Resolve(invalid))
+        with self.assertRaises(JsonRpcCallError) as context:
+            future.result()
+        self.assertEqual(invalid.payload.error.code,
+                         context.exception.rpcError.code)
+        self.assertEqual(1, len(self.session))
+        # invalid input without an id completes nothing
+        self.assertEqual(0, self.session.Resolve(
+            JsonRpcParsed.TryParse('{"jsonrpc": "2.0", "result": 1')))
+        self.assertFalse(otherFuture.done())
+
+    def testCallback(self):
+        responses = []
+        msg, future = self.session.Request('ping', callback=responses.append)
+        self.assertIsNone(future)
+        response = JsonRpcMessage.Success(msg.id, 'pong')
+        self.assertEqual(1, self.session.Resolve(response))
+        self.assertEqual([response], responses)
+
+    def testTimeouts(self):
+        responses = []
+        slow, slowFuture = self.session.Request('a', timeout=10)
+        fast, _ = self.session.Request('b', timeout=1,
+                                       callback=responses.append)
+        endless, endlessFuture = self.session.Request('c')
+        self.assertEqual(1, self.session.NextDeadline())
+        self.clock.now += 1
+        self.assertEqual(1, self.session.Expire())
+        self.assertEqual(JsonRpcError.InternalError().code,
+                         responses[0].error.code)
+        self.assertEqual(fast.id, responses[0].id)
+        self.assertEqual(9, self.session.NextDeadline())
+        self.session.Resolve(JsonRpcMessage.Success(slow.id, 1))
+        self.assertIsNone(self.session.NextDeadline())
+        session = JsonRpcClientSession(timeout=5, clock=self.clock)
+        _, future = session.Request('d')
+        self.clock.now += 5
+        self.assertEqual(1, session.Expire())
+        self.assertRaises(JsonRpcCallTimeout, future.result)
+        self.assertFalse(endlessFuture.done())
+        self.session.Close()
+        self.assertRaises(JsonRpcCallError, endlessFuture.result)
+        self.assertEqual(0, len(self.session))
+
+    def testBounded(self):
+        for _ in range(100):
+            self.session.Request('a')
+        with self.assertRaises(JsonRpcException):
+            self.session.Request('a')
+        self.assertTrue(self.session.Cancel(50))
+        self.assertFalse(self.session.Cancel(50))
+        msg, _ = self.session.Request('a')
+        self.assertEqual(101, msg.id)
+        # resolved calls do not pile up in the timeout queue
+        session = JsonRpcClientSession(timeout=60, clock=self.clock)
+        for _ in range(10000):
+            msg, _ = session.Request('a')
+            session.Resolve(JsonRpcMessage.Success(msg.id, None))
+        self.assertLess(len(session._deadlines), 100)
+        self.assertEqual(0, len(session))
+
+    def testIdsWrap(self):
+        original = session.MAX_ID
+        session.MAX_ID = 3
+        try:
+            self.session.Request('a')
+            msg2, _ = self.session.Request('a')
+            self.session.Request('a')
+            self.session.Resolve(JsonRpcMessage.Success(msg2.id, None))
+            self.assertEqual(2, self.session.Request('a')[0].id)
+            with self.assertRaises(JsonRpcException):
+                self.session.maxPending = 3
+                self.session.Request('a')
+        finally:
+            session.MAX_ID = original
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+﻿#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pyjsonrpclite import JsonRpcMessage, JsonRpcError,\
+    JsonRpcAsyncDispatcher, JsonRpcContentLengthCodec, JsonRpcCallError,\
+    JsonRpcCallTimeout
+from pyjsonrpclite.transport import JsonRpcServerProtocol, startServer,\
+    openConnection
+
+sys.path.insert(0, os.path.abspath('..'))
+
+
+def MakeDispatcher():
+    dispatcher = JsonRpcAsyncDispatcher()
+    notified = []
+
+    async def Sleep(seconds, value):
+        await asyncio.sleep(seconds)
+        return value
+
+    def Echo(value):
+        return value
+
+    def Notify(value):
+        notified.append(value)
+    dispatcher.Register(Sleep)
+    dispatcher.Register(Echo)
+    dispatcher.Register(Notify)
+    return dispatcher, notified
+
+
+class WriteCounter(object):
+    '''Counts writes of a transport'''
+    def __init__(self, transport):
+        self.count = 0
+        self._write = transport.write
+        transport.write = self
+
+    def __call__(self, data):
+        self.count += 1
+        self._write(data)
+
+
+class FakeTransport(object):
+    '''Transport recording reading pauses and written data'''
+    def __init__(self):
+        self.reading = True
+        self.pauses = 0
+        self.written = []
+
+    def pause_reading(self):
+        self.reading = False
+        self.pauses += 1
+
+    def resume_reading(self):
+        self.reading = True
+
+    def write(self, data):
+        self.written.append(data)
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def Run(self, scenario, **options):
+        '''Runs scenario(client, notified) against a server on TCP and on a
+        Unix socket'''
+        dispatcher, notified = MakeDispatcher()
+        path = os.path.join(self.tempDir, 'rpc.sock')
+
+        async def Main():
+            for address in [{'host': '127.0.0.1', 'port': 0},
+                            {'path': path}]:
+                server = await startServer(dispatcher, **dict(address,
+                                                             **options))
+                if 'port' in address:
+                    address = {'host': '127.0.0.1',
+                               'port': server.sockets[0].getsockname()[1]}
+                client = await openConnection(**dict(address, **options))
+                try:
+                    del notified[:]
+                    await scenario(client, notified)
+                finally:
+                    client.Close()
+                    server.close()
+                    await server.wait_closed()
+        asyncio.run(Main())
+
+    def testPipelining(self):
+        async def Scenario(client, notified):
+            counter = WriteCounter(client._transport)
+            # later calls answer first
+            calls = [client.Call('Sleep', [0.05 - i * 0.0001, i])
+                     for i in range(300)]
+            results = await asyncio.gather(*calls)
+            self.assertEqual(list(range(300)), results)
+            # all the requests were coalesced into one write
+            self.assertEqual(1, counter.count)
+            self.assertEqual(u'é', await client.Call('Echo', [u'é']))
+        self.Run(Scenario)
+
+    def testBatchAndErrors(self):
+        async def Scenario(client, notified):
+            results = await client.CallBatch([
+                ('Echo', [1]), ('Sleep', [0.01, 2]), ('Missing', None),
+                ('Echo', [])])
+            self.assertEqual([1, 2], results[:2])
+            self.assertEqual(JsonRpcError.MethodNotFound().code,
+                             results[2].rpcError.code)
+            self.assertEqual(JsonRpcError.InvalidParams().code,
+                             results[3].rpcError.code)
+            with self.assertRaises(JsonRpcCallError):
+                await client.Call('Missing')
+            await client.Notify('Notify', ['a'])
+            self.assertEqual('b', await client.Call('Echo', ['b']))
+            self.assertEqual(['a'], notified)
+            with self.assertRaises(JsonRpcCallTimeout):
+                await client.Call('Sleep', [1, 0], timeout=0.05)
+            self.assertEqual(0, len(client.session))
+        self.Run(Scenario)
+
+    def testContentLengthFraming(self):
+        async def Scenario(client, notified):
+            results = await asyncio.gather(
+                *[client.Call('Echo', [{'n': i, 'text': 'x' * i}])
+                  for i in range(0, 5000, 50)])
+            self.assertEqual(list(range(0, 5000, 50)),
+                             [result['n'] for result in results])
+        self.Run(Scenario, codecFactory=JsonRpcContentLengthCodec)
+
+    def testConnectionLost(self):
+        dispatcher, _ = MakeDispatcher()
+
+        async def Main():
+            server = await startServer(dispatcher, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            client = await openConnection('127.0.0.1', port)
+            call = asyncio.ensure_future(client.Call('Sleep', [10, 0]))
+            await asyncio.sleep(0.05)
+            client._transport.abort()
+            with self.assertRaises(JsonRpcCallError):
+                await call
+            with self.assertRaises(ConnectionError):
+                await client.Call('Echo', [1])
+            server.close()
+            await server.wait_closed()
+        asyncio.run(Main())
+
+
+    def testBackpressure(self):
+        async def Scenario(client, notified):
+            # the socket write buffer is full: calls wait for it to drain
+            client.pause_writing()
+            call = asyncio.ensure_future(client.Call('Echo', [1]))
+            await asyncio.sleep(0.05)
+            self.assertFalse(call.done())
+            self.assertEqual(0, len(client.session))
+            client.resume_writing()
+            self.assertEqual(1, await call)
+        self.Run(Scenario)
+
+    def testTaskLimit(self):
+        '''Reading stops while too many messages are being handled'''
+        dispatcher = JsonRpcAsyncDispatcher()
+        release = None
+
+        async def Wait():
+            await release.wait()
+            return True
+        dispatcher.Register(Wait)
+
+        async def Main():
+            nonlocal release
+            release = asyncio.Event()
+            transport = FakeTransport()
+            protocol = JsonRpcServerProtocol(dispatcher, maxTasks=4)
+            protocol.connection_made(transport)
+            data = b''.join(JsonRpcMessage.Request(i, 'Wait').AsWireBytes() +
+                            b'\n' for i in range(3))
+            protocol.data_received(data)
+            self.assertTrue(transport.reading)
+            protocol.data_received(data)
+            self.assertFalse(transport.reading)
+            # the write buffer drains, too many messages are still handled
+            protocol.pause_writing()
+            protocol.resume_writing()
+            self.assertFalse(transport.reading)
+            release.set()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            self.assertTrue(transport.reading)
+            self.assertEqual(1, transport.pauses)
+            self.assertEqual(6, b''.join(transport.written).count(b'\n'))
+        asyncio.run(Main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,30 @@ sys.path.insert(0, os.path.abspath('..'))
 
 
 def jsonDefault(o):
-    return o.__dict__
+    '''Presents object fields as dict, supports objects with __slots__.
+    Fields not set or set to ABSENT are skipped.'''
+    from pyjsonrpclite import ABSENT
+    if hasattr(o, '__dict__'):
+        return o.__dict__
+    fields = {}
+    for cls in type(o).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            value = getattr(o, name, ABSENT)
+            if value is not ABSENT:
+                fields[name] = value
+    return fields
+
+
+class Clock(object):
+    '''Fake clock passed as clock param: returns now, which moves by step
+    on every reading. Tests move it themselves with the default step 0.'''
+    def __init__(self, now=100.0, step=0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
 
 
 def ObjAsJson(o):